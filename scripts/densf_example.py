@@ -2,7 +2,8 @@ import pathlib as pl
 
 import matplotlib.pyplot as plt
 from orb_visualization.densf_presets import grid, orbital, output
-from orb_visualization.plotter import AMSViewPlotSettings, plot_orbital_with_amsview
+from orb_visualization.plotter import AMSViewPlotSettings
+from orb_visualization.render_queue import RenderJob, render_orbitals
 from scm.plams import DensfJob, KFFile, Settings, finish, init
 
 
@@ -64,12 +65,10 @@ for section in possible_orbital_sections:
 
 # print(KFFile(outfile).read_section("SCF_A"))
 plot_settings = AMSViewPlotSettings(scmgeometry="1600x920", zoom=1.0, viewplane="1 1 0", transparent=False)
-image_paths = []
+image_paths = [output_dir / f"{orb}.png" for orb in orbitals]
 
-for orb in orbitals:
-    image_path = output_dir / f"{orb}.png"
-    plot_orbital_with_amsview(outfile, orb, plot_settings=plot_settings, save_file=output_dir / f"{orb}.png")
-    image_paths.append(image_path)
+# The orbitals are rendered with several amsview processes at the same time
+render_orbitals([RenderJob(outfile, orb, plot_settings, image_path) for orb, image_path in zip(orbitals, image_paths)], max_concurrency=4)
 
 # Using the image paths, we can create a plot with all the orbitals using matplotlib and subplots
 
@@ -1,3 +1,4 @@
-from orb_analysis.config.toml_config import OrbAnalysisConfig
+# The config is loaded on first use (see `orb_analysis.config.lazy_config`), as parsing config.toml with pydantic-settings takes a large part of the start-up time
+from orb_analysis.config.lazy_config import bind_config, config_override, get_config, orb_config
 
-orb_config = OrbAnalysisConfig()
+__all__ = ["bind_config", "config_override", "get_config", "orb_config"]
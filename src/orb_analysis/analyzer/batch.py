@@ -0,0 +1,230 @@
+"""
+Module containing functions to analyze many fragment analysis calculations (rkf files) in parallel.
+
+Each rkf file is analyzed in a worker process of a process pool. Only the compact results (the :SFOManager:, :MOManager: and the analysis text) are sent back
+to the main process, the :KFFile: handles and the arrays read from the rkf files stay in the worker processes.
+Errors are captured per file so that one broken calculation does not abort the batch.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import pathlib as pl
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Sequence, TypeVar
+
+import attrs
+
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.custom_types import SpinTypes
+from orb_analysis.log_messages import calc_analyzer_call_message
+from orb_analysis.orbital_manager.orb_manager import MOManager, SFOManager
+
+DEFAULT_RKF_PATTERN = "*adf.rkf"  # Pattern used to find the rkf files in directories, matches both "adf.rkf" and "[name].adf.rkf"
+GLOB_CHARACTERS = "*?["
+
+T = TypeVar("T")
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class BatchResult:
+    """
+    This class contains the result of the analysis of one rkf file in a batch. Only picklable and compact data is stored, as the result is sent between processes.
+    When the analysis failed, `error` contains the traceback and the managers and analysis are None.
+    """
+
+    index: int  # Position of the rkf file in the batch
+    path: str
+    name: str
+    elapsed: float = 0.0  # Time (in seconds) that the analysis took in the worker process
+    sfo_manager: SFOManager | None = None
+    mo_manager: MOManager | None = None
+    analysis: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@attrs.define
+class BatchProgress:
+    """This class contains the progress of a batch and is passed to the progress callback of `analyze_many` after each finished rkf file."""
+
+    n_done: int
+    n_total: int
+    n_failed: int
+    elapsed: float  # Wall time (in seconds) since the start of the batch
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated remaining wall time (in seconds) based on the average time per finished rkf file so far."""
+        if self.n_done == 0:
+            return None
+        return self.elapsed / self.n_done * (self.n_total - self.n_done)
+
+    def __str__(self) -> str:
+        eta = "?" if self.eta is None else f"{self.eta:.1f}s"
+        return f"[{self.n_done}/{self.n_total}] failed: {self.n_failed}, elapsed: {self.elapsed:.1f}s, ETA: {eta}"
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _init_worker(rkf_reading_settings: dict[str, Any]) -> None:
+    """Applies the settings of the main process in the worker process, as changes to `orb_config` are not inherited when processes are spawned."""
+    for key, value in rkf_reading_settings.items():
+        setattr(orb_config.rkf_reading, key, value)
+
+
+def _analyze_rkf_file(
+    index: int,
+    path: str,
+    orb_range: tuple[int, int],
+    irrep: str | None,
+    spin: str,
+    n_fragments: int,
+    use_sidecar: bool,
+) -> BatchResult:
+    """Analyzes one rkf file. Runs in the worker process and captures all errors in the result."""
+    start = time.perf_counter()
+    name = pl.Path(path).parent.name + "/" + pl.Path(path).stem
+    try:
+        analyzer = create_calc_analyser(path, n_fragments=n_fragments, use_sidecar=use_sidecar)
+        sfo_manager = analyzer.get_sfo_orbitals(orb_range, orb_range, irrep, spin)
+        mo_manager = analyzer.get_mo_orbitals(orb_range, irrep, spin)
+        log_message = calc_analyzer_call_message(restricted=analyzer.calc_info.restricted, calc_name=analyzer.name, orb_range=orb_range, irrep=irrep, spin=spin)
+        analysis = log_message + str(sfo_manager) + "\n\n" + str(mo_manager)
+    except Exception:
+        return BatchResult(index=index, path=path, name=name, elapsed=time.perf_counter() - start, error=traceback.format_exc())
+    return BatchResult(index=index, path=path, name=analyzer.name, elapsed=time.perf_counter() - start, sfo_manager=sfo_manager, mo_manager=mo_manager, analysis=analysis)
+
+
+def _failed_batch_result(job: tuple, error: str) -> BatchResult:
+    index, path, *_ = job
+    return BatchResult(index=index, path=path, name=pl.Path(path).parent.name + "/" + pl.Path(path).stem, error=error)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def expand_rkf_paths(paths: Iterable[str | pl.Path], pattern: str = DEFAULT_RKF_PATTERN) -> list[pl.Path]:
+    """
+    Expands a list of files, directories and glob patterns (e.g. "calcs/**/*.adf.rkf") into a list of rkf files.
+    Directories are searched recursively for files matching `pattern`. Files are returned in the given order (sorted per directory or glob) without duplicates.
+    Paths that do not exist are kept, so that they show up as failed analyses instead of silently disappearing from the batch.
+    """
+    rkf_files: dict[pl.Path, None] = {}
+    for path in paths:
+        path = pl.Path(path)
+        if path.is_dir():
+            matches = sorted(file for file in path.rglob(pattern) if file.is_file())
+        elif any(character in str(path) for character in GLOB_CHARACTERS):
+            matches = sorted(pl.Path(file) for file in glob.glob(str(path), recursive=True) if os.path.isfile(file))
+        else:
+            matches = [path]
+        rkf_files.update(dict.fromkeys(matches))
+    return list(rkf_files)
+
+
+def run_in_process_pool(
+    function: Callable[..., T],
+    jobs: Sequence[tuple],
+    max_workers: int | None = None,
+    ordered: bool = True,
+    on_failure: Callable[[tuple, str], T] | None = None,
+) -> Iterator[T]:
+    """
+    Calls `function(*job)` for each job in worker processes and yields the return values. The first element of each job must be its index in `jobs`.
+
+    At most two jobs per worker are submitted or waiting to be yielded at the same time, such that the memory of the queued jobs and finished results stays bounded.
+    The values are yielded in the order of `jobs` (`ordered=True`) or as soon as they are finished. With 1 worker, the jobs run in the current process.
+    When a job fails in the pool itself (e.g. the worker process was killed or the return value could not be sent back), `on_failure(job, traceback)` is yielded instead.
+    Without `on_failure`, the error is raised.
+    The `orb_config.rkf_reading` settings of the current process (including the overrides of the current context, see `config_override`) are applied in the worker processes.
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if max_workers == 1:
+        for job in jobs:
+            yield function(*job)
+        return
+
+    max_pending = 2 * max_workers
+    remaining_jobs = iter(jobs)
+    pending: dict[Future, tuple] = {}
+    finished: dict[int, T] = {}
+    next_index = 0
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(orb_config.rkf_reading.model_dump(),)) as executor:
+        while True:
+            # Finished results that wait for an earlier (slow) job count towards the limit as well, so they cannot pile up while that job runs
+            while len(pending) + len(finished) < max_pending:
+                job = next(remaining_jobs, None)
+                if job is None:
+                    break
+                pending[executor.submit(function, *job)] = job
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    if on_failure is None:
+                        raise
+                    result = on_failure(job, traceback.format_exc())
+
+                if not ordered:
+                    yield result
+                    continue
+                finished[job[0]] = result
+
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+
+def analyze_many(
+    paths: Iterable[str | pl.Path],
+    orb_range: tuple[int, int] = (6, 6),
+    irrep: str | None = None,
+    spin: str = SpinTypes.A,
+    n_fragments: int = 2,
+    max_workers: int | None = None,
+    ordered: bool = True,
+    use_sidecar: bool = False,
+    progress: Callable[[BatchProgress], None] | None = None,
+) -> Iterator[BatchResult]:
+    """
+    Analyzes many rkf files in a process pool and yields a :BatchResult: per rkf file.
+
+    Args:
+        paths (Iterable[str | pl.Path]): Paths to the rkf files. Use `expand_rkf_paths` for directories and glob patterns.
+        orb_range, irrep, spin: Passed to `get_sfo_orbitals` and `get_mo_orbitals` of each analyzer, see :CalcAnalyzer:.
+        n_fragments (int, optional): Number of fragments in the calculations. Defaults to 2.
+        max_workers (int | None, optional): Maximum number of worker processes. Defaults to the number of CPUs. With 1 worker, the files are analyzed in the current process.
+        ordered (bool, optional): Whether the results are yielded in the order of `paths` (True) or as soon as they are finished (False). Defaults to True.
+        use_sidecar (bool, optional): Passed to `create_calc_analyser`. Defaults to False.
+        progress (Callable[[BatchProgress], None] | None, optional): Called with the :BatchProgress: after each finished rkf file. Defaults to None.
+
+    Yields:
+        BatchResult: The result of each rkf file. Failed analyses have the traceback in `error` and do not abort the batch.
+    """
+    jobs = [(index, str(path), orb_range, irrep, str(spin), n_fragments, use_sidecar) for index, path in enumerate(paths)]
+    start = time.perf_counter()
+    n_failed = 0
+
+    for n_done, result in enumerate(run_in_process_pool(_analyze_rkf_file, jobs, max_workers=max_workers, ordered=ordered, on_failure=_failed_batch_result), start=1):
+        n_failed += not result.ok
+        if progress is not None:
+            progress(BatchProgress(n_done=n_done, n_total=len(jobs), n_failed=n_failed, elapsed=time.perf_counter() - start))
+        yield result
@@ -6,36 +6,57 @@ from __future__ import annotations
 
 import pathlib as pl
 from abc import ABC, abstractmethod
-from typing import Sequence
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Sequence
 
 import attrs
 import numpy as np
-from scm.plams import KFFile
 
+from orb_analysis import bind_config, orb_config
 from orb_analysis.analyzer.calc_info import CalcInfo
+from orb_analysis.analyzer.overlap_cache import DEFAULT_OVERLAP_CACHE_MAX_BYTES, OverlapTriangleCache
+from orb_analysis.analyzer.sidecar import load_analysis_sidecar, write_analysis_sidecar
 from orb_analysis.complex.complex import Complex, create_complex
 from orb_analysis.custom_types import SpinTypes
-from orb_analysis.fragment.fragment import Fragment, RestrictedFragment, UnrestrictedFragment, create_restricted_fragment, create_unrestricted_fragment
-from orb_analysis.log_messages import calc_analyzer_call_message
+from orb_analysis.fragment.fragment import Fragment, create_restricted_fragment, create_unrestricted_fragment
+from orb_analysis.log_messages import calc_analyzer_call_message, logger
 from orb_analysis.orbital.orbital import SFO
 from orb_analysis.orbital_manager.orb_manager import MOManager, SFOManager
+from orb_analysis.profiling import profiled, span
+from orb_analysis.rkf_reading.mmap_reader import open_kf_file
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 # --------------------Interface Method(s)-------------------- #
 
 
-def create_calc_analyser(path_to_rkf_file: str | pl.Path, n_fragments: int = 2, name: str | None = None) -> CalcAnalyzer:
+@profiled("create_calc_analyser")
+def create_calc_analyser(
+    path_to_rkf_file: str | pl.Path,
+    n_fragments: int = 2,
+    name: str | None = None,
+    overlap_cache_max_bytes: int = DEFAULT_OVERLAP_CACHE_MAX_BYTES,
+    use_sidecar: bool = False,
+    lazy: bool = False,
+) -> CalcAnalyzer:
     """
     Main Method that the user should use to create a :FACalcAnalyser: object. The Method will automatically detect whether the calculation is restricted or unrestricted.
 
     Args:
         path_to_rkf_file (str): Path to the rkf file of the complex calculation.
         n_fragments (int, optional): Number of fragments in the calculation. Defaults to 2.
+        overlap_cache_max_bytes (int, optional): Memory budget of the cache that stores the decoded overlap matrices (per irrep and spin). Defaults to 256 MB.
+        use_sidecar (bool, optional): Whether to load the analyzer from (and store it in) a sidecar file next to the rkf file (see `orb_analysis.analyzer.sidecar`). Defaults to False.
+        lazy (bool, optional): Whether the complex, each fragment and the data of each spin are only read the first time they are accessed. Only the :CalcInfo: is read up front.
+            Has no effect when the analyzer is loaded from a sidecar, and the sidecar is written eagerly. Defaults to False.
 
     Returns:
         FACalcAnalyser: A :FACalcAnalyser: object that contains information about the complex calculation.
     """
     path_to_rkf_file = pl.Path(path_to_rkf_file)
-    kf_file = KFFile(str(path_to_rkf_file))
+    with span("open kf file"):
+        kf_file = open_kf_file(path_to_rkf_file, memory_map=orb_config.rkf_reading.memory_map)
 
     if not kf_file.sections():  # type: ignore
         raise ValueError(f"The KFFile is empty. Please check the path to the KFFile. Current path is: {path_to_rkf_file}")
@@ -45,15 +66,36 @@ def create_calc_analyser(path_to_rkf_file: str | pl.Path, n_fragments: int = 2,
     # - :Complex: An instance that contains information about the complex calculation (Molecular Orbitals)
     # - A list of :Fragment: objects that contain information about the fragment calculation and the fragments respectively (Symmetrized Fragment Orbitals).
     name = path_to_rkf_file.parent.name + "/" + path_to_rkf_file.stem if name is None else name
-    calc_info = CalcInfo(kf_file=kf_file)
-    complex = create_complex(name=name, kf_file=kf_file, restricted_calc=calc_info.restricted)
+    overlap_cache = OverlapTriangleCache(kf_file=kf_file, max_bytes=overlap_cache_max_bytes)
+    sidecar_data = None
+    if use_sidecar:
+        with span("load sidecar"):
+            sidecar_data = load_analysis_sidecar(path_to_rkf_file, kf_file, name, n_fragments)
+
+    if sidecar_data is not None:
+        calc_info, complex, fragments = sidecar_data
+    elif lazy and not use_sidecar:
+        # The complex and fragments are passed as factories that are called on first access (see `CalcAnalyzer.complex` and `CalcAnalyzer._get_fragment`),
+        # with the config overrides that are active now instead of those at the time of access
+        with span("calc info"):
+            calc_info = CalcInfo(kf_file=kf_file)
+        complex = bind_config(partial(create_complex, name=name, kf_file=kf_file, restricted_calc=calc_info.restricted, lazy=True))
+        create_fragment = create_restricted_fragment if calc_info.restricted else partial(create_unrestricted_fragment, lazy=True)
+        fragments = [bind_config(partial(create_fragment, kf_file=kf_file, frag_index=i + 1, calc_info=calc_info)) for i in range(n_fragments)]
+    else:
+        with span("calc info"):
+            calc_info = CalcInfo(kf_file=kf_file)
+        complex = create_complex(name=name, kf_file=kf_file, restricted_calc=calc_info.restricted)
+        create_fragment = create_restricted_fragment if calc_info.restricted else create_unrestricted_fragment
+        fragments = [create_fragment(kf_file=kf_file, frag_index=i + 1, calc_info=calc_info) for i in range(n_fragments)]
+        if use_sidecar:
+            with span("write sidecar"):
+                write_analysis_sidecar(path_to_rkf_file, calc_info, complex, fragments)
 
     if calc_info.restricted:
-        fragments = [create_restricted_fragment(kf_file=kf_file, frag_index=i + 1, calc_info=calc_info) for i in range(n_fragments)]
-        return RestrictedCalcAnalyser(name=name, kf_file=kf_file, calc_info=calc_info, complex=complex, fragments=fragments)
+        return RestrictedCalcAnalyser(name=name, kf_file=kf_file, calc_info=calc_info, complex=complex, fragments=fragments, overlap_cache=overlap_cache)
 
-    fragments = [create_unrestricted_fragment(kf_file=kf_file, frag_index=i + 1, calc_info=calc_info) for i in range(n_fragments)]
-    return UnrestrictedCalcAnalyser(name=name, kf_file=kf_file, calc_info=calc_info, complex=complex, fragments=fragments)
+    return UnrestrictedCalcAnalyser(name=name, kf_file=kf_file, calc_info=calc_info, complex=complex, fragments=fragments, overlap_cache=overlap_cache)
 
 
 # --------------------Classes-------------------- #
@@ -68,8 +110,25 @@ class CalcAnalyzer(ABC):
     name: str
     calc_info: CalcInfo
     kf_file: KFFile
-    complex: Complex
-    fragments: Sequence[Fragment] = attrs.field(default=list)
+    _complex: Complex | Callable[[], Complex]  # A factory is called on first access (lazy mode of `create_calc_analyser`)
+    _fragments: list[Fragment | Callable[[], Fragment]] = attrs.field(factory=list, converter=list)
+    overlap_cache: OverlapTriangleCache = attrs.field(default=attrs.Factory(lambda self: OverlapTriangleCache(kf_file=self.kf_file), takes_self=True))
+
+    @property
+    def complex(self) -> Complex:
+        if not isinstance(self._complex, Complex):
+            self._complex = self._complex()
+        return self._complex
+
+    @property
+    def fragments(self) -> Sequence[Fragment]:
+        return [self._get_fragment(i + 1) for i in range(len(self._fragments))]
+
+    def _get_fragment(self, fragment: int):
+        # Note: fragment 0 refers to the last fragment, which is used for the overlap
+        if not isinstance(self._fragments[fragment - 1], Fragment):
+            self._fragments[fragment - 1] = self._fragments[fragment - 1]()  # type: ignore # the factory of the fragment in lazy mode
+        return self._fragments[fragment - 1]
 
     def __call__(self, orb_range: tuple[int, int] = (6, 6), irrep: str | None = None, spin: str = SpinTypes.A) -> str:
         sfos = self.get_sfo_orbitals(orb_range, orb_range, irrep, spin)
@@ -113,17 +172,14 @@ class RestrictedCalcAnalyser(CalcAnalyzer):
     This class contains information about the complex calculation.
     """
 
-    fragments: Sequence[RestrictedFragment] = attrs.field(default=list)
-
     def _get_sfo(self, sfo: str | SFO) -> SFO:
         return SFO.from_label(sfo) if isinstance(sfo, str) else sfo
 
-    def _get_fragment(self, fragment: int):
-        return self.fragments[fragment - 1]
-
     def get_sfo_overlap(self, sfo1: str | SFO, sfo2: str | SFO):
         sfo1, sfo2 = self._get_sfo(sfo1), self._get_sfo(sfo2)
-        return self._get_fragment(0).get_overlap(kf_file=self.kf_file, uses_symmetry=self.calc_info.symmetry, irrep1=sfo1.irrep, index1=sfo1.index, irrep2=sfo2.irrep, index2=sfo2.index)
+        return self._get_fragment(0).get_overlap(
+            kf_file=self.kf_file, uses_symmetry=self.calc_info.symmetry, irrep1=sfo1.irrep, index1=sfo1.index, irrep2=sfo2.irrep, index2=sfo2.index, overlap_cache=self.overlap_cache
+        )
 
     def get_sfo_gross_population(self, fragment: int, sfo: str | SFO):
         sfo = self._get_sfo(sfo)
@@ -137,10 +193,12 @@ class RestrictedCalcAnalyser(CalcAnalyzer):
         sfo = self._get_sfo(sfo)
         return self._get_fragment(fragment).get_occupation(irrep=sfo.irrep, index=sfo.index)
 
+    @profiled("get_mo_orbitals")
     def get_mo_orbitals(self, orb_range: tuple[int, int] = (-10, 10), irrep: str | None = None, spin: str | None = None) -> MOManager:
         mos = self.complex.get_mos(orb_range=orb_range, orb_irrep=irrep, spin=spin)
         return MOManager(complex_mos=mos)
 
+    @profiled("get_sfo_orbitals")
     def get_sfo_orbitals(self, frag1_orb_range: tuple[int, int] = (10, 10), frag2_orb_range: tuple[int, int] = (10, 10), irrep: str | None = None, spin: str | None = None) -> SFOManager:
         frag_sfos = [frag.get_sfos(homo_lumo_range, irrep) for homo_lumo_range, frag in zip([frag1_orb_range, frag2_orb_range], self.fragments)]
         frag_sfos[1] = frag_sfos[1][::-1]  # reverse the orbitals to go from LUMO+x -> HOMO-x to HOMO-x -> LUMO+x
@@ -148,11 +206,9 @@ class RestrictedCalcAnalyser(CalcAnalyzer):
         # First, we want to store frag1 orbitals from LUMO+x to HOMO-x for easier printing later on
         overlap_matrix = np.zeros(shape=(len(frag_sfos[0]), len(frag_sfos[1])))
         try:
-            for i, frag1_orb in enumerate(frag_sfos[0]):
-                for j, frag2_orb in enumerate(frag_sfos[1]):
-                    overlap_matrix[i, j] = self.get_sfo_overlap(frag1_orb, frag2_orb)
+            overlap_matrix = self._get_fragment(0).get_overlap_matrix(self.calc_info.symmetry, self.kf_file, frag_sfos[0], frag_sfos[1], SpinTypes.A, overlap_cache=self.overlap_cache)
         except KeyError:
-            print("Detecting irrep error in getting the overlap matrix, skipping it as a result")
+            logger.warning("Detecting irrep error in getting the overlap matrix, skipping it as a result")
         return SFOManager(frag1_sfos=frag_sfos[0], frag2_sfos=frag_sfos[1], overlap_matrix=overlap_matrix)
 
 
@@ -162,21 +218,23 @@ class UnrestrictedCalcAnalyser(CalcAnalyzer):
     This class contains information about the complex calculation.
     """
 
-    fragments: Sequence[UnrestrictedFragment] = attrs.field(default=list)
-
     def _get_sfo(self, sfo: str | SFO) -> SFO:
         return SFO.from_label(sfo) if isinstance(sfo, str) else sfo
 
-    def _get_fragment(self, fragment: int):
-        return self.fragments[fragment - 1]
-
     def get_sfo_overlap(self, sfo1: str | SFO, sfo2: str | SFO):
         sfo1, sfo2 = self._get_sfo(sfo1), self._get_sfo(sfo2)
         if sfo1.spin != sfo2.spin:
             return 0.0
 
         return self._get_fragment(0).get_overlap(
-            kf_file=self.kf_file, uses_symmetry=self.calc_info.symmetry, irrep1=sfo1.irrep, index1=sfo1.index, irrep2=sfo2.irrep, index2=sfo2.index, spin=str(sfo1.spin)
+            kf_file=self.kf_file,
+            uses_symmetry=self.calc_info.symmetry,
+            irrep1=sfo1.irrep,
+            index1=sfo1.index,
+            irrep2=sfo2.irrep,
+            index2=sfo2.index,
+            spin=str(sfo1.spin),
+            overlap_cache=self.overlap_cache,
         )
 
     def get_sfo_gross_population(self, fragment: int, sfo: str | SFO):
@@ -191,10 +249,12 @@ class UnrestrictedCalcAnalyser(CalcAnalyzer):
         sfo = self._get_sfo(sfo)
         return self._get_fragment(fragment).get_occupation(irrep=sfo.irrep, index=sfo.index, spin=str(sfo.spin))
 
+    @profiled("get_mo_orbitals")
     def get_mo_orbitals(self, orb_range: tuple[int, int] = (-10, 10), irrep: str | None = None, spin: str | None = None) -> MOManager:
         mos = self.complex.get_mos(orb_range=orb_range, orb_irrep=irrep, spin=spin)
         return MOManager(complex_mos=mos)
 
+    @profiled("get_sfo_orbitals")
     def get_sfo_orbitals(self, frag1_orb_range: tuple[int, int] = (10, 10), frag2_orb_range: tuple[int, int] = (10, 10), irrep: str | None = None, spin: str | None = None) -> SFOManager:
         frag_sfos = [frag.get_sfos(homo_lumo_range, irrep, str(spin)) for homo_lumo_range, frag in zip([frag1_orb_range, frag2_orb_range], self.fragments)]
         frag_sfos[1] = frag_sfos[1][::-1]  # reverse the orbitals to go from LUMO+x -> HOMO-x to HOMO-x -> LUMO+x
@@ -203,10 +263,10 @@ class UnrestrictedCalcAnalyser(CalcAnalyzer):
         # Second, LUMO - LUMO overlap has no phyiscal meaning so it is turned to 0.0
         overlap_matrix = np.zeros(shape=(len(frag_sfos[0]), len(frag_sfos[1])))
         try:
-            for i, frag1_orb in enumerate(frag_sfos[0]):
-                for j, frag2_orb in enumerate(frag_sfos[1]):
-                    overlap_matrix[i, j] = self.get_sfo_overlap(frag1_orb, frag2_orb) if not (frag1_orb.occupation < 1e-6 and frag2_orb.occupation < 1e-6) else 0.0
+            overlap_matrix = self._get_fragment(0).get_overlap_matrix(
+                self.calc_info.symmetry, self.kf_file, frag_sfos[0], frag_sfos[1], str(spin), mask_virtual_pairs=True, overlap_cache=self.overlap_cache
+            )
         except KeyError:
-            print("Detecting irrep error in getting the overlap matrix, skipping it as a result")
+            logger.warning("Detecting irrep error in getting the overlap matrix, skipping it as a result")
 
         return SFOManager(frag1_sfos=frag_sfos[0], frag2_sfos=frag_sfos[1], overlap_matrix=overlap_matrix)
@@ -1,5 +1,13 @@
-﻿import attrs
-from scm.plams import KFFile
+﻿from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import attrs
+
+from orb_analysis.orb_functions.sfo_functions import uses_symmetry
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 
 @attrs.define
@@ -9,12 +17,16 @@ class CalcInfo:
     """
 
     kf_file: KFFile
-    restricted: bool = True
-    relativistic: bool = False
-    symmetry: bool = False
+    restricted: bool | None = None
+    relativistic: bool | None = None
+    symmetry: bool | None = None
 
     def __attrs_post_init__(self):
         # First, get relevant terms such as symmetry group label, unrestricted, relativistic, etc.
-        self.symmetry = str(self.kf_file.read("Symmetry", "grouplabel")).split()[0].lower() not in ["nosym"]
-        self.restricted = int(self.kf_file.read("General", "nspin")) == 1  # type: ignore returns an integer
-        self.relativistic = int(self.kf_file.read("General", "ioprel")) != 0  # type: ignore returns an integer
+        # Terms that are already given (e.g. when the analyzer is loaded from a sidecar file, see `orb_analysis.analyzer.sidecar`) are not read again
+        if self.symmetry is None:
+            self.symmetry = uses_symmetry(self.kf_file)
+        if self.restricted is None:
+            self.restricted = int(self.kf_file.read("General", "nspin")) == 1  # type: ignore returns an integer
+        if self.relativistic is None:
+            self.relativistic = int(self.kf_file.read("General", "ioprel")) != 0  # type: ignore returns an integer
@@ -0,0 +1,80 @@
+"""
+Module containing the :OverlapTriangleCache: class that keeps decoded overlap matrices of a fragment analysis calculation in memory.
+
+The overlap between SFOs is stored in the rkf file per irrep as a packed lower triangle ("[IRREP]", "S-CoreSFO" and "S-CoreSFO_B" for spin B).
+Decoding such a triangle is by far the most expensive part of an overlap query, so the decoded triangles are kept in a least-recently-used cache
+with a byte budget. This makes sure that repeated (point) queries are cheap, while large calculations do not keep every irrep in memory at once.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import attrs
+import numpy as np
+
+from orb_analysis.custom_types import Array1D, SpinTypes
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
+
+# 256 MB is enough for all irreps of typical calculations, but prevents large nosym calculations from pinning everything in memory
+DEFAULT_OVERLAP_CACHE_MAX_BYTES = 256 * 1024**2
+
+
+@attrs.define
+class OverlapTriangleCache:
+    """
+    Least-recently-used cache of the packed overlap triangles, keyed by (irrep, spin). The cache is owned by a :CalcAnalyzer:.
+
+    Triangles that are larger than `max_bytes` are returned, but never stored.
+    The counters `hits`, `misses` and `evictions` together with the `nbytes` property can be used to inspect the effectiveness of the cache.
+    """
+
+    kf_file: KFFile
+    max_bytes: int = DEFAULT_OVERLAP_CACHE_MAX_BYTES
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    _triangles: OrderedDict[tuple[str, str], Array1D[np.float64]] = attrs.field(factory=OrderedDict, repr=False)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the number of bytes that are currently stored in the cache."""
+        return sum(triangle.nbytes for triangle in self._triangles.values())
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "nbytes": self.nbytes, "max_bytes": self.max_bytes, "n_triangles": len(self._triangles)}
+
+    def get(self, irrep: str, spin: str = SpinTypes.A) -> Array1D[np.float64]:
+        """Returns the packed overlap triangle of the irrep for the given spin. Raises a KeyError when the irrep is not present in the rkf file."""
+        key = (irrep, SpinTypes.B if spin == SpinTypes.B else SpinTypes.A)
+
+        if key in self._triangles:
+            self.hits += 1
+            self._triangles.move_to_end(key)
+            return self._triangles[key]
+
+        self.misses += 1
+        variable = f"S-CoreSFO_{SpinTypes.B}" if key[1] == SpinTypes.B else "S-CoreSFO"
+        triangle = np.asarray(self.kf_file.read(irrep, variable), dtype=np.float64)
+
+        if triangle.nbytes > self.max_bytes:
+            return triangle
+
+        self._triangles[key] = triangle
+        self._evict(self.max_bytes)
+        return triangle
+
+    def clear(self) -> None:
+        """Removes all triangles from the cache. The counters are kept."""
+        self._triangles.clear()
+
+    def _evict(self, max_bytes: int) -> None:
+        nbytes = self.nbytes
+        while nbytes > max_bytes and self._triangles:
+            _, triangle = self._triangles.popitem(last=False)
+            nbytes -= triangle.nbytes
+            self.evictions += 1
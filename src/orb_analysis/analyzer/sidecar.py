@@ -0,0 +1,206 @@
+"""
+Module containing functions to store the data of a fragment analysis calculation in a compact sidecar file next to the rkf file (e.g. `adf.rkf.orbcache.npz`).
+
+Creating a :CalcAnalyzer: reads the general information, the MO data of the complex, the SFO data of the fragments and the SFO index mappings from the rkf file.
+On network filesystems this takes seconds per file and is repeated on every call. The sidecar stores exactly these arrays in compressed columnar form:
+    - "meta": a JSON string with the version, the fingerprint of the rkf file, the relevant `orb_config.rkf_reading` settings and all small (scalar) data
+    - "[prefix].[spin].counts" and "[prefix].[spin].values": the number of values per irrep and the concatenated values of one property (e.g. "fragment1.orb_energies.A")
+    - "[prefix].[frag_index].counts" and "[prefix].[frag_index].values": the same for the SFO index mappings of the fragments
+
+The order of the irreps of each column is stored in "meta". Restricted properties are stored with spin "A".
+A sidecar is only used when the fingerprint (size, modification time and hash of the first and last MB) of the rkf file and the settings match, otherwise it is removed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib as pl
+import zipfile
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_info import CalcInfo
+from orb_analysis.complex.complex import Complex, RestrictedComplex, UnrestrictedComplex
+from orb_analysis.complex.complex_data import RestrictedComplexData, UnrestrictedComplexData
+from orb_analysis.custom_types import SpinTypes, UnrestrictedProperty
+from orb_analysis.fragment.fragment import Fragment, RestrictedFragment, UnrestrictedFragment
+from orb_analysis.fragment.fragmentdata import RestrictedFragmentData, UnrestrictedFragmentData
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
+
+SIDECAR_SUFFIX = ".orbcache.npz"
+SIDECAR_VERSION = 1
+FINGERPRINT_CHUNK_BYTES = 1024**2  # Number of bytes at the start and end of the rkf file that are hashed
+PROPERTIES = ["orb_energies", "occupations"]
+FRAGMENT_PROPERTIES = ["orb_energies", "occupations", "gross_populations"]
+
+# --------------------Helper Functions-------------------- #
+
+
+def get_sidecar_path(path_to_rkf_file: str | pl.Path) -> pl.Path:
+    """Returns the path of the sidecar file that belongs to the rkf file, e.g. "adf.rkf" -> "adf.rkf.orbcache.npz"."""
+    path_to_rkf_file = pl.Path(path_to_rkf_file)
+    return path_to_rkf_file.with_name(path_to_rkf_file.name + SIDECAR_SUFFIX)
+
+
+def get_rkf_fingerprint(path_to_rkf_file: str | pl.Path) -> dict[str, Any]:
+    """Returns the size, modification time (in ns) and a hash of the first and last MB of the rkf file. Hashing the whole file would defeat the purpose of the sidecar."""
+    stat = os.stat(path_to_rkf_file)
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(path_to_rkf_file, "rb") as file:
+        content_hash.update(file.read(FINGERPRINT_CHUNK_BYTES))
+        if stat.st_size > FINGERPRINT_CHUNK_BYTES:
+            file.seek(max(stat.st_size - FINGERPRINT_CHUNK_BYTES, FINGERPRINT_CHUNK_BYTES))
+            content_hash.update(file.read())
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": content_hash.hexdigest()}
+
+
+def get_relevant_settings() -> dict[str, Any]:
+    """Returns the `orb_config.rkf_reading` settings that change the data that is stored in the sidecar."""
+    return {"orbital_energy_key": orb_config.rkf_reading.orbital_energy_key, "orbital_energy_unit": orb_config.rkf_reading.orbital_energy_unit}
+
+
+def _pack_columns(arrays: dict[str, np.ndarray], prefix: str, data: dict[Any, dict[str, Any]], dtype: type) -> dict[str, list[str]]:
+    """Stores the {key: {irrep: [values]}} data as concatenated values and counts per key in `arrays`. Returns the order of the irreps per key."""
+    irrep_order = {}
+    for key, data_per_irrep in data.items():
+        irreps = list(data_per_irrep)
+        arrays[f"{prefix}.{key}.counts"] = np.array([len(data_per_irrep[irrep]) for irrep in irreps], dtype=np.int64)
+        arrays[f"{prefix}.{key}.values"] = np.concatenate([np.asarray(data_per_irrep[irrep], dtype=dtype) for irrep in irreps]) if irreps else np.empty(0, dtype=dtype)
+        irrep_order[str(key)] = irreps
+    return irrep_order
+
+
+def _unpack_columns(arrays: dict[str, np.ndarray], prefix: str, irrep_order: dict[str, list[str]]) -> dict[str, dict[str, np.ndarray]]:
+    """Inverse of `_pack_columns`."""
+    data = {}
+    for key, irreps in irrep_order.items():
+        counts = arrays[f"{prefix}.{key}.counts"]
+        values = np.split(arrays[f"{prefix}.{key}.values"], np.cumsum(counts)[:-1])
+        data[key] = dict(zip(irreps, values))
+    return data
+
+
+def _as_unrestricted(data: dict, restricted: bool) -> UnrestrictedProperty:
+    return {SpinTypes.A.value: data} if restricted else {str(spin): data_per_irrep for spin, data_per_irrep in data.items()}
+
+
+def _remove_sidecar(sidecar_path: pl.Path) -> None:
+    try:
+        sidecar_path.unlink()
+    except OSError:
+        pass
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def write_analysis_sidecar(path_to_rkf_file: str | pl.Path, calc_info: CalcInfo, complex: Complex, fragments: Sequence[Fragment]) -> pl.Path | None:
+    """
+    Writes the data of the analyzer to the sidecar file next to the rkf file and returns its path.
+    The file is written to a temporary file first and then moved, so that other processes never read a partially written sidecar.
+    Returns None when the sidecar could not be written (e.g. in a read-only directory), because the sidecar is only an optimization.
+    """
+    restricted = bool(calc_info.restricted)
+    arrays: dict[str, np.ndarray] = {}
+    complex_data = complex.complex_data
+
+    complex_columns = {prop: _pack_columns(arrays, f"complex.{prop}", _as_unrestricted(getattr(complex_data, prop), restricted), np.float64) for prop in PROPERTIES}
+    meta: dict[str, Any] = {
+        "version": SIDECAR_VERSION,
+        "fingerprint": get_rkf_fingerprint(path_to_rkf_file),
+        "settings": get_relevant_settings(),
+        "n_fragments": len(fragments),
+        "calc_info": {"restricted": restricted, "relativistic": bool(calc_info.relativistic), "symmetry": bool(calc_info.symmetry)},
+        "complex": {"irreps": list(complex_data.irreps), "n_frozen_cores_per_irrep": {irrep: int(n) for irrep, n in complex_data.n_frozen_cores_per_irrep.items()}, "columns": complex_columns},
+        "fragments": [],
+    }
+
+    for i, fragment in enumerate(fragments, start=1):
+        fragment_data = fragment.fragment_data
+        index_mapping = fragment.get_sfo_index_mapping(calc_info.kf_file, bool(calc_info.symmetry))
+        columns = {prop: _pack_columns(arrays, f"fragment{i}.{prop}", _as_unrestricted(getattr(fragment_data, prop), restricted), np.float64) for prop in FRAGMENT_PROPERTIES}
+        meta["fragments"].append(
+            {
+                "name": fragment_data.name,
+                "frag_index": int(fragment_data.frag_index),
+                "frag_irreps": list(fragment_data.frag_irreps),
+                "n_frozen_cores_per_irrep": {irrep: int(n) for irrep, n in fragment_data.n_frozen_cores_per_irrep.items()},
+                "columns": columns,
+                "index_mapping": _pack_columns(arrays, f"fragment{i}.index_mapping", index_mapping, np.int64),
+            }
+        )
+
+    arrays["meta"] = np.array(json.dumps(meta))
+    sidecar_path = get_sidecar_path(path_to_rkf_file)
+    temp_path = sidecar_path.with_name(f"{sidecar_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temp_path, sidecar_path)
+    except OSError:
+        _remove_sidecar(temp_path)
+        return None
+    return sidecar_path
+
+
+def load_analysis_sidecar(path_to_rkf_file: str | pl.Path, kf_file: KFFile, name: str, n_fragments: int) -> tuple[CalcInfo, Complex, list[Fragment]] | None:
+    """
+    Loads the :CalcInfo:, :Complex: and :Fragment: objects from the sidecar file next to the rkf file without reading the rkf file.
+    Returns None when there is no (valid) sidecar. Sidecars that are stale (the rkf file or the settings changed) or that can not be read are removed.
+    """
+    sidecar_path = get_sidecar_path(path_to_rkf_file)
+    if not sidecar_path.is_file():
+        return None
+
+    try:
+        with np.load(sidecar_path, allow_pickle=False) as npz_file:
+            meta = json.loads(str(npz_file["meta"]))
+            is_valid = (
+                meta.get("version") == SIDECAR_VERSION
+                and meta.get("settings") == get_relevant_settings()
+                and meta.get("n_fragments") == n_fragments
+                and meta.get("fingerprint") == get_rkf_fingerprint(path_to_rkf_file)
+            )
+            arrays = {key: npz_file[key] for key in npz_file.files} if is_valid else {}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        is_valid = False
+
+    if not is_valid:
+        _remove_sidecar(sidecar_path)
+        return None
+
+    restricted = meta["calc_info"]["restricted"]
+    calc_info = CalcInfo(kf_file=kf_file, **meta["calc_info"])
+
+    complex_meta = meta["complex"]
+    complex_properties = {prop: _unpack_columns(arrays, f"complex.{prop}", irrep_order) for prop, irrep_order in complex_meta["columns"].items()}
+    if restricted:
+        complex_properties = {prop: data[SpinTypes.A] for prop, data in complex_properties.items()}
+        complex_data = RestrictedComplexData(name=name, irreps=complex_meta["irreps"], n_frozen_cores_per_irrep=complex_meta["n_frozen_cores_per_irrep"], **complex_properties)
+        complex = RestrictedComplex(name=name, kf_file=kf_file, complex_data=complex_data)
+    else:
+        complex_data = UnrestrictedComplexData(name=name, irreps=complex_meta["irreps"], n_frozen_cores_per_irrep=complex_meta["n_frozen_cores_per_irrep"], **complex_properties)
+        complex = UnrestrictedComplex(name=name, kf_file=kf_file, complex_data=complex_data)
+
+    fragments: list[Fragment] = []
+    for i, fragment_meta in enumerate(meta["fragments"], start=1):
+        fragment_properties = {prop: _unpack_columns(arrays, f"fragment{i}.{prop}", irrep_order) for prop, irrep_order in fragment_meta["columns"].items()}
+        index_mapping = _unpack_columns(arrays, f"fragment{i}.index_mapping", fragment_meta["index_mapping"])
+        index_mapping = {int(frag_index): {irrep: indices.tolist() for irrep, indices in mapping.items()} for frag_index, mapping in index_mapping.items()}
+        fragment_kwargs = {key: fragment_meta[key] for key in ["name", "frag_index", "n_frozen_cores_per_irrep", "frag_irreps"]}
+
+        if restricted:
+            fragment_properties = {prop: data[SpinTypes.A] for prop, data in fragment_properties.items()}
+            fragment_data = RestrictedFragmentData(**fragment_kwargs, **fragment_properties)
+            fragments.append(RestrictedFragment(fragment_data=fragment_data, calc_info=calc_info, sfo_index_mapping=index_mapping))
+        else:
+            fragment_data = UnrestrictedFragmentData(**fragment_kwargs, **fragment_properties)
+            fragments.append(UnrestrictedFragment(fragment_data=fragment_data, calc_info=calc_info, sfo_index_mapping=index_mapping))
+
+    return calc_info, complex, fragments
@@ -0,0 +1,295 @@
+"""
+Module containing the :Trajectory: class that stacks the SFO data of a series of fragment analysis calculations (e.g. the points of a PyFrag or IRC trajectory).
+
+Instead of one :SFOManager: per point, the data is stored in stacked arrays that are aligned by SFO label:
+    - overlaps: (n_points, n_frag1_sfos, n_frag2_sfos)
+    - frag[1|2]_orb_energies, frag[1|2]_gross_populations and frag[1|2]_occupations: (n_points, n_frag[1|2]_sfos)
+
+The SFOs are selected once (by default with the `orb_range` and `irrep` at the first point) and then read at every point, such that every column refers to the same SFO.
+The positions of the SFOs in the arrays of the rkf file are worked out once at the first point as well. Every point is then read as a few whole arrays that are indexed
+with these positions, which assumes that all points have the same fragments and basis sets (points with a different number of SFOs are reported as errors).
+Values of SFOs that are not present at the first point, and of points that could not be analyzed, are NaN.
+The points are read in parallel (see `orb_analysis.analyzer.batch.run_in_process_pool`). For long trajectories, the arrays can be stored as memory-mapped .npy files in a directory.
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib as pl
+import traceback
+from typing import Any, Sequence
+
+import attrs
+import numpy as np
+
+from orb_analysis import orb_config
+from orb_analysis.analyzer.batch import run_in_process_pool
+from orb_analysis.analyzer.calc_analyzer import CalcAnalyzer, create_calc_analyser
+from orb_analysis.custom_types import Array1D, Array2D, Array3D, SpinTypes
+from orb_analysis.fragment.fragment import read_overlap_triangle
+from orb_analysis.orb_functions.sfo_functions import get_gross_population_slices, get_occupations, get_orbital_energies, get_sfo_section_index
+from orb_analysis.orbital.orbital import SFO
+from orb_analysis.rkf_reading.mmap_reader import open_kf_file
+
+TRAJECTORY_INFO_FILE = "trajectory.json"
+SFO_PROPERTIES = ["orb_energies", "gross_populations", "occupations"]
+
+# --------------------Helper Functions-------------------- #
+
+
+def _get_sfo_label(sfo: SFO, restricted: bool) -> str:
+    """Returns the label of the SFO in the format that is accepted by the :CalcAnalyzer: methods, i.e. "[index]_[irrep]" or "[index]_[irrep]_[spin]" (unrestricted)."""
+    return f"{sfo.index}_{sfo.irrep}" if restricted else f"{sfo.index}_{sfo.irrep}_{sfo.spin}"
+
+
+def _get_sfo_positions(analyzer: CalcAnalyzer, frag1_labels: list[str], frag2_labels: list[str], spin: str) -> _SFOPositions:
+    """Works out the positions of the selected SFOs in the arrays of the first point (see :_SFOPositions:). SFOs that are not present get position -1."""
+    kf_file, symmetry, restricted = analyzer.kf_file, bool(analyzer.calc_info.symmetry), bool(analyzer.calc_info.restricted)
+    sfo_index = get_sfo_section_index(kf_file)
+    n_gross_pops = len(sfo_index.read(kf_file, "SFO popul", "sfo_grosspop"))
+    index_mapping = analyzer.fragments[-1].get_sfo_index_mapping(kf_file, symmetry)
+
+    frag_spins, frag_irreps, frag_positions = [], [], []
+    for fragment, labels in enumerate([frag1_labels, frag2_labels], start=1):
+        frag_sfo_indices = sfo_index.sfo_indices_of_frag(fragment)
+        sfo_indices_per_irrep = {irrep: frag_sfo_indices[sfo_index.irreps[frag_sfo_indices] == irrep] for irrep in sfo_index.ordered_irreps_of_frag(fragment)}
+        gross_pop_slices = get_gross_population_slices(kf_file, fragment)
+
+        sfos = [SFO.from_label(label) for label in labels]
+        # Rows: position in the ("SFOs", energy/occupation) arrays, in the ("SFO popul", "sfo_grosspop") array and the total SFO index that is used for the overlaps
+        positions = np.full((3, len(sfos)), -1, dtype=np.intp)
+        for i, sfo in enumerate(sfos):
+            try:
+                gross_pop_slice = gross_pop_slices[str(sfo.spin)][sfo.irrep]
+                gross_pop_position = gross_pop_slice.start + sfo.index - 1
+                if sfo.index < 1 or gross_pop_position >= min(gross_pop_slice.stop, n_gross_pops):
+                    continue
+                sfo_position = sfo_indices_per_irrep[sfo.irrep][sfo.index - 1]
+                total_index = index_mapping[fragment][sfo.irrep if symmetry else "A"][sfo.index - 1]
+            except (KeyError, IndexError):
+                continue
+            positions[:, i] = sfo_position, gross_pop_position, total_index
+
+        frag_spins.append(np.array([str(sfo.spin) for sfo in sfos]))
+        frag_irreps.append(np.array([sfo.irrep for sfo in sfos]))
+        frag_positions.append(positions)
+
+    # Only blocks of the same irrep have a nonzero overlap. Note: the overlap matrix is stored in the rkf file as a lower triangular matrix, see `Fragment.get_overlap_matrix`
+    overlap_blocks = []
+    present1, present2 = frag_positions[0][0] >= 0, frag_positions[1][0] >= 0
+    for irrep in dict.fromkeys(frag_irreps[0][present1].tolist()):
+        rows, columns = np.flatnonzero(present1 & (frag_irreps[0] == irrep)), np.flatnonzero(present2 & (frag_irreps[1] == irrep))
+        if columns.size == 0:
+            continue
+        index1, index2 = frag_positions[0][2][rows], frag_positions[1][2][columns]
+        min_index, max_index = np.minimum.outer(index1, index2), np.maximum.outer(index1, index2)
+        overlap_blocks.append((irrep if symmetry else "A", rows, columns, max_index * (max_index - 1) // 2 + min_index - 1))
+
+    return _SFOPositions(
+        n_sfos=sfo_index.n_sfos,
+        overlap_spin=SpinTypes.A if restricted else spin,
+        mask_virtual_pairs=not restricted,
+        spins=frag_spins,
+        sfo_positions=[positions[0] for positions in frag_positions],
+        gross_pop_positions=[positions[1] for positions in frag_positions],
+        overlap_blocks=overlap_blocks,
+    )
+
+
+def _read_trajectory_point(index: int, path: str, sfo_positions: _SFOPositions) -> tuple[int, dict[str, np.ndarray] | None, str | None]:
+    """
+    Reads the data of the selected SFOs at one point. Runs in the worker process and returns (index, arrays, error) such that only arrays are sent back.
+    Each variable is read once as a whole array and indexed with the positions of the first point, so no analyzer or :SFO: objects are created per point.
+    """
+    try:
+        kf_file = open_kf_file(path, memory_map=orb_config.rkf_reading.memory_map)
+        if not kf_file.sections():  # type: ignore
+            raise ValueError(f"The KFFile is empty. Please check the path to the KFFile. Current path is: {path}")
+        sfo_index = get_sfo_section_index(kf_file)
+        if sfo_index.n_sfos != sfo_positions.n_sfos:
+            raise ValueError(f"The point has {sfo_index.n_sfos} SFOs, while the first point has {sfo_positions.n_sfos}, so its SFOs cannot be aligned")
+        raw_gross_pops = sfo_index.read(kf_file, "SFO popul", "sfo_grosspop")
+
+        arrays: dict[str, np.ndarray] = {}
+        for fragment, (spins, positions, gross_pop_positions) in enumerate(zip(sfo_positions.spins, sfo_positions.sfo_positions, sfo_positions.gross_pop_positions), start=1):
+            present = positions >= 0
+            properties = {prop: np.full(len(positions), np.nan) for prop in SFO_PROPERTIES}
+            for spin in dict.fromkeys(spins.tolist()):
+                selected = present & (spins == spin)
+                properties["orb_energies"][selected] = get_orbital_energies(kf_file, spin)[positions[selected]]
+                properties["occupations"][selected] = get_occupations(kf_file, spin)[positions[selected]]
+            properties["gross_populations"][present] = raw_gross_pops[gross_pop_positions[present]]
+            for prop, values in properties.items():
+                arrays[f"frag{fragment}_{prop}"] = values
+
+        # Cells of present SFOs of which the irreps do not match are 0.0. LUMO-LUMO overlaps are masked for unrestricted calculations (see :UnrestrictedCalcAnalyser:)
+        overlaps = np.full((len(sfo_positions.spins[0]), len(sfo_positions.spins[1])), np.nan)
+        overlaps[np.ix_(sfo_positions.sfo_positions[0] >= 0, sfo_positions.sfo_positions[1] >= 0)] = 0.0
+        triangles: dict[str, Array1D[np.float64]] = {}
+        for section, rows, columns, triangle_indices in sfo_positions.overlap_blocks:
+            if section not in triangles:
+                triangles[section] = read_overlap_triangle(kf_file, section, sfo_positions.overlap_spin)
+            overlaps[np.ix_(rows, columns)] = triangles[section][triangle_indices]
+        if sfo_positions.mask_virtual_pairs:
+            overlaps[np.outer(arrays["frag1_occupations"] < 1e-6, arrays["frag2_occupations"] < 1e-6)] = 0.0
+        arrays["overlaps"] = overlaps
+    except Exception:
+        return index, None, traceback.format_exc()
+    return index, arrays, None
+
+
+def _select_sfo_labels(analyzer: CalcAnalyzer, orb_range: tuple[int, int], irrep: str | None, spin: str) -> tuple[list[str], list[str]]:
+    """Returns the labels of the fragment 1 and fragment 2 SFOs that are selected with the `orb_range` and `irrep` in the calculation of the analyzer."""
+    sfo_manager = analyzer.get_sfo_orbitals(orb_range, orb_range, irrep, spin)
+    restricted = bool(analyzer.calc_info.restricted)
+    return [_get_sfo_label(sfo, restricted) for sfo in sfo_manager.frag1_sfos], [_get_sfo_label(sfo, restricted) for sfo in sfo_manager.frag2_sfos]
+
+
+def _create_array(shape: tuple[int, ...], storage_dir: pl.Path | None, name: str) -> np.ndarray:
+    """Creates a NaN-filled array, which is a memory-mapped .npy file in `storage_dir` when that is given."""
+    if storage_dir is None:
+        return np.full(shape, np.nan)
+    array = np.lib.format.open_memmap(storage_dir / f"{name}.npy", mode="w+", dtype=np.float64, shape=shape)
+    array[...] = np.nan
+    return array
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True)
+class _SFOPositions:
+    """
+    This class contains the positions of the selected SFOs in the arrays of the rkf file, which are worked out at the first point and sent to the worker processes.
+    The positions of SFOs that are not present at the first point are -1.
+    """
+
+    n_sfos: int
+    overlap_spin: str
+    mask_virtual_pairs: bool
+    spins: list[Array1D[np.str_]]  # Spin of each SFO, per fragment
+    sfo_positions: list[Array1D[np.intp]]  # In the ("SFOs", orbital energy/occupation) arrays, per fragment
+    gross_pop_positions: list[Array1D[np.intp]]  # In the ("SFO popul", "sfo_grosspop") array, per fragment
+    overlap_blocks: list[tuple[str, Array1D[np.intp], Array1D[np.intp], Array2D[np.intp]]]  # (section, rows, columns, indices in the packed overlap triangle) per irrep
+
+
+@attrs.define
+class Trajectory:
+    """
+    This class contains the SFO data of a series of fragment analysis calculations in stacked arrays (see the module docstring).
+    The SFOs are identified by their labels ("[index]_[irrep]" or "[index]_[irrep]_[spin]"), which can be passed to the methods below just like to the :CalcAnalyzer: methods.
+    """
+
+    paths: list[str]
+    frag1_labels: list[str]
+    frag2_labels: list[str]
+    overlaps: Array3D[np.float64]
+    frag1_orb_energies: Array2D[np.float64]
+    frag2_orb_energies: Array2D[np.float64]
+    frag1_gross_populations: Array2D[np.float64]
+    frag2_gross_populations: Array2D[np.float64]
+    frag1_occupations: Array2D[np.float64]
+    frag2_occupations: Array2D[np.float64]
+    errors: dict[int, str] = attrs.field(factory=dict)  # Tracebacks of the points that could not be analyzed
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _get_position(self, fragment: int, sfo: str | SFO) -> int:
+        labels = self.frag1_labels if fragment == 1 else self.frag2_labels
+        sfo = sfo if isinstance(sfo, SFO) else SFO.from_label(sfo)
+        for position, label in enumerate(labels):
+            index, irrep, *spin = label.split("_")
+            # Labels of restricted calculations have no spin, in which case the spin of the given SFO is ignored
+            if int(index) == sfo.index and irrep == sfo.irrep and (not spin or spin[0] == sfo.spin):
+                return position
+        raise KeyError(f"SFO {sfo} of fragment {fragment} is not part of the trajectory. Available SFOs are: {labels}")
+
+    def get_sfo_overlap(self, sfo1: str | SFO, sfo2: str | SFO) -> Array1D[np.float64]:
+        """Returns the overlap between a fragment 1 SFO and a fragment 2 SFO at every point."""
+        return self.overlaps[:, self._get_position(1, sfo1), self._get_position(2, sfo2)]
+
+    def get_sfo_orbital_energy(self, fragment: int, sfo: str | SFO) -> Array1D[np.float64]:
+        """Returns the orbital energy of the SFO of the fragment at every point."""
+        return getattr(self, f"frag{fragment}_orb_energies")[:, self._get_position(fragment, sfo)]
+
+    def get_sfo_gross_population(self, fragment: int, sfo: str | SFO) -> Array1D[np.float64]:
+        """Returns the gross population of the SFO of the fragment at every point."""
+        return getattr(self, f"frag{fragment}_gross_populations")[:, self._get_position(fragment, sfo)]
+
+    def get_sfo_occupation(self, fragment: int, sfo: str | SFO) -> Array1D[np.float64]:
+        """Returns the occupation of the SFO of the fragment at every point."""
+        return getattr(self, f"frag{fragment}_occupations")[:, self._get_position(fragment, sfo)]
+
+    @classmethod
+    def load(cls, storage_dir: str | pl.Path, mmap_mode: Any = "r") -> Trajectory:
+        """Loads a trajectory that was created with a `storage_dir`. The arrays are memory-mapped with `mmap_mode` (None loads them into memory)."""
+        storage_dir = pl.Path(storage_dir)
+        info = json.loads((storage_dir / TRAJECTORY_INFO_FILE).read_text())
+        arrays = {name: np.load(storage_dir / f"{name}.npy", mmap_mode=mmap_mode) for name in ["overlaps"] + [f"frag{i}_{prop}" for i in [1, 2] for prop in SFO_PROPERTIES]}
+        return cls(paths=info["paths"], frag1_labels=info["frag1_labels"], frag2_labels=info["frag2_labels"], errors={int(i): error for i, error in info["errors"].items()}, **arrays)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def create_trajectory(
+    paths: Sequence[str | pl.Path],
+    orb_range: tuple[int, int] = (6, 6),
+    irrep: str | None = None,
+    spin: str = SpinTypes.A,
+    frag1_sfos: Sequence[str] | None = None,
+    frag2_sfos: Sequence[str] | None = None,
+    n_fragments: int = 2,
+    max_workers: int | None = None,
+    storage_dir: str | pl.Path | None = None,
+) -> Trajectory:
+    """
+    Reads the SFO data of a series of fragment analysis calculations in parallel and stacks it in a :Trajectory:.
+
+    Args:
+        paths (Sequence[str | pl.Path]): Paths to the rkf files of the points, in the order of the trajectory.
+        orb_range, irrep, spin: Used to select the SFOs at the first point (see `CalcAnalyzer.get_sfo_orbitals`). The spin is also used for the overlaps of unrestricted calculations.
+        frag1_sfos, frag2_sfos (Sequence[str] | None, optional): Labels of the SFOs to read (e.g. ["14_AA", "15_AA"]). Overrides the selection at the first point. Defaults to None.
+        n_fragments (int, optional): Number of fragments in the calculations. Defaults to 2.
+        max_workers (int | None, optional): Maximum number of worker processes. Defaults to the number of CPUs.
+        storage_dir (str | pl.Path | None, optional): Directory in which the arrays are stored as memory-mapped .npy files. Use `Trajectory.load` to open it again. Defaults to None (in memory).
+
+    Returns:
+        Trajectory: The stacked SFO data of all points.
+    """
+    paths = [str(path) for path in paths]
+    analyzer = create_calc_analyser(paths[0], n_fragments=n_fragments)
+    if frag1_sfos is None or frag2_sfos is None:
+        frag1_labels, frag2_labels = _select_sfo_labels(analyzer, orb_range, irrep, str(spin))
+    frag1_labels = list(frag1_sfos) if frag1_sfos is not None else frag1_labels
+    frag2_labels = list(frag2_sfos) if frag2_sfos is not None else frag2_labels
+
+    storage_dir = pl.Path(storage_dir) if storage_dir is not None else None
+    if storage_dir is not None:
+        storage_dir.mkdir(parents=True, exist_ok=True)
+
+    n_points, n_frag1_sfos, n_frag2_sfos = len(paths), len(frag1_labels), len(frag2_labels)
+    arrays = {"overlaps": _create_array((n_points, n_frag1_sfos, n_frag2_sfos), storage_dir, "overlaps")}
+    for fragment, n_sfos in [(1, n_frag1_sfos), (2, n_frag2_sfos)]:
+        for prop in SFO_PROPERTIES:
+            arrays[f"frag{fragment}_{prop}"] = _create_array((n_points, n_sfos), storage_dir, f"frag{fragment}_{prop}")
+
+    # The results are written into the stacked arrays as soon as they arrive, such that only a few points are kept in memory at the same time
+    sfo_positions = _get_sfo_positions(analyzer, frag1_labels, frag2_labels, str(spin))
+    jobs = [(index, path, sfo_positions) for index, path in enumerate(paths)]
+    errors: dict[int, str] = {}
+    for index, point_arrays, error in run_in_process_pool(_read_trajectory_point, jobs, max_workers=max_workers, ordered=False, on_failure=lambda job, error: (job[0], None, error)):
+        if point_arrays is None:
+            errors[index] = str(error)
+            continue
+        for name, values in point_arrays.items():
+            arrays[name][index] = values
+
+    if storage_dir is not None:
+        for array in arrays.values():
+            array.flush()
+        info = {"paths": paths, "frag1_labels": frag1_labels, "frag2_labels": frag2_labels, "errors": {str(index): error for index, error in errors.items()}}
+        (storage_dir / TRAJECTORY_INFO_FILE).write_text(json.dumps(info))
+
+    return Trajectory(paths=paths, frag1_labels=frag1_labels, frag2_labels=frag2_labels, errors=errors, **arrays)
@@ -0,0 +1,350 @@
+"""
+Module containing the benchmark suite of the package, which measures the run time of the analysis on the rkf fixtures (test/fixtures/rkfs) and on scaled synthetic inputs.
+
+The suite contains the following benchmarks, named "[case]/[benchmark]":
+    - create_calc_analyser[cold]: importing the package and creating the analyzer in a new interpreter
+    - create_calc_analyser[warm]: creating the analyzer again in the same interpreter
+    - get_sfo_orbitals[5|20|100]: getting the SFOs (and their overlap matrix) with the orb_range (5, 5), (20, 20) and (100, 100)
+    - get_mo_orbitals: getting the MOs with the orb_range (20, 20)
+    - SFOManager.__str__: formatting the SFO report with the orb_range (20, 20)
+    - get_most_stabilizing_oi_pairs: determining the most stabilizing pairs with the orb_range (20, 20)
+    - filter_orbitals[1000|10000]: filtering synthetic orbitals (case "synthetic"), which does not need a fixture
+
+The benchmarks of the analyzer and SFO manager methods get a new analyzer (or SFO manager) for each call, such that every call starts with the cold caches of the analyzer
+(e.g. the overlap triangles) and their decoding is measured as well.
+The cases are the restricted/unrestricted and sym/nosym fixtures in `BENCHMARK_FIXTURES`. Fixtures that are not present are skipped (and listed as such in the results).
+The cases in `SYNTHETIC_CASES` are large (5,000 SFOs) synthetic calculations (see `orb_analysis.rkf_reading.synthetic_rkf`), which are written to a temporary directory when they are selected.
+Each benchmark is run `repeat` times, of which the minimum, median, mean and standard deviation of the wall time (s) are stored. The minimum is used for comparisons,
+as it is the least sensitive to other processes. Usage:
+    orb_analysis benchmark run --output results.json [--repeat 5] [--select "restricted_sym/*"] [--fixtures_dir test/fixtures/rkfs]
+    orb_analysis benchmark compare baseline.json results.json [--threshold 0.2]
+
+The compare command exits with 1 if a benchmark is slower than the baseline by more than the threshold (fraction), such that it can be used in CI.
+"""
+
+from __future__ import annotations
+
+import datetime
+import fnmatch
+import gc
+import json
+import os
+import pathlib as pl
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Sequence
+
+import attrs
+
+import orb_analysis
+from orb_analysis.rkf_reading.synthetic_rkf import SyntheticCalcSpec, write_synthetic_rkf
+
+DEFAULT_FIXTURES_DIR = pl.Path(__file__).resolve().parents[2] / "test" / "fixtures" / "rkfs"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2  # 20% slower than the baseline is flagged as a regression
+
+# {case: rkf file in the fixtures directory}
+BENCHMARK_FIXTURES: dict[str, str] = {
+    "restricted_sym": "restricted_largecore_fragsym_c3v_full.adf.rkf",
+    "restricted_nosym": "restricted_largecore_nofragsym_nosym_full.adf.rkf",
+    "unrestricted_sym": "unrestricted_largecore_fragsym_c3v_full.adf.rkf",
+    "unrestricted_nosym": "unrestricted_largecore_fragsym_nosym_full.adf.rkf",
+}
+# {case: synthetic calculation}
+SYNTHETIC_CASES: dict[str, SyntheticCalcSpec] = {
+    "synthetic_restricted_nosym_5000": SyntheticCalcSpec(n_sfos_per_fragment=2500, point_group="NOSYM", n_frozen_cores=20),
+    "synthetic_unrestricted_c2v_5000": SyntheticCalcSpec(n_sfos_per_fragment=2500, point_group="C(2V)", n_frozen_cores=5, unrestricted=True, spin_polarization=1),
+}
+SFO_ORB_RANGES = [5, 20, 100]
+REPORT_ORB_RANGE = (20, 20)
+SPIN = "A"  # the unrestricted analyzers need the spin, the restricted analyzers ignore it
+SYNTHETIC_N_ORBITALS = [1_000, 10_000]
+
+# Run in a new interpreter for the cold benchmark; prints the wall time of the import and the creation of the analyzer
+COLD_START_CODE = """
+import sys, time
+start = time.perf_counter()
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+create_calc_analyser(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def _noop(_: Any) -> None:
+    """Default `func` of a benchmark that only times its `timer`."""
+
+
+def _no_setup() -> None:
+    """Default `setup` of a benchmark whose `func` needs no argument."""
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class Benchmark:
+    """
+    This class contains a benchmark: `setup` is called once (not timed) and returns the argument of `func`, of which each call is timed.
+    With `setup_per_call`, `setup` is called before every call instead, such that state that is cached by the argument (e.g. an analyzer) is not reused between the calls.
+    If `timer` is given, it is called instead of `func` and returns the measured wall time itself (e.g. of a new interpreter).
+    """
+
+    name: str
+    func: Callable[[Any], Any] = _noop
+    setup: Callable[[], Any] = _no_setup
+    timer: Callable[[], float] | None = None
+    setup_per_call: bool = False
+
+    def run(self, repeat: int) -> dict[str, Any]:
+        """Runs the benchmark `repeat` times and returns the statistics of the wall times (s)."""
+        times = [self.timer() for _ in range(repeat)] if self.timer is not None else _time_calls(self.func, self.setup, repeat, self.setup_per_call)
+        return {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.fmean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "repeat": repeat,
+        }
+
+
+@attrs.define(frozen=True)
+class Comparison:
+    """This class contains the comparison of a benchmark with the baseline. The ratio is current / baseline (> 1 is slower)."""
+
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline > 0 else float("inf")
+
+    def is_regression(self, threshold: float) -> bool:
+        return self.ratio > 1.0 + threshold
+
+    def is_improvement(self, threshold: float) -> bool:
+        return self.ratio < 1.0 / (1.0 + threshold)
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _time_calls(func: Callable[[Any], Any], setup: Callable[[], Any], repeat: int, setup_per_call: bool = False) -> list[float]:
+    """
+    Times the calls of the function with the argument returned by `setup` (once, or before every call with `setup_per_call`).
+    The garbage collector is disabled during the calls (like `timeit`), such that a collection does not land in a single run.
+    """
+    times = []
+    arg = None if setup_per_call else setup()
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            if setup_per_call:
+                arg = setup()
+            gc.disable()
+            start = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - start)
+            if gc_enabled:
+                gc.enable()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times
+
+
+def _time_cold_start(rkf_file: pl.Path) -> float:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(pl.Path(orb_analysis.__file__).parents[1]), os.environ.get("PYTHONPATH", "")])}
+    result = subprocess.run([sys.executable, "-c", COLD_START_CODE, str(rkf_file)], capture_output=True, text=True, env=env, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _create_synthetic_orbitals(n_orbitals: int, seed: int = 0) -> list:
+    """Returns SFOs with random energies (in eV), of which the lower half is occupied, spread over four irreps."""
+    from orb_analysis.orbital.orbital import SFO
+
+    rng = random.Random(seed)
+    irreps = ["A1", "A2", "E1:1", "E1:2"]
+    energies = sorted(rng.uniform(-30.0, 10.0) for _ in range(n_orbitals))
+    return [SFO(index=i + 1, irrep=irreps[i % len(irreps)], energy=energy, occupation=2.0 if i < n_orbitals // 2 else 0.0) for i, energy in enumerate(energies)]
+
+
+def _get_git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=pl.Path(__file__).parent, check=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip()
+
+
+def _get_package_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("orb_analysis")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def create_fixture_benchmarks(case: str, rkf_file: pl.Path) -> list[Benchmark]:
+    """Returns the benchmarks of the analysis of the rkf file, named "[case]/[benchmark]"."""
+    from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+
+    def create_analyzer():
+        return create_calc_analyser(rkf_file)
+
+    def create_sfo_manager():
+        return create_analyzer().get_sfo_orbitals(REPORT_ORB_RANGE, REPORT_ORB_RANGE, spin=SPIN)
+
+    # The warm benchmark creates an analyzer once before timing, such that the imports and the OS file cache are warm.
+    # The other benchmarks get a new analyzer or SFO manager for each call, otherwise only the first call would decode the overlap triangles
+    benchmarks = [
+        Benchmark(f"{case}/create_calc_analyser[cold]", timer=lambda: _time_cold_start(rkf_file)),
+        Benchmark(f"{case}/create_calc_analyser[warm]", func=lambda _: create_analyzer(), setup=create_analyzer),
+    ]
+    for orb_range in SFO_ORB_RANGES:
+        benchmarks.append(Benchmark(f"{case}/get_sfo_orbitals[{orb_range}]", func=lambda analyzer, n=orb_range: analyzer.get_sfo_orbitals((n, n), (n, n), spin=SPIN), setup=create_analyzer, setup_per_call=True))
+    benchmarks += [
+        Benchmark(f"{case}/get_mo_orbitals", func=lambda analyzer: analyzer.get_mo_orbitals(REPORT_ORB_RANGE, spin=SPIN), setup=create_analyzer, setup_per_call=True),
+        Benchmark(f"{case}/SFOManager.__str__", func=str, setup=create_sfo_manager),
+        Benchmark(f"{case}/get_most_stabilizing_oi_pairs", func=lambda sfo_manager: sfo_manager.get_most_stabilizing_oi_pairs(), setup=create_sfo_manager, setup_per_call=True),
+    ]
+    return benchmarks
+
+
+def create_synthetic_benchmarks() -> list[Benchmark]:
+    """Returns the benchmarks on synthetic inputs of increasing size, named "synthetic/[benchmark]"."""
+    from orb_analysis.orb_functions.orb_functions import filter_orbitals
+
+    irreps = ["A1", "E1:1", "E1:2"]
+    return [
+        Benchmark(f"synthetic/filter_orbitals[{n}]", func=lambda orbitals: filter_orbitals(list(orbitals), 20, 20, irreps), setup=lambda n=n: _create_synthetic_orbitals(n))
+        for n in SYNTHETIC_N_ORBITALS
+    ]
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def get_machine_metadata() -> dict[str, Any]:
+    """Returns the metadata of the machine and software, which is stored with the results to judge whether two results can be compared."""
+    import numpy as np
+
+    from orb_analysis import orb_config
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "python_implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "orb_analysis": _get_package_version(),
+        "git_commit": _get_git_commit(),
+        "rkf_reading": orb_config.rkf_reading.model_dump(),
+    }
+
+
+def run_benchmarks(fixtures_dir: str | pl.Path = DEFAULT_FIXTURES_DIR, repeat: int = DEFAULT_REPEAT, select: Sequence[str] = ("*",), progress: Callable[[str], None] | None = None) -> dict[str, Any]:
+    """
+    Runs the benchmarks of which the name matches one of the `select` patterns (e.g. "restricted_sym/*" or "*/get_sfo_orbitals*") and returns the JSON-serializable results:
+        {"metadata": {...}, "benchmarks": {name: {"min": ..., "median": ..., "mean": ..., "stdev": ..., "repeat": ...}}, "skipped": {case: reason}}
+    """
+    fixtures_dir = pl.Path(fixtures_dir)
+
+    def is_selected(benchmark: Benchmark) -> bool:
+        return any(fnmatch.fnmatchcase(benchmark.name, pattern) for pattern in select)
+
+    benchmarks = [benchmark for benchmark in create_synthetic_benchmarks() if is_selected(benchmark)]
+    skipped: dict[str, str] = {}
+    for case, file_name in BENCHMARK_FIXTURES.items():
+        rkf_file = fixtures_dir / file_name
+        if not rkf_file.is_file():
+            skipped[case] = f"fixture {file_name} is not present in {fixtures_dir}"
+            continue
+        benchmarks += [benchmark for benchmark in create_fixture_benchmarks(case, rkf_file) if is_selected(benchmark)]
+
+    results: dict[str, Any] = {"metadata": get_machine_metadata(), "benchmarks": {}, "skipped": skipped}
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        # The synthetic rkf files are only written when one of their benchmarks is selected
+        for case, spec in SYNTHETIC_CASES.items():
+            rkf_file = pl.Path(synthetic_dir) / f"{case}.adf.rkf"
+            case_benchmarks = [benchmark for benchmark in create_fixture_benchmarks(case, rkf_file) if is_selected(benchmark)]
+            if case_benchmarks:
+                write_synthetic_rkf(rkf_file, spec)
+                benchmarks += case_benchmarks
+
+        for benchmark in benchmarks:
+            results["benchmarks"][benchmark.name] = benchmark.run(repeat)
+            if progress is not None:
+                progress(f"{benchmark.name:<60} {results['benchmarks'][benchmark.name]['min'] * 1000:>10.2f} ms")
+    return results
+
+
+def compare_results(baseline: dict[str, Any], current: dict[str, Any], statistic: str = "min") -> list[Comparison]:
+    """Compares the benchmarks that are present in both results on the given statistic (default the minimum wall time)."""
+    return [
+        Comparison(name, baseline["benchmarks"][name][statistic], current["benchmarks"][name][statistic])
+        for name in current["benchmarks"]
+        if name in baseline["benchmarks"]
+    ]
+
+
+def format_comparison(comparisons: Sequence[Comparison], threshold: float = DEFAULT_THRESHOLD) -> str:
+    """Returns the comparisons as a text table, in which the regressions and improvements over the threshold are marked."""
+    lines = [f"{'Benchmark':<60} {'Baseline (ms)':>14} {'Current (ms)':>14} {'Ratio':>7}"]
+    lines.append("-" * len(lines[0]))
+    for comparison in comparisons:
+        mark = "REGRESSION" if comparison.is_regression(threshold) else "improved" if comparison.is_improvement(threshold) else ""
+        lines.append(f"{comparison.name:<60} {comparison.baseline * 1000:>14.2f} {comparison.current * 1000:>14.2f} {comparison.ratio:>7.2f}  {mark}".rstrip())
+    return "\n".join(lines)
+
+
+def benchmark_main(argv: list[str]) -> int:
+    """Entry point of `orb_analysis benchmark run|compare` (see the module docstring). Returns the exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="orb_analysis benchmark", description="Runs the benchmark suite or compares its results with a baseline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Runs the benchmarks and writes the results as JSON")
+    run_parser.add_argument("--output", type=str, help="The JSON file to write the results to. If not given, the results are printed")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"The number of runs of each benchmark. Default is {DEFAULT_REPEAT}")
+    run_parser.add_argument("--select", type=str, nargs="+", default=["*"], help='Patterns of the benchmarks to run, e.g. "restricted_sym/*". Default is all benchmarks')
+    run_parser.add_argument("--fixtures_dir", type=str, default=str(DEFAULT_FIXTURES_DIR), help="The directory with the rkf fixtures. Default is test/fixtures/rkfs of the repository")
+
+    compare_parser = subparsers.add_parser("compare", help="Compares results with a baseline and exits with 1 if a benchmark regressed")
+    compare_parser.add_argument("baseline", type=str, help="The JSON file with the baseline results")
+    compare_parser.add_argument("current", type=str, help="The JSON file with the current results")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"The slowdown (fraction) above which a benchmark is a regression. Default is {DEFAULT_THRESHOLD}")
+    compare_parser.add_argument("--statistic", type=str, default="min", choices=["min", "median", "mean"], help="The statistic of the wall times that is compared. Default is min")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(args.fixtures_dir, repeat=args.repeat, select=args.select, progress=lambda message: print(message, file=sys.stderr))
+        for case, reason in results["skipped"].items():
+            print(f"Skipped {case}: {reason}", file=sys.stderr)
+        if args.output:
+            pl.Path(args.output).write_text(json.dumps(results, indent=2))
+        else:
+            print(json.dumps(results, indent=2))
+        return 0
+
+    baseline, current = (json.loads(pl.Path(path).read_text()) for path in [args.baseline, args.current])
+    comparisons = compare_results(baseline, current, statistic=args.statistic)
+    print(format_comparison(comparisons, args.threshold))
+
+    regressions = [comparison for comparison in comparisons if comparison.is_regression(args.threshold)]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) are more than {args.threshold:.0%} slower than the baseline", file=sys.stderr)
+        return 1
+    return 0
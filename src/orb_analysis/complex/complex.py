@@ -5,32 +5,38 @@ Module containing classes that stores information of the complex calculation in
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
 
 import attrs
-from scm.plams import KFFile, Units
 
 from orb_analysis.complex.complex_data import ComplexData, RestrictedComplexData, UnrestrictedComplexData, create_complex_data
 from orb_analysis.orb_functions.orb_functions import filter_orbitals
 from orb_analysis.orbital.orbital import MO
+from orb_analysis.profiling import profiled
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 # --------------------Interface Function(s)-------------------- #
 
 
-def create_complex(name: str, kf_file: KFFile, restricted_calc: bool) -> Complex:
+@profiled("complex")
+def create_complex(name: str, kf_file: KFFile, restricted_calc: bool, lazy: bool = False) -> Complex:
     """
     Main function that the user could use to create a :Complex: object.
 
     Args:
         name (str): Name of the complex calculation.
         kf_file (KFFile): KFFile object of the complex calculation.
-        complex_data (ComplexData): ComplexData object that contains information about the complex calculation.
+        restricted_calc (bool): Whether the calculation is restricted or unrestricted.
+        lazy (bool, optional): Whether the MOs of each spin are only read the first time that spin is accessed (unrestricted only). Defaults to False.
 
     Returns:
         Complex: A :Complex: object that contains information about the complex calculation.
     """
 
     # Create complex data
-    complex_data = create_complex_data(name, kf_file, restricted_calc)
+    complex_data = create_complex_data(name, kf_file, restricted_calc, lazy)
 
     # Create complex instance
     if restricted_calc:
@@ -62,6 +68,8 @@ class Complex(ABC):
         pass
 
     def _get_mos(self, orb_range: tuple[int, int], orb_irrep: str | None, spin: str, orb_energies, occupations) -> list[MO]:
+        from scm.plams import Units
+
         max_occupied_orbitals, max_unoccupied_orbitals = orb_range
         irreps = [orb_irrep.upper()] if orb_irrep is not None else self.complex_data.irreps
         mos: list[MO] = []
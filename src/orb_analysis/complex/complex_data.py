@@ -2,16 +2,20 @@
 Module containing classes that stores information of the complex calculation in fragment analysis calculations.
 """
 from __future__ import annotations
-from scm.plams import KFFile
+from functools import partial
+from typing import TYPE_CHECKING
 import attrs
-from orb_analysis.orb_functions.mo_functions import get_frozen_cores_per_irrep, get_complex_properties, get_irreps
-from orb_analysis.custom_types import RestrictedProperty, SpinTypes, UnrestrictedProperty
+from orb_analysis.orb_functions.mo_functions import KEY_FUNC_MAPPING, get_frozen_cores_per_irrep, get_complex_properties, get_complex_property, get_irreps
+from orb_analysis.custom_types import IrrepArray, LazySpinArray, SpinTypes
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 
 # --------------------Interface Function(s)-------------------- #
 
 
-def create_complex_data(name: str, kf_file: KFFile, restricted_calc: bool) -> ComplexData:
+def create_complex_data(name: str, kf_file: KFFile, restricted_calc: bool, lazy: bool = False) -> ComplexData:
     """
     Main function that the user could use to create a :ComplexData: object.
 
@@ -19,14 +23,20 @@ def create_complex_data(name: str, kf_file: KFFile, restricted_calc: bool) -> Co
         name (str): Name of the complex calculation.
         kf_file (KFFile): KFFile object of the complex calculation.
         restricted_calc (bool): Whether the calculation is restricted or unrestricted.
+        lazy (bool, optional): Whether the MOs of each spin are only read the first time that spin is accessed (unrestricted only). Defaults to False.
 
     Returns:
         ComplexData: A :ComplexData: object that contains information about the complex calculation.
     """
-    data_to_be_unpacked = get_complex_properties(kf_file, restricted_calc)
     n_frozen_cores_per_irrep = get_frozen_cores_per_irrep(kf_file)
     irreps = get_irreps(kf_file)
 
+    if lazy and not restricted_calc:
+        data_to_be_unpacked = {prop: LazySpinArray({spin: partial(get_complex_property, kf_file, prop, spin) for spin in SpinTypes}) for prop in KEY_FUNC_MAPPING}
+        return UnrestrictedComplexData(name=name, **data_to_be_unpacked, irreps=irreps, n_frozen_cores_per_irrep=n_frozen_cores_per_irrep)
+
+    data_to_be_unpacked = get_complex_properties(kf_file, restricted_calc)
+
     if restricted_calc:
         data_to_be_unpacked = {key: value[SpinTypes.A] for key, value in data_to_be_unpacked.items()}  # Here we want to get rid of the spin key because restricted fragments don't have spin
         return RestrictedComplexData(name=name, **data_to_be_unpacked, irreps=irreps, n_frozen_cores_per_irrep=n_frozen_cores_per_irrep)
@@ -45,13 +55,14 @@ class ComplexData:
         - Occupations
         - Number of frozen cores per irrep
 
-    See the specific :Complex: classes for more information about the format of data stored in the dictionaries.
+    See the specific :Complex: classes for more information about the format of the data. The properties are stored as :IrrepArray: objects,
+    which can be indexed like the dictionaries below. Dictionaries that are passed to the constructor are converted.
     """
 
     name: str
     irreps: list[str]
-    orb_energies: RestrictedProperty
-    occupations: RestrictedProperty
+    orb_energies: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    occupations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
     n_frozen_cores_per_irrep: dict[str, int]
 
 
@@ -89,5 +100,5 @@ class UnrestrictedComplexData(ComplexData):
         - Number of frozen cores per irrep: {"IRREP1": n_frozen_cores, "IRREP2": n_frozen_cores, ...}
     """
 
-    orb_energies: UnrestrictedProperty
-    occupations: UnrestrictedProperty
+    orb_energies: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    occupations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
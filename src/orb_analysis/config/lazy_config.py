@@ -0,0 +1,106 @@
+"""
+Module containing the process-wide config of the package (`orb_config`) and context-scoped overrides of its settings.
+
+The :OrbAnalysisConfig: is loaded (from config.toml with pydantic-settings) on the first access of one of its settings instead of at import time, and only once per process.
+`orb_config` is a stand-in that returns the sections of the config (e.g. `orb_config.rkf_reading`), so it can be imported and used as before:
+    - `orb_config.rkf_reading.orbital_energy_unit = "hartree"` changes the setting for the whole process (and is the default for all analyses)
+    - `config_override(rkf_reading={"orbital_energy_unit": "hartree"})` changes the settings only within the context (a `with` block or a decorated function)
+
+The overrides are stored in a context variable, such that analyses with different settings can run concurrently in threads or asyncio tasks without seeing each other's settings.
+Note that a new thread starts with the process-wide settings, so the override should be entered in the thread itself (or the function should be wrapped with `bind_config`).
+The loaders of the lazy mode of `create_calc_analyser` are bound to the overrides at the time the analyzer is created.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Iterator, TypeVar
+
+if TYPE_CHECKING:
+    from orb_analysis.config.toml_config import OrbAnalysisConfig
+
+T = TypeVar("T")
+
+_config: OrbAnalysisConfig | None = None
+_config_lock = threading.Lock()
+
+# Format: {section name: settings} of the sections that are overridden in the current context
+_overrides: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar("orb_config_overrides", default={})
+
+
+# --------------------Classes-------------------- #
+
+
+class _ConfigProxy:
+    """Stand-in for the :OrbAnalysisConfig: that returns the overridden section in the current context (see `config_override`), or else the section of the process-wide config."""
+
+    def __getattr__(self, name: str) -> Any:
+        overrides = _overrides.get()
+        if name in overrides:
+            return overrides[name]
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_config(), name, value)
+
+    def __repr__(self) -> str:
+        return f"orb_config({get_config()!r}, overridden_sections={list(_overrides.get())})"
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _call_with_overrides(overrides: dict[str, Any], func: Callable[..., T], *args, **kwargs) -> T:
+    token = _overrides.set(overrides)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _overrides.reset(token)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def get_config() -> OrbAnalysisConfig:
+    """Returns the process-wide config, which is loaded on the first call. Note that it does not include the overrides of the current context (use `orb_config` for that)."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                from orb_analysis.config.toml_config import OrbAnalysisConfig
+
+                _config = OrbAnalysisConfig()
+    return _config
+
+
+@contextlib.contextmanager
+def config_override(**sections: dict[str, Any]) -> Iterator[None]:
+    """
+    Overrides settings of the config within the context. The new settings are validated when the context is entered. Example:
+        with config_override(rkf_reading={"orbital_energy_unit": "hartree", "orbital_energy_key": "energy"}):
+            analyzer = create_calc_analyser("adf.rkf")
+
+    The overridden sections are copies, so changing a setting (e.g. `orb_config.rkf_reading.memory_map = False`) within the context does not change the process-wide config.
+    It can also be used as decorator, e.g. `@config_override(rkf_reading={"orbital_energy_unit": "hartree"})`.
+    """
+    overrides = dict(_overrides.get())
+    for name, settings in sections.items():
+        section = overrides.get(name, getattr(get_config(), name))
+        overrides[name] = type(section)(**{**section.model_dump(), **settings})
+
+    token = _overrides.set(overrides)
+    try:
+        yield
+    finally:
+        _overrides.reset(token)
+
+
+def bind_config(func: Callable[..., T]) -> Callable[..., T]:
+    """Returns the function bound to the config overrides of the current context, e.g. for functions that are called later or in another thread. The result can be pickled if the function can."""
+    return functools.partial(_call_with_overrides, _overrides.get(), func)
+
+
+orb_config: OrbAnalysisConfig = _ConfigProxy()  # type: ignore # Behaves as the config, of which the sections are resolved on access
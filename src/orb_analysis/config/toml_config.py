@@ -8,6 +8,7 @@ from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, TomlConf
 class RKFReadingSettings(BaseSettings, validate_assignment=True):
     orbital_energy_unit: str = Field("eV", description="Unit of orbital energies that are extracted from the rkf file")
     orbital_energy_key: str = Field("escale", description="variable in the SFO section of a rkf file that is used. Other options are 'energy' and 'site-energies'")
+    memory_map: bool = Field(True, description="Whether the rkf file is read with the memory-mapped reader of this package. If False (or if memory mapping fails), the plams KFFile is used")
 
     @field_validator("orbital_energy_unit")
     @classmethod
@@ -24,8 +25,22 @@ class RKFReadingSettings(BaseSettings, validate_assignment=True):
         return value
 
 
+class ImageCacheSettings(BaseSettings, validate_assignment=True):
+    enabled: bool = Field(True, description="Whether rendered orbital images are stored in (and reused from) the image cache")
+    directory: str = Field("~/.cache/orb_analysis/images", description="Directory of the image cache")
+    max_bytes: int = Field(2 * 1024**3, description="Maximum total size of the cached images. The least recently used images are removed when it is exceeded")
+
+    @field_validator("max_bytes")
+    @classmethod
+    def validate_max_bytes(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError(f"Invalid size {value}. Must be a positive number of bytes")
+        return value
+
+
 class OrbAnalysisConfig(BaseSettings):
     rkf_reading: RKFReadingSettings = RKFReadingSettings()  # type: ignore # Gets instantiated in the constructor
+    image_cache: ImageCacheSettings = ImageCacheSettings()  # type: ignore # Gets instantiated in the constructor
 
     @classmethod
     def settings_customise_sources(
@@ -37,6 +52,3 @@ class OrbAnalysisConfig(BaseSettings):
         file_secret_settings: PydanticBaseSettingsSource,
     ) -> Tuple[PydanticBaseSettingsSource, ...]:
         return (TomlConfigSettingsSource(settings_cls, toml_file=pl.Path(__file__).resolve().parent / "config.toml"), init_settings, env_settings, dotenv_settings, file_secret_settings)
-
-
-orb_config = OrbAnalysisConfig()
@@ -1,9 +1,15 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
 from enum import StrEnum, auto
-from typing import Annotated, Literal, TypeVar
+from typing import Annotated, Any, Callable, Iterator, Literal, Sequence, TypeVar
 
+import attrs
 import numpy as np
 import numpy.typing as npt
 
+from orb_analysis.config.lazy_config import bind_config
+
 DType = TypeVar("DType", bound=np.generic)
 Array1D = Annotated[npt.NDArray[DType], Literal[1]]
 Array2D = Annotated[npt.NDArray[DType], Literal[2]]
@@ -20,6 +26,158 @@ UnrestrictedProperty = TypeAlias = dict[str, dict[str, Array1D[np.float64]]]
 UnrestrictedPropertyDict = TypeAlias = dict[str, dict[str, dict[str, Array1D[np.float64]]]]
 
 
+@attrs.define(eq=False)
+class IrrepArray(Mapping):
+    """
+    Ragged array that stores a property (e.g. orbital energies) of all irreps in one contiguous buffer. It replaces the {irrep: [data]} and {spin: {irrep: [data]}} dictionaries.
+        - data: buffer with shape (n_spins, n_values), the values of each irrep are stored consecutively
+        - irreps: order of the irreps in the buffer
+        - offsets: the values of irreps[i] are stored in data[:, offsets[i]:offsets[i + 1]]
+        - spins: labels of the spin axis, None for restricted data (one spin)
+
+    Dict-style indexing is kept, and each lookup returns a view (no copy) of the buffer:
+        - restricted: array[irrep] returns the values of the irrep
+        - unrestricted: array[spin] returns a restricted :IrrepArray: of that spin, so array[spin][irrep] returns the values of the irrep
+
+    Whole-property operations can be done on the buffer at once, e.g. `array.flat` or `array.with_data(array.data * factor)`.
+    """
+
+    data: npt.NDArray[Any]
+    irreps: tuple[str, ...] = attrs.field(converter=tuple)
+    offsets: Array1D[np.intp]
+    spins: tuple[str, ...] | None = attrs.field(default=None, converter=attrs.converters.optional(tuple))
+    _irrep_positions: dict[str, int] = attrs.field(default=None, repr=False)
+
+    def __attrs_post_init__(self):
+        if self._irrep_positions is None:
+            self._irrep_positions = {irrep: i for i, irrep in enumerate(self.irreps)}
+
+    # --------------------Constructors-------------------- #
+
+    @classmethod
+    def from_labels(cls, data: npt.ArrayLike, labels: Sequence[str], irreps: Sequence[str] | None = None, spins: Sequence[str] | None = None) -> IrrepArray:
+        """
+        Creates the array from values with an irrep label per value, e.g. ([1.0, 2.0, 3.0], ["A1", "A2", "A1"]) -> {"A1": [1.0, 3.0], "A2": [2.0]}.
+        `data` has shape (n_values,) or (n_spins, n_values) if `spins` is given. The irreps are ordered by first appearance, unless `irreps` is given.
+        The values are sorted with one stable argsort, so that the order within each irrep is preserved. Raises a ValueError if `irreps` are not exactly the irreps of the labels.
+        """
+        data = np.atleast_2d(np.asarray(data))
+        unique_irreps, first_indices, inverse, counts = np.unique(np.asarray(labels, dtype=str), return_index=True, return_inverse=True, return_counts=True)
+
+        # Rank of each unique irrep in the requested order (by default the order of first appearance)
+        if irreps is None:
+            order = np.argsort(first_indices, kind="stable")
+        else:
+            positions = {irrep: i for i, irrep in enumerate(unique_irreps.tolist())}
+            if len(irreps) != len(positions) or set(irreps) != set(positions):
+                raise ValueError(f"The irreps {list(irreps)} do not match the irreps of the labels {list(positions)}")
+            order = np.array([positions[irrep] for irrep in irreps], dtype=np.intp)
+        rank = np.empty(len(unique_irreps), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+
+        sorted_data = data[:, np.argsort(rank[inverse.ravel()], kind="stable")]
+        offsets = np.concatenate([[0], np.cumsum(counts[order])]).astype(np.intp)
+        return cls(data=sorted_data, irreps=unique_irreps[order].tolist(), offsets=offsets, spins=spins)
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping) -> IrrepArray:
+        """
+        Creates the array from a {irrep: [data]} or {spin: {irrep: [data]}} mapping. All spins must have the same irreps and number of values.
+        :IrrepArray: and :LazySpinArray: objects are returned as is, so that this method can be used as converter of attrs fields.
+        """
+        if isinstance(mapping, (IrrepArray, LazySpinArray)):
+            return mapping  # type: ignore
+
+        if not any(isinstance(value, Mapping) for value in mapping.values()):
+            irreps = list(mapping)
+            counts = [len(mapping[irrep]) for irrep in irreps]
+            data = np.concatenate([np.asarray(mapping[irrep]) for irrep in irreps]) if irreps else np.empty(0)
+            return cls(data=data[np.newaxis, :], irreps=irreps, offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.intp))
+
+        spins = [str(spin) for spin in mapping]
+        per_spin = [cls.from_mapping(mapping[spin]) for spin in mapping]
+        irreps, offsets = per_spin[0].irreps, per_spin[0].offsets
+        if any(array.irreps != irreps or not np.array_equal(array.offsets, offsets) for array in per_spin):
+            raise ValueError(f"All spins must have the same irreps and number of values per irrep. Spins: {spins}")
+        return cls(data=np.concatenate([array.data for array in per_spin]), irreps=irreps, offsets=offsets, spins=spins)
+
+    # --------------------Mapping Interface-------------------- #
+
+    def __getitem__(self, key: str) -> Any:
+        if self.spins is not None:
+            try:
+                i = self.spins.index(key)
+            except ValueError:
+                raise KeyError(key) from None
+            return IrrepArray(data=self.data[i : i + 1], irreps=self.irreps, offsets=self.offsets, irrep_positions=self._irrep_positions)  # NOQA: E203
+
+        i = self._irrep_positions[key]
+        return self.data[0, self.offsets[i] : self.offsets[i + 1]]  # NOQA: E203
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.spins if self.spins is not None else self.irreps)
+
+    def __len__(self) -> int:
+        return len(self.spins if self.spins is not None else self.irreps)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        other = IrrepArray.from_mapping(other)
+        return self.irreps == other.irreps and self.spins == other.spins and np.array_equal(self.offsets, other.offsets) and np.array_equal(self.data, other.data)
+
+    # --------------------Vectorized Access-------------------- #
+
+    @property
+    def counts(self) -> Array1D[np.intp]:
+        """Number of values of each irrep."""
+        return np.diff(self.offsets)
+
+    @property
+    def flat(self) -> npt.NDArray[Any]:
+        """All values in the order of `irreps`, with shape (n_values,) for restricted and (n_spins, n_values) for unrestricted data."""
+        return self.data[0] if self.spins is None else self.data
+
+    def labels(self) -> Array1D[np.str_]:
+        """Irrep label of each value in `flat`."""
+        return np.repeat(np.asarray(self.irreps, dtype=str), self.counts)
+
+    def with_data(self, data: npt.ArrayLike) -> IrrepArray:
+        """Returns a new array with the same layout (irreps, spins) but different values, e.g. `array.with_data(array.data * factor)`."""
+        data = np.asarray(data).reshape(self.data.shape)
+        return IrrepArray(data=data, irreps=self.irreps, offsets=self.offsets, spins=self.spins, irrep_positions=self._irrep_positions)
+
+
+class LazySpinArray(Mapping):
+    """
+    Mapping of {spin: :IrrepArray:} of which the array of each spin is only created (i.e. read from the rkf file) the first time the spin is accessed.
+    It is used for unrestricted data in the lazy mode of `create_calc_analyser`, and supports the same [spin][irrep] indexing as an unrestricted :IrrepArray:.
+    """
+
+    def __init__(self, loaders: dict[str, Callable[[], Mapping]]):
+        # The loaders read the rkf file with the config overrides that are active when the array is created (see `orb_analysis.config.lazy_config`)
+        self._loaders = {str(spin): bind_config(loader) for spin, loader in loaders.items()}
+        self._arrays: dict[str, IrrepArray] = {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(spins={list(self._loaders)}, loaded_spins={self.loaded_spins})"
+
+    @property
+    def loaded_spins(self) -> list[str]:
+        return list(self._arrays)
+
+    def __getitem__(self, spin: str) -> IrrepArray:
+        if spin not in self._arrays:
+            self._arrays[str(spin)] = IrrepArray.from_mapping(self._loaders[spin]())
+        return self._arrays[spin]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+
 class SpinTypes(StrEnum):
     A = "A"
     B = "B"
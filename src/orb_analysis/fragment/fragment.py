@@ -2,22 +2,30 @@
 Module containing the :Fragment: class. It stores information about fragments present in fragment analysis calculation.
 """
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from typing import TYPE_CHECKING, Sequence
 
 import attrs
 import numpy as np
-from scm.plams import KFFile
 
 from orb_analysis.analyzer.calc_info import CalcInfo
-from orb_analysis.custom_types import RestrictedProperty, SpinTypes
+from orb_analysis.analyzer.overlap_cache import OverlapTriangleCache
+from orb_analysis.custom_types import Array1D, Array2D, IrrepArray, SpinTypes
 from orb_analysis.fragment.fragmentdata import FragmentData, RestrictedFragmentData, UnrestrictedFragmentData, create_restricted_fragment_data, create_unrestricted_fragment_data
 from orb_analysis.orb_functions.orb_functions import filter_orbitals
+from orb_analysis.orb_functions.sfo_functions import get_sfo_section_index
 from orb_analysis.orbital.orbital import SFO
+from orb_analysis.profiling import profiled
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 # --------------------Interface Function(s)-------------------- #
 
 
+@profiled("fragment")
 def create_restricted_fragment(frag_index: int, kf_file: KFFile, calc_info: CalcInfo):
     """
     Creates a fragment object from the kf_file. The type of fragment object depends on the calculation type (restricted or unrestricted).
@@ -26,29 +34,32 @@ def create_restricted_fragment(frag_index: int, kf_file: KFFile, calc_info: Calc
     return RestrictedFragment(fragment_data=fragment_data, calc_info=calc_info)
 
 
-def create_unrestricted_fragment(frag_index: int, kf_file: KFFile, calc_info: CalcInfo):
+@profiled("fragment")
+def create_unrestricted_fragment(frag_index: int, kf_file: KFFile, calc_info: CalcInfo, lazy: bool = False):
     """
     Creates a fragment object from the kf_file. The type of fragment object depends on the calculation type (restricted or unrestricted).
+    If `lazy` is True, the SFO data of each spin is only read the first time that spin is accessed.
     """
-    fragment_data = create_unrestricted_fragment_data(kf_file, frag_index)
+    fragment_data = create_unrestricted_fragment_data(kf_file, frag_index, lazy)
     return UnrestrictedFragment(fragment_data=fragment_data, calc_info=calc_info)
 
 
 # ------------------- Helper Functions -------------------- #
 
 
-@lru_cache(maxsize=1)
-def get_overlap_matrix(kf_file: KFFile, irrep: str):
+def read_overlap_triangle(kf_file: KFFile, irrep: str, spin: str = SpinTypes.A, overlap_cache: OverlapTriangleCache | None = None) -> Array1D[np.float64]:
     """
-    Returns the overlap matrix from the kf file as a numpy array.
-    Note that this is a seperate function due to memory considerations as the matrix can be quite large.
-    For that reason, @lru_cache is used here.
+    Returns the packed lower triangle of the overlap matrix of one irrep as a numpy array.
+    Note that the matrix can be quite large. For that reason, the triangle is taken from the :OverlapTriangleCache: of the analyzer if one is given.
     """
-    np.array(kf_file.read(irrep, "S-CoreSFO"))
+    if overlap_cache is not None:
+        return overlap_cache.get(irrep, spin)
+
+    variable = f"S-CoreSFO_{spin}" if spin == SpinTypes.B else "S-CoreSFO"
+    return np.asarray(kf_file.read(irrep, variable), dtype=np.float64)
 
 
-@lru_cache(maxsize=2)
-def get_frag_sfo_index_mapping_to_total_sfo_index(kf_file: KFFile, frozen_cores_per_irrep_tuple: tuple[str, int], uses_symmetry: bool) -> dict[int, dict[str, list[int]]]:
+def get_frag_sfo_index_mapping_to_total_sfo_index(kf_file: KFFile, frozen_cores_per_irrep: dict[str, int], uses_symmetry: bool) -> dict[int, dict[str, list[int]]]:
     """
     Function that creates a mapping (in the form of a nested dictionary) between the SFO indices of the fragments and the total SFO indices.
     The dict looks like this for a c3v calculation with two fragments:
@@ -71,34 +82,16 @@ def get_frag_sfo_index_mapping_to_total_sfo_index(kf_file: KFFile, frozen_cores_
     It also takes into account the different irreps, such as 15_A1 may be 15 in fragment 1 and 41 in fragment 2.
 
     """
-    sfo_indices: list[int] = kf_file.read("SFOs", "isfo", return_as_list=True)  # type: ignore
-    frag_indices: list[int] = kf_file.read("SFOs", "fragment", return_as_list=True)  # type: ignore
-    irreps_each_sfo = kf_file.read("SFOs", "subspecies", return_as_list=True).split()  # type: ignore
-    frozen_cores_per_irrep: dict[str, int] = dict(frozen_cores_per_irrep_tuple)  # type: ignore # frozen_cores_per_irrep is a tuple, but we want a dict
-
-    mapping_dict = {}
+    sfo_section_index = get_sfo_section_index(kf_file)
 
-    # if the calculation did not use uses_symmetry, we can skip the uses_symmetry part
-    if not uses_symmetry:
-        for sfo_index, frag_index in zip(sfo_indices, frag_indices):
-            if frag_index not in mapping_dict:
-                mapping_dict[frag_index] = {"A": []}
+    # Note: index is shifted also by the frozen core orbitals. If the calculation did not use symmetry, all SFOs belong to the "A" irrep
+    total_sfo_indices = sfo_section_index.isfo + sfo_section_index.frozen_core_shifts(frozen_cores_per_irrep)
+    irreps_each_sfo = sfo_section_index.irreps if uses_symmetry else np.full(sfo_section_index.n_sfos, "A")
 
-            frozen_core_shift = frozen_cores_per_irrep["A"]
-            mapping_dict[frag_index]["A"].append(sfo_index + frozen_core_shift)
-        return mapping_dict
-
-    # Otherwise, we have to take into account the irreps
-    for sfo_index, frag_index, irrep in zip(sfo_indices, frag_indices, irreps_each_sfo):
-        if frag_index not in mapping_dict:
-            mapping_dict[frag_index] = {}
-
-        if irrep not in mapping_dict[frag_index]:
-            mapping_dict[frag_index][irrep] = []
-
-        # Note: index is shifted also by the frozen core orbitals
-        frozen_core_shift = frozen_cores_per_irrep[irrep] if irrep in frozen_cores_per_irrep else 0
-        mapping_dict[frag_index][irrep].append(sfo_index + frozen_core_shift)
+    mapping_dict = {}
+    for frag_index in dict.fromkeys(sfo_section_index.fragment.tolist()):
+        in_frag = sfo_section_index.fragment == frag_index
+        mapping_dict[frag_index] = {irrep: total_sfo_indices[in_frag & (irreps_each_sfo == irrep)].tolist() for irrep in dict.fromkeys(irreps_each_sfo[in_frag].tolist())}
 
     return mapping_dict
 
@@ -114,32 +107,90 @@ class Fragment(ABC):
 
     fragment_data: FragmentData
     calc_info: CalcInfo
+    sfo_index_mapping: dict[int, dict[str, list[int]]] | None = attrs.field(default=None, kw_only=True)  # see `get_frag_sfo_index_mapping_to_total_sfo_index`, created on first use
 
     @property
     def name(self):
         return self.fragment_data.name
 
-    def _get_overlap(self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int, spin: str = SpinTypes.A) -> float:
+    def get_sfo_index_mapping(self, kf_file: KFFile, uses_symmetry: bool) -> dict[int, dict[str, list[int]]]:
+        """Returns the mapping between the SFO indices of the fragments and the total SFO indices, shifted by the frozen cores of this fragment."""
+        if self.sfo_index_mapping is None:
+            self.sfo_index_mapping = get_frag_sfo_index_mapping_to_total_sfo_index(kf_file, self.fragment_data.n_frozen_cores_per_irrep, uses_symmetry)
+        return self.sfo_index_mapping
+
+    def _get_overlap(
+        self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int, spin: str = SpinTypes.A, overlap_cache: OverlapTriangleCache | None = None
+    ) -> float:
         # Note: the overlap matrix is stored in the rkf file as a lower triangular matrix. Thus, the index is calculated as follows:
         # index = max_index * (max_index - 1) // 2 + min_index - 1
-        frozen_cores_per_irrep = tuple(sorted(self.fragment_data.n_frozen_cores_per_irrep.items()))
-        index_mapping = get_frag_sfo_index_mapping_to_total_sfo_index(kf_file, frozen_cores_per_irrep, uses_symmetry)
+        index_mapping = self.get_sfo_index_mapping(kf_file, uses_symmetry)
         index1 = index_mapping[1][irrep1][index1 - 1]
         index2 = index_mapping[2][irrep2][index2 - 1]
 
         min_index, max_index = sorted([index1, index2])
         overlap_index = max_index * (max_index - 1) // 2 + min_index - 1
-        variable = f"S-CoreSFO_{spin}" if spin == SpinTypes.B else "S-CoreSFO"
-        overlap_matrix = np.array(kf_file.read(irrep1, variable))
+        overlap_matrix = read_overlap_triangle(kf_file, irrep1, spin, overlap_cache)
         return overlap_matrix[overlap_index]
 
-    def _get_sfos(self, orb_range: tuple[int, int], orb_irrep: str | None, spin: str, orb_energies: RestrictedProperty, occupations: RestrictedProperty, gross_pop: RestrictedProperty) -> list[SFO]:
+    @profiled("overlap matrix")
+    def get_overlap_matrix(
+        self,
+        uses_symmetry: bool,
+        kf_file: KFFile,
+        frag1_sfos: Sequence[SFO],
+        frag2_sfos: Sequence[SFO],
+        spin: str = SpinTypes.A,
+        mask_virtual_pairs: bool = False,
+        overlap_cache: OverlapTriangleCache | None = None,
+    ) -> Array2D[np.float64]:
+        """
+        Returns the overlap matrix between the frag1 SFOs (rows) and the frag2 SFOs (columns) in a.u.
+        It gives the same values as calling `get_overlap` for every pair, but reads the packed overlap triangle only once per irrep.
+
+        Cells of which the irreps do not match are 0.0. If `mask_virtual_pairs` is True, LUMO-LUMO cells are 0.0 as well because they have no physical meaning.
+        """
+        index_mapping = self.get_sfo_index_mapping(kf_file, uses_symmetry)
+
+        overlap_matrix = np.zeros(shape=(len(frag1_sfos), len(frag2_sfos)))
+        frag1_irreps = np.array([sfo.irrep for sfo in frag1_sfos])
+        frag2_irreps = np.array([sfo.irrep for sfo in frag2_sfos])
+        frag1_indices = np.array([sfo.index for sfo in frag1_sfos], dtype=np.int64)
+        frag2_indices = np.array([sfo.index for sfo in frag2_sfos], dtype=np.int64)
+
+        # Only blocks of the same irrep have a nonzero overlap, so the triangle is read once per irrep and gathered with one fancy-index
+        for irrep in dict.fromkeys(frag1_irreps.tolist()):
+            rows = np.flatnonzero(frag1_irreps == irrep)
+            columns = np.flatnonzero(frag2_irreps == irrep)
+            if columns.size == 0:
+                continue
+
+            section = irrep if uses_symmetry else "A"
+            index1 = np.asarray(index_mapping[1][section], dtype=np.int64)[frag1_indices[rows] - 1]
+            index2 = np.asarray(index_mapping[2][section], dtype=np.int64)[frag2_indices[columns] - 1]
+
+            # Note: the overlap matrix is stored in the rkf file as a lower triangular matrix. Thus, the index is calculated as follows:
+            # index = max_index * (max_index - 1) // 2 + min_index - 1
+            min_index, max_index = np.minimum.outer(index1, index2), np.maximum.outer(index1, index2)
+            overlap_indices = max_index * (max_index - 1) // 2 + min_index - 1
+
+            packed_triangle = read_overlap_triangle(kf_file, section, spin, overlap_cache)
+            overlap_matrix[np.ix_(rows, columns)] = packed_triangle[overlap_indices]
+
+        if mask_virtual_pairs:
+            frag1_virtual = np.array([sfo.occupation < 1e-6 for sfo in frag1_sfos], dtype=bool)
+            frag2_virtual = np.array([sfo.occupation < 1e-6 for sfo in frag2_sfos], dtype=bool)
+            overlap_matrix[np.outer(frag1_virtual, frag2_virtual)] = 0.0
+
+        return overlap_matrix
+
+    @profiled("sfos")
+    def _get_sfos(self, orb_range: tuple[int, int], orb_irrep: str | None, spin: str, orb_energies: IrrepArray, occupations: IrrepArray, gross_pop: IrrepArray) -> list[SFO]:
         max_occupied_orbitals, max_unoccupied_orbitals = orb_range
         irreps = [orb_irrep.upper()] if orb_irrep is not None else self.fragment_data.frag_irreps
         sfos: list[SFO] = []
 
-        tuple_n_frozen_cores_irrep = tuple(sorted(self.fragment_data.n_frozen_cores_per_irrep.items()))
-        absolute_index_mapping = get_frag_sfo_index_mapping_to_total_sfo_index(self.calc_info.kf_file, tuple_n_frozen_cores_irrep, self.calc_info.symmetry)
+        absolute_index_mapping = self.get_sfo_index_mapping(self.calc_info.kf_file, self.calc_info.symmetry)
 
         # Then, flatten the data to a list of SFOs
         for irrep in self.fragment_data.frag_irreps:
@@ -179,14 +230,14 @@ class Fragment(ABC):
 class RestrictedFragment(Fragment):
     fragment_data: RestrictedFragmentData
 
-    def get_overlap(self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int) -> float:
+    def get_overlap(self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int, overlap_cache: OverlapTriangleCache | None = None) -> float:
         if irrep1 != irrep2:
             return 0.0
 
         if not uses_symmetry:
             irrep1, irrep2 = "A", "A"
 
-        return self._get_overlap(uses_symmetry, kf_file, irrep1, index1, irrep2, index2, SpinTypes.A)
+        return self._get_overlap(uses_symmetry, kf_file, irrep1, index1, irrep2, index2, SpinTypes.A, overlap_cache)
 
     def get_orbital_energy(self, irrep: str, index: int, spin: str = SpinTypes.A) -> float:
         return self.fragment_data.orb_energies[irrep][index - 1]
@@ -210,13 +261,13 @@ class RestrictedFragment(Fragment):
 class UnrestrictedFragment(Fragment):
     fragment_data: UnrestrictedFragmentData
 
-    def get_overlap(self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int, spin: str) -> float:
+    def get_overlap(self, uses_symmetry: bool, kf_file: KFFile, irrep1: str, index1: int, irrep2: str, index2: int, spin: str, overlap_cache: OverlapTriangleCache | None = None) -> float:
         if irrep1 != irrep2:
             return 0.0
 
         if not uses_symmetry:
             irrep1, irrep2 = "A", "A"
-        return self._get_overlap(uses_symmetry, kf_file, irrep1, index1, irrep2, index2, spin)
+        return self._get_overlap(uses_symmetry, kf_file, irrep1, index1, irrep2, index2, spin, overlap_cache)
 
     def get_orbital_energy(self, irrep: str, index: int, spin: str) -> float:
         return self.fragment_data.orb_energies[spin][irrep][index - 1]
@@ -1,23 +1,35 @@
-﻿from abc import ABC
+﻿from __future__ import annotations
+
+from abc import ABC
+from functools import partial
+from typing import TYPE_CHECKING
 
 import attrs
-import numpy as np
-from scm.plams import KFFile
 
-from orb_analysis.custom_types import Array1D, RestrictedProperty, SpinTypes, UnrestrictedProperty
-from orb_analysis.orb_functions.sfo_functions import get_frag_name, get_fragment_properties, get_frozen_cores_per_irrep, get_gross_populations, get_ordered_irreps_of_one_frag
+from orb_analysis.custom_types import IrrepArray, LazySpinArray, SpinTypes
+from orb_analysis.orb_functions.sfo_functions import (
+    RESTRICTED_KEY_FUNC_MAPPING,
+    get_frag_name,
+    get_fragment_properties,
+    get_fragment_property,
+    get_frozen_cores_per_irrep,
+    get_gross_populations,
+    get_ordered_irreps_of_one_frag,
+)
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
-# --------------------Helper Functions-------------------- #
+# --------------------Helper Function(s)-------------------- #
 
 
-def flatten_data(data: RestrictedProperty, ordered_irreps: list[str]) -> Array1D[np.float64]:
-    """Flattens the data from a dictionary with {irrep: [data]} to a list with [data]."""
-    try:
-        return np.concatenate([data[irrep] for irrep in ordered_irreps])
-    except KeyError:
-        return data["A"]  # When the complex has has "nosym"
+def _get_gross_populations_one_spin(kf_file: KFFile, frag_index: int, spin: str):
+    return get_gross_populations(kf_file, frag_index)[spin]
 
 
+def _get_fragment_property_one_spin(kf_file: KFFile, frag_index: int, property: str, spin: str) -> IrrepArray:
+    return get_fragment_property(kf_file, frag_index, property, spins=[spin])[spin]
+
 # --------------------Interface Function(s)-------------------- #
 
 
@@ -35,7 +47,7 @@ def create_restricted_fragment_data(kf_file: KFFile, frag_index: int):
 
     # Get regular properties such as occupations and orbital energies
     # the returned data is a dictionary with {property: {spin: {irrep: [data]}}} with property being either "orb_energies" or "occupations" and spin being either "A" or "B" (see `SpinTypes`)
-    data_dic_to_be_unpacked = get_fragment_properties(kf_file, frag_index)
+    data_dic_to_be_unpacked = get_fragment_properties(kf_file, frag_index, spins=[SpinTypes.A])  # Restricted fragments only have the "A" spin
     data_dic_to_be_unpacked = {key: value[SpinTypes.A] for key, value in data_dic_to_be_unpacked.items()}  # Here we want to get rid of the spin key because restricted fragments don't have spin
 
     # Gross populations is special due to the frozen cores, so we have to do some extra work here
@@ -47,9 +59,10 @@ def create_restricted_fragment_data(kf_file: KFFile, frag_index: int):
     return new_fragment_data
 
 
-def create_unrestricted_fragment_data(kf_file: KFFile, frag_index: int):
+def create_unrestricted_fragment_data(kf_file: KFFile, frag_index: int, lazy: bool = False):
     """
     Creates an unrestricted fragment data object from the kf_file.
+    If `lazy` is True, the properties of each spin are only read the first time that spin is accessed (see :LazySpinArray:).
     """
     data_dic_to_be_unpacked = {}
 
@@ -58,9 +71,12 @@ def create_unrestricted_fragment_data(kf_file: KFFile, frag_index: int):
 
     n_frozen_cores_per_irrep = get_frozen_cores_per_irrep(kf_file, frag_index)
 
-    data_dic_to_be_unpacked = get_fragment_properties(kf_file, frag_index)
-
-    data_dic_to_be_unpacked["gross_populations"] = get_gross_populations(kf_file, frag_index)
+    if lazy:
+        data_dic_to_be_unpacked = {prop: LazySpinArray({spin: partial(_get_fragment_property_one_spin, kf_file, frag_index, prop, spin) for spin in SpinTypes}) for prop in RESTRICTED_KEY_FUNC_MAPPING}
+        data_dic_to_be_unpacked["gross_populations"] = LazySpinArray({spin: partial(_get_gross_populations_one_spin, kf_file, frag_index, spin) for spin in SpinTypes})
+    else:
+        data_dic_to_be_unpacked = get_fragment_properties(kf_file, frag_index)
+        data_dic_to_be_unpacked["gross_populations"] = get_gross_populations(kf_file, frag_index)
 
     frag_irreps = get_ordered_irreps_of_one_frag(kf_file, frag_index)
 
@@ -80,14 +96,15 @@ class FragmentData(ABC):
         - Occupations
         - Number of frozen cores per irrep
 
-    See the specific fragment classes for more information about the format of data stored in the dictionaries.
+    See the specific fragment classes for more information about the format of the data. The properties are stored as :IrrepArray: objects,
+    which can be indexed like the dictionaries in the examples. Dictionaries that are passed to the constructor are converted.
     """
 
     name: str
     frag_index: int  # 1 or 2
-    orb_energies: RestrictedProperty
-    occupations: RestrictedProperty
-    gross_populations: RestrictedProperty
+    orb_energies: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    occupations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    gross_populations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
     n_frozen_cores_per_irrep: dict[str, int]
     frag_irreps: list[str]
 
@@ -151,15 +168,16 @@ class UnrestrictedFragmentData(FragmentData):
         The frozen cores per irrep format remains the same
     """
 
-    orb_energies: UnrestrictedProperty
-    gross_populations: UnrestrictedProperty
-    occupations: UnrestrictedProperty
+    orb_energies: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    gross_populations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
+    occupations: IrrepArray = attrs.field(converter=IrrepArray.from_mapping)
 
 
 def main():
     import pathlib as pl
 
     from numpy import set_printoptions
+    from scm.plams import KFFile
 
     set_printoptions(precision=3, suppress=True)
 
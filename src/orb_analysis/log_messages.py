@@ -1,6 +1,8 @@
 ﻿"""Module containing messages for logging and providing feedback to the user."""
 
+import logging
 import textwrap
+import threading
 
 from orb_analysis.custom_types import SFOInteractionTypes
 
@@ -13,6 +15,39 @@ HOMO_LUMO_INTERACTION_NOTE = "HOMO-LUMO or LUMO-HOMO interactions: favorable orb
 SFO_ORDER_NOTE = "Fragment 1 SFOs are on the vertical; Fragment 2 SFOs are on the horizontal"
 
 
+# --------------------Logger-------------------- #
+
+
+class DuplicateMessageFilter(logging.Filter):
+    """Filter that lets each message (per level) through only once, such that diagnostics in hot paths (e.g. for each fragment, spin or irrep) are not repeated."""
+
+    def __init__(self):
+        super().__init__()
+        self._seen: set[tuple[int, str]] = set()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.getMessage())
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seen.clear()
+
+
+# Logger of the package. Without a configured handler, warnings are written to stderr (see `logging.lastResort`)
+logger = logging.getLogger("orb_analysis")
+duplicate_message_filter = DuplicateMessageFilter()
+logger.addFilter(duplicate_message_filter)
+
+
+# --------------------Messages-------------------- #
+
+
 def format_message(text, width=130):
     return "\n" + textwrap.fill(text, width) + "\n"
 
@@ -1,26 +1,107 @@
 ﻿import argparse
+import contextlib
+import json
 import pathlib as pl
+import sys
+
 from orb_analysis.analyzer.calc_analyzer import create_calc_analyser  # replace "some_module" with the actual module name
+from orb_analysis.profiling import Profiler, profile, span
+
+
+def batch_main(argv: list[str]):
+    parser = argparse.ArgumentParser(prog="orb_analysis batch", description="Analyzes many adf.rkf files in parallel.")
+    parser.add_argument("paths", type=str, nargs="+", help="The calculation files (adf.rkf), directories (searched recursively) or glob patterns to analyze")
+    parser.add_argument("--pattern", type=str, default="*adf.rkf", help='The pattern of the rkf files that are searched for in directories. Default is "*adf.rkf"')
+    parser.add_argument("--spin", type=str, default="A", help='The spin to analyze. Options are "A" and "B"', required=False)
+    parser.add_argument("--orb_range", type=int, nargs=2, default=(6, 6), help="The range of orbitals to analyze from HOMO-x - LUMO+x, e.g. --orb_range 5, 5", required=False)
+    parser.add_argument("--irrep", type=str, help="The irrep to analyze", required=False)
+    parser.add_argument("--workers", type=int, help="The maximum number of worker processes. Default is the number of CPUs", required=False)
+    parser.add_argument("--unordered", action="store_true", help="Write the results as soon as they are finished instead of in the order of the files")
+    parser.add_argument("--output_dir", type=str, help="Directory to write the analysis of each file to ([calc name].txt). If not given, the analyses are printed", required=False)
+    parser.add_argument("--use_sidecar", action="store_true", help="Store the analyzed data in a sidecar file next to the rkf file (adf.rkf.orbcache.npz) and load it from there in later calls")
+
+    args = parser.parse_args(argv)
+
+    # The process pool machinery is imported only for this command, such that the analysis of a single file does not pay for it at start-up
+    from orb_analysis.analyzer.batch import analyze_many, expand_rkf_paths
+
+    output_dir = pl.Path(args.output_dir) if args.output_dir else None
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    rkf_files = expand_rkf_paths(args.paths, pattern=args.pattern)
+    results = analyze_many(
+        rkf_files,
+        orb_range=tuple(args.orb_range),
+        irrep=args.irrep,
+        spin=args.spin,
+        max_workers=args.workers,
+        ordered=not args.unordered,
+        use_sidecar=args.use_sidecar,
+        progress=lambda progress: print(progress, file=sys.stderr),
+    )
+
+    n_failed = 0
+    for result in results:
+        if not result.ok:
+            n_failed += 1
+            print(f"Analysis of {result.path} failed:\n{result.error}", file=sys.stderr)
+        elif output_dir is not None:
+            (output_dir / f"{result.name.replace('/', '_')}.txt").write_text(str(result.analysis))
+        else:
+            print(result.analysis)
+
+    return 1 if n_failed else 0
+
+
+def write_profile(profiler: Profiler, profile_file: str) -> None:
+    """Writes the breakdown of the profiled stages as JSON to the file, or as a table to stderr if the file is \"-\"."""
+    if profile_file == "-":
+        print(profiler.format_table(), file=sys.stderr)
+    else:
+        pl.Path(profile_file).write_text(json.dumps(profiler.to_dict(), indent=2))
 
 
 def main():
+    if sys.argv[1:2] == ["batch"]:
+        sys.exit(batch_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["benchmark"]:
+        # The benchmark suite (and its synthetic rkf writer) is imported only for this command, such that the analysis does not pay for it at start-up
+        from orb_analysis.benchmarks import benchmark_main
+
+        sys.exit(benchmark_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="Parser for the adf.rkf file to analyze.")
     parser.add_argument("--file", type=str, help="The calculation file (adf.rkf) to analyze")
     parser.add_argument("--spin", type=str, help='The spin to analyze. Options are "A" and "B"', required=False)
     parser.add_argument("--orb_range", type=int, nargs=2, help="The range of orbitals to analyze from HOMO-x - LUMO+x, e.g. --orb_range 5, 5", required=False)
     parser.add_argument("--irrep", type=str, help="The irrep to analyze", required=False)
     parser.add_argument("--output_file", type=str, help="Path to the output file", required=False)
+    parser.add_argument("--use_sidecar", action="store_true", help="Store the analyzed data in a sidecar file next to the rkf file (adf.rkf.orbcache.npz) and load it from there in later calls")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="-",
+        help="Print the wall time, number of calls and bytes read of each stage of the analysis to stderr, or write them as JSON to the given file",
+        required=False,
+    )
 
     args = parser.parse_args()
 
     orb_range = args.orb_range if args.orb_range is not None else (6, 6)
-    analyzer = create_calc_analyser(args.file)
-    analysis = analyzer(orb_range=orb_range, spin=args.spin, irrep=args.irrep)
+    with profile() if args.profile else contextlib.nullcontext() as profiler:
+        analyzer = create_calc_analyser(args.file, use_sidecar=args.use_sidecar)
+        analysis = analyzer(orb_range=orb_range, spin=args.spin, irrep=args.irrep)
 
-    if args.output_file:
-        pl.Path(args.output_file).write_text(analysis)
-    else:
-        print(analysis)
+        with span("write report"):
+            if args.output_file:
+                pl.Path(args.output_file).write_text(analysis)
+            else:
+                print(analysis)
+
+    if profiler is not None:
+        write_profile(profiler, args.profile)
 
 
 if __name__ == "__main__":
@@ -20,12 +20,16 @@ that can be viewed in the KF Browser of AMS (open a "adf.rkf" file and press "ct
 from __future__ import annotations
 
 from collections import OrderedDict
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
 import numpy as np
-from scm.plams import KFFile
 from orb_analysis.custom_types import UnrestrictedPropertyDict
 from orb_analysis.custom_types import Array1D, SpinTypes
+from orb_analysis.orb_functions.sfo_functions import get_symmetry_index
+from orb_analysis.profiling import profiled
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
 
 # -------------------Low-level KF reading -------------------- #
@@ -33,17 +37,12 @@ from orb_analysis.custom_types import Array1D, SpinTypes
 
 def uses_symmetry(kf_file: KFFile) -> bool:
     """Returns True if the complex calculation uses symmetry for its MOs and other parts such as gross populations and overlap."""
-    grouplabel = kf_file.read("Symmetry", "grouplabel").split()  # type: ignore
-
-    if grouplabel[0].lower() == "nosym":
-        return False
-    return True
+    return get_symmetry_index(kf_file).symmetry
 
 
 def get_irreps(kf_file: KFFile) -> list[str]:
     """Returns the ordered symlabels of *active* MOs (frozen core MOs excluded) with the symmetry for MO labeling."""
-    irreps = kf_file.read("Symmetry", "symlab", return_as_list=True).split()  # type: ignore
-    return irreps
+    return list(get_symmetry_index(kf_file).symlab)
 
 
 def get_number_MOs_per_irrep_per_frag(kf_file: KFFile, spin: str = "A") -> OrderedDict[str, int]:
@@ -66,7 +65,7 @@ def get_frozen_cores_per_irrep(kf_file: KFFile) -> dict[str, int]:
     Basically, the SFO index shown in AMSLevels is different than the index shown in the overlap and population analysis because they can be shifted by frozen cores.
     """
     ordered_frag_sym_labels = get_irreps(kf_file)
-    n_core_orbs_per_irrep: list[int] = kf_file.read("Symmetry", "ncbs", return_as_list=True)  # type: ignore since n_core_orbs is a list of ints
+    n_core_orbs_per_irrep = get_symmetry_index(kf_file).ncbs.tolist()
     frozen_core_per_irrep = {irrep: n_frozen_cores for irrep, n_frozen_cores in zip(ordered_frag_sym_labels, n_core_orbs_per_irrep)}  # type: ignore
 
     return frozen_core_per_irrep
@@ -83,14 +82,14 @@ def read_MO_energies(kf_file: KFFile, irrep: str, spin: str) -> Array1D[np.float
         variable = f"eps_{spin}"
 
     # Reads the orbital energies for both fragments and selects the data for the current fragment
-    orb_energies = np.array(kf_file.read(irrep, variable))  # type: ignore
+    orb_energies = np.asarray(kf_file.read(irrep, variable))  # type: ignore
 
     return orb_energies
 
 
 def read_MO_occupations(kf_file: KFFile, irrep: str, spin: str) -> Array1D[np.float64]:
     """Reads the molecular orbital occupations from the KFFile."""
-    occupations = np.array(kf_file.read(irrep, f"froc_{spin}"))  # type: ignore
+    occupations = np.asarray(kf_file.read(irrep, f"froc_{spin}"))  # type: ignore
     return occupations
 
 
@@ -106,6 +105,14 @@ KEY_FUNC_MAPPING: dict[str, Callable] = {
 # --------------------Interface Function(s)-------------------- #
 
 
+@profiled("complex property")
+def get_complex_property(kf_file: KFFile, property: str, spin: str) -> dict[str, Array1D[np.float64]]:
+    """Returns one property (see `KEY_FUNC_MAPPING`) of the MOs for one spin in the format {irrep: [data]}."""
+    func = KEY_FUNC_MAPPING[property]
+    return {irrep: func(kf_file, irrep, spin) for irrep in get_irreps(kf_file)}
+
+
+@profiled("complex properties")
 def get_complex_properties(kf_file: KFFile, restricted: bool = True) -> UnrestrictedPropertyDict:
     """
     Returns a dictionary of dictionaries with the properties of the fragments.
@@ -128,16 +135,14 @@ def get_complex_properties(kf_file: KFFile, restricted: bool = True) -> Unrestri
             },
     }
     """
-    irreps = get_irreps(kf_file)
     spin_states = SpinTypes if not restricted else SpinTypes.A
 
     data_dic_to_be_unpacked: dict[str, dict[str, dict[str, Array1D[np.float64]]]] = {}
 
-    for property, func in KEY_FUNC_MAPPING.items():
+    for property in KEY_FUNC_MAPPING:
         data_dic_to_be_unpacked[property] = {}
         for spin in spin_states:
-            irrep_property_dic = {irrep: func(kf_file, irrep, spin) for irrep in irreps}
-            data_dic_to_be_unpacked[property][spin] = irrep_property_dic
+            data_dic_to_be_unpacked[property][spin] = get_complex_property(kf_file, property, spin)
 
     return data_dic_to_be_unpacked
 
@@ -145,6 +150,8 @@ def get_complex_properties(kf_file: KFFile, restricted: bool = True) -> Unrestri
 def main():
     import pathlib as pl
 
+    from scm.plams import KFFile
+
     current_dir = pl.Path(__file__).parent
     rkf_dir = current_dir.parent.parent.parent / "test" / "fixtures" / "rkfs"
     rkf_file = "restricted_largecore_differentfragsym_c4v_full.adf.rkf"
@@ -24,34 +24,163 @@ that can be viewed in the KF Browser of AMS (open a "adf.rkf" file and press "ct
 
 from __future__ import annotations
 
-from typing import Callable, Sequence
+import weakref
+from typing import TYPE_CHECKING, Callable, Sequence
 
+import attrs
 import numpy as np
-from scm.plams import KFFile, Units
 
 from orb_analysis import orb_config
-from orb_analysis.custom_types import Array1D, SpinTypes, UnrestrictedPropertyDict
+from orb_analysis.custom_types import Array1D, IrrepArray, SpinTypes
+from orb_analysis.log_messages import logger
+from orb_analysis.profiling import profiled
 
-# --------------------Helper Function(s)-------------------- #
+if TYPE_CHECKING:
+    from scm.plams import KFFile
 
+# --------------------Symmetry and SFOs Section Index-------------------- #
 
-def split_1d_array_into_dict_sorted_by_irreps(
-    data_array: Array1D,
-    irreps: Sequence[str],
-) -> dict[str, Array1D]:
+
+def _resolve_orbital_energy_variable(kf_file: KFFile, energy_key: str) -> str:
+    """
+    Determines which key to use for reading the orbital energies from the KFFile.
+    The preference is in the order:
+        - `energy_key` (the key in the settings, e.g. "site-energies" which needs to be specified in the ADF input file)
+        - "escale" (when relativistic effects are present)
+        - "energy" (otherwise)
+    """
+    if ("SFOs", energy_key) in kf_file:
+        return energy_key
+    else:
+        logger.warning(f"Could not find the key {energy_key} in {kf_file.path}. Using 'escale' instead, which are the relativistically scaled orbital energies.")
+
+    if ("SFOs", "escale") in kf_file:
+        return "escale"
+    else:
+        logger.warning(f"Could not find the key 'escale' in {kf_file.path}. Using 'energy' instead, which are the non-relativistically scaled orbital energies.")
+
+    # This key is always present in the KFFile
+    return "energy"
+
+
+@attrs.define(frozen=True)
+class SymmetryIndex:
     """
-    Splits a 1D array into a dictionary of arrays based on the irreps. The irreps are the keys of the dictionary.
-    data_array and irreps must have the same length.
+    Stores the variables of the "Symmetry" section of the complex calculation, which are used for the SFOs (frozen cores) as well as for the MOs of the complex.
+    The index is created once per KFFile (see `get_symmetry_index`), independently of the orbital energy key of the :SFOSectionIndex:.
     """
-    n_entries_per_irrep = [irreps.count(irrep) for irrep in set(irreps)]
-    data_ordered_by_irrep = {irrep: np.zeros(n_entries) for irrep, n_entries in zip(set(irreps), n_entries_per_irrep)}
 
-    # Now we loop over the irreps and add the data to the right array
-    irrep_counter = {irrep: 0 for irrep in set(irreps)}
-    for data_entry, irrep in zip(data_array, irreps):
-        data_ordered_by_irrep[irrep][irrep_counter[irrep]] = data_entry
-        irrep_counter[irrep] += 1
-    return data_ordered_by_irrep
+    symmetry: bool
+    symlab: list[str]
+    ncbs: Array1D[np.int64]
+
+    @classmethod
+    def from_kf_file(cls, kf_file: KFFile) -> SymmetryIndex:
+        return cls(
+            symmetry=str(kf_file.read("Symmetry", "grouplabel")).split()[0].lower() != "nosym",
+            symlab=kf_file.read("Symmetry", "symlab", return_as_list=True).split(),  # type: ignore
+            ncbs=np.asarray(kf_file.read("Symmetry", "ncbs", return_as_list=True), dtype=np.int64),
+        )
+
+
+@attrs.define
+class SFOSectionIndex:
+    """
+    Stores the variables of the "SFOs" and "Symmetry" sections that describe the *active* SFOs of both fragments. All helpers in this module are built on top of this index.
+    The index is created once per KFFile (see `get_sfo_section_index`), so that each variable is read (and split) only once when the fragments are created.
+    It does not keep a reference to the KFFile itself, such that the index is released together with the KFFile.
+
+    The symmetry and "ncbs" (frozen cores) of the :SymmetryIndex: are stored as well because they are used for the SFOs.
+
+    The arrays have one entry per active SFO (in the order of the rkf file):
+        - fragment: fragment index (1 or 2) of each SFO
+        - irreps: symmetry label of each SFO (e.g. "A1", "E1:1")
+        - isfo: index of each SFO within its irrep (frozen cores excluded)
+
+    The orbital energy and occupation variables are resolved per spin, e.g. {"A": "escale", "B": "escale_B"}.
+    """
+
+    frag_names: list[str]
+    symmetry: bool
+    n_sfos: int
+    fragment: Array1D[np.int64]
+    irreps: Array1D[np.str_]
+    isfo: Array1D[np.int64]
+    ncbs: Array1D[np.int64]
+    energy_variables: dict[str, str]
+    occupation_variables: dict[str, str]
+    _read_variables: dict[tuple[str, str], np.ndarray] = attrs.field(factory=dict, repr=False)
+
+    @classmethod
+    def from_kf_file(cls, kf_file: KFFile, energy_key: str, symmetry_index: SymmetryIndex) -> SFOSectionIndex:
+        energy_variable = _resolve_orbital_energy_variable(kf_file, energy_key)
+        # Spin A has no suffix (there is no "escale_A" or "occupation_A" key), and spin B falls back to spin A for restricted calculations
+        energy_variables = {str(spin): energy_variable for spin in SpinTypes}
+        occupation_variables = {str(spin): "occupation" for spin in SpinTypes}
+        if ("SFOs", f"{energy_variable}_{SpinTypes.B}") in kf_file:
+            energy_variables[SpinTypes.B] = f"{energy_variable}_{SpinTypes.B}"
+        if ("SFOs", f"occupation_{SpinTypes.B}") in kf_file:
+            occupation_variables[SpinTypes.B] = f"occupation_{SpinTypes.B}"
+
+        return cls(
+            frag_names=list(dict.fromkeys(kf_file.read("SFOs", "fragtype").split())),  # type: ignore
+            symmetry=symmetry_index.symmetry,
+            n_sfos=int(kf_file.read("SFOs", "number")),  # type: ignore
+            fragment=np.asarray(kf_file.read("SFOs", "fragment", return_as_list=True), dtype=np.int64),
+            irreps=np.array(kf_file.read("SFOs", "subspecies").split()),  # type: ignore
+            isfo=np.asarray(kf_file.read("SFOs", "isfo", return_as_list=True), dtype=np.int64),
+            ncbs=symmetry_index.ncbs,
+            energy_variables=energy_variables,
+            occupation_variables=occupation_variables,
+        )
+
+    def read(self, kf_file: KFFile, section: str, variable: str) -> np.ndarray:
+        """Reads a numeric variable (e.g. the orbital energies of both fragments) from the KFFile of the index only once and returns the stored array afterwards."""
+        key = (section, variable)
+        if key not in self._read_variables:
+            self._read_variables[key] = np.asarray(kf_file.read(section, variable))
+        return self._read_variables[key]
+
+    def sfo_indices_of_frag(self, frag_index: int) -> Array1D[np.intp]:
+        return np.flatnonzero(self.fragment == frag_index)
+
+    def ordered_irreps_of_frag(self, frag_index: int) -> list[str]:
+        return list(dict.fromkeys(self.irreps[self.sfo_indices_of_frag(frag_index)].tolist()))
+
+    def frozen_core_shifts(self, frozen_cores_per_irrep: dict[str, int]) -> Array1D[np.int64]:
+        """Returns the frozen core shift of each SFO. Without symmetry all SFOs belong to irrep "A" and are shifted by the total number of frozen cores."""
+        if not self.symmetry:
+            return np.full(self.n_sfos, frozen_cores_per_irrep["A"], dtype=np.int64)
+        return np.array([frozen_cores_per_irrep.get(irrep, 0) for irrep in self.irreps.tolist()], dtype=np.int64)
+
+
+@attrs.define
+class _KFFileIndices:
+    """The indices of one KFFile: the :SymmetryIndex: and the :SFOSectionIndex: per orbital energy key."""
+
+    symmetry: SymmetryIndex | None = None
+    sfo_sections: dict[str, SFOSectionIndex] = attrs.field(factory=dict)
+
+
+# The indices are stored per KFFile. The KFFiles are weakly referenced, so that closed files (e.g. in batch workers) do not stay alive
+_kf_file_indices: weakref.WeakKeyDictionary[KFFile, _KFFileIndices] = weakref.WeakKeyDictionary()
+
+
+def get_symmetry_index(kf_file: KFFile) -> SymmetryIndex:
+    """Returns the :SymmetryIndex: of the KFFile. It is created on the first call for each KFFile."""
+    indices = _kf_file_indices.setdefault(kf_file, _KFFileIndices())
+    if indices.symmetry is None:
+        indices.symmetry = SymmetryIndex.from_kf_file(kf_file)
+    return indices.symmetry
+
+
+def get_sfo_section_index(kf_file: KFFile) -> SFOSectionIndex:
+    """Returns the :SFOSectionIndex: of the KFFile. It is created on the first call for each KFFile and orbital energy key (see `orb_config.rkf_reading`)."""
+    energy_key = orb_config.rkf_reading.orbital_energy_key
+    indices = _kf_file_indices.setdefault(kf_file, _KFFileIndices())
+    if energy_key not in indices.sfo_sections:
+        indices.sfo_sections[energy_key] = SFOSectionIndex.from_kf_file(kf_file, energy_key, get_symmetry_index(kf_file))
+    return indices.sfo_sections[energy_key]
 
 
 # -------------------Low-level KF reading -------------------- #
@@ -59,50 +188,39 @@ def split_1d_array_into_dict_sorted_by_irreps(
 
 def get_frag_name(kf_file: KFFile, frag_index: int) -> str:
     """Returns the name of the fragment."""
-    frag_name_per_sfo = kf_file.read("SFOs", "fragtype").split()  # type: ignore
-    frag_names = list(dict.fromkeys(frag_name_per_sfo))
-    return frag_names[frag_index - 1]
+    return get_sfo_section_index(kf_file).frag_names[frag_index - 1]
 
 
 def uses_symmetry(kf_file: KFFile) -> bool:
     """Returns True if the complex calculation uses symmetry for its MOs and other parts such as gross populations and overlap."""
-    grouplabel: str = kf_file.read("Symmetry", "grouplabel").split()[0]  # type: ignore
-    return grouplabel.lower() != "nosym"
+    return get_symmetry_index(kf_file).symmetry
 
 
 def get_total_number_sfos(kf_file: KFFile) -> int:
     """Returns the total number of *active* SFOs (frozen core SFOs excluded), which is the sum of the SFOs of both fragments."""
-    n_active_sfos = int(kf_file.read("SFOs", "number"))  # type: ignore
-    return n_active_sfos
+    return get_sfo_section_index(kf_file).n_sfos
 
 
 def get_sfo_indices_of_one_frag(kf_file: KFFile, frag_index: int) -> Sequence[int]:
     """Returns the indices of *active* SFOs belonging to one fragment."""
-    sfo_frag_indices = list(kf_file.read("SFOs", "fragment", return_as_list=True))  # type: ignore
-    sfo_frag_indices = [i for i, sfo_frag_index in enumerate(sfo_frag_indices) if sfo_frag_index == frag_index]
-    return sfo_frag_indices
+    return get_sfo_section_index(kf_file).sfo_indices_of_frag(frag_index).tolist()
 
 
 def get_irrep_each_sfo_one_frag(kf_file: KFFile, frag_index: int) -> Sequence[str]:
-    sfo_indices_one_frag = get_sfo_indices_of_one_frag(kf_file, frag_index=frag_index)
-    frag_symlabels_each_sfo = list(kf_file.read("SFOs", "subspecies").split())  # type: ignore
-    frag_symlabels_each_sfo = [frag_symlabels_each_sfo[i] for i in sfo_indices_one_frag]
-    return frag_symlabels_each_sfo
+    sfo_index = get_sfo_section_index(kf_file)
+    return sfo_index.irreps[sfo_index.sfo_indices_of_frag(frag_index)].tolist()
 
 
 def get_ordered_irreps_of_one_frag(kf_file: KFFile, frag_index: int) -> list[str]:
     """Returns the ordered irreps of *active* SFOs (frozen core SFOs excluded) belonging to one fragment."""
-    sfo_frag_indices = get_sfo_indices_of_one_frag(kf_file, frag_index=frag_index)
-    all_sfo_irreps: list[str] = kf_file.read("SFOs", "subspecies", return_as_list=True).split()  # type: ignore
-    sfo_irreps_of_one_frag = list(dict.fromkeys([all_sfo_irreps[i] for i in sfo_frag_indices]))
-    return sfo_irreps_of_one_frag
+    return get_sfo_section_index(kf_file).ordered_irreps_of_frag(frag_index)
 
 
 def get_number_sfos_per_irrep_per_frag(kf_file: KFFile, frag_index: int) -> dict[str, int]:
     """Returns the number of *active* SFOs of each irrep (frozen core SFOs excluded) belonging to one fragment."""
-    sfo_irreps = get_irrep_each_sfo_one_frag(kf_file, frag_index=frag_index)
-    sfo_irrep_sum = {irrep: sfo_irreps.count(irrep) for irrep in set(sfo_irreps)}
-    return sfo_irrep_sum
+    sfo_index = get_sfo_section_index(kf_file)
+    irreps, counts = np.unique(sfo_index.irreps[sfo_index.sfo_indices_of_frag(frag_index)], return_counts=True)
+    return dict(zip(irreps.tolist(), counts.tolist()))
 
 
 # --------------------Frozen Core Handling-------------------- #
@@ -119,8 +237,9 @@ def get_frozen_cores_per_irrep(kf_file: KFFile, frag_index: int) -> dict[str, in
 
     In case there is no frozen core and no symmetry, but the fragments use symmetry, then the frozen core is 0 for all irreps that are present in the fragments.
     """
-    ordered_frag_irreps = get_ordered_irreps_of_one_frag(kf_file, frag_index=frag_index)
-    n_core_orbs_per_irrep: list[int] = kf_file.read("Symmetry", "ncbs", return_as_list=True)  # type: ignore since n_core_orbs is a list of ints
+    sfo_index = get_sfo_section_index(kf_file)
+    ordered_frag_irreps = sfo_index.ordered_irreps_of_frag(frag_index)
+    n_core_orbs_per_irrep = sfo_index.ncbs.tolist()
 
     frozen_core_per_irrep = {irrep: 0 for irrep in ordered_frag_irreps}
     for irrep, n_core_orbs in zip(ordered_frag_irreps, n_core_orbs_per_irrep):
@@ -128,7 +247,7 @@ def get_frozen_cores_per_irrep(kf_file: KFFile, frag_index: int) -> dict[str, in
 
     # Add the "A" irrep to the dictionary for the case when symmetry is not used (e.g. NoSym), but the fragments themselves use symmetry.
     # This is only used for the overlap analysis.
-    if not uses_symmetry(kf_file):
+    if not sfo_index.symmetry:
         frozen_core_per_irrep["A"] = sum(n_core_orbs_per_irrep)
     return frozen_core_per_irrep
 
@@ -136,42 +255,17 @@ def get_frozen_cores_per_irrep(kf_file: KFFile, frag_index: int) -> dict[str, in
 # --------------------Restricted Property Function(s)-------------------- #
 
 
-def _get_orbital_energy_variable(kf_file: KFFile) -> str:
-    """
-    Determines which key to use for reading the orbital energies from the KFFile.
-    The preference is in the order:
-        - "site-energies" (needs to be specified in the ADF input file)
-        - "escale" (when relativistic effects are present)
-        - "energy" (otherwise)
-    """
-    energy_key = orb_config.rkf_reading.orbital_energy_key
-
-    if ("SFOs", energy_key) in kf_file:
-        return energy_key
-    else:
-        print(f"Could not find the key {energy_key} in the KFFile. Using 'escale' instead, which are the relativistically scaled orbital energies.")
-
-    if ("SFOs", "escale") in kf_file:
-        return "escale"
-    else:
-        print("Could not find the key 'escale' in the KFFile. Using 'energy' instead, which are the non-relativistically scaled orbital energies.")
-
-    # This key is always present in the KFFile
-    return "energy"
-
-
 def get_orbital_energies(kf_file: KFFile, spin: str = SpinTypes.A) -> Array1D[np.float64]:
     """Reads the orbital energies from the KFFile."""
-    # escale refers energies scaled by relativistic effects (ZORA). If no relativistic effects are present, "energy" is the appropriate key.
-    variable = _get_orbital_energy_variable(kf_file)
-    # print(f"Using {variable} for orbital energies")
+    from scm.plams import Units
 
-    # It is either "escale" or "escale_B", apparently there is no "escale_A" key (same for "energy")
-    if spin == SpinTypes.B and ("SFOs", f"{variable}_{SpinTypes.B}") in kf_file:
-        variable = f"{variable}_{SpinTypes.B}"
+    # escale refers energies scaled by relativistic effects (ZORA). If no relativistic effects are present, "energy" is the appropriate key.
+    # It is either "escale" or "escale_B", apparently there is no "escale_A" key (same for "energy"). The variable is resolved once in the :SFOSectionIndex:
+    sfo_index = get_sfo_section_index(kf_file)
+    variable = sfo_index.energy_variables[spin]
 
     # Reads the orbital energies for both fragments and selects the data for the current fragment
-    orb_energies = np.array(kf_file.read("SFOs", variable)) * Units.conversion_ratio("hartree", orb_config.rkf_reading.orbital_energy_unit)  # type: ignore
+    orb_energies = sfo_index.read(kf_file, "SFOs", variable) * Units.conversion_ratio("hartree", orb_config.rkf_reading.orbital_energy_unit)  # type: ignore
 
     return orb_energies  # type: ignore since plams Units does not include type hints
 
@@ -179,10 +273,8 @@ def get_orbital_energies(kf_file: KFFile, spin: str = SpinTypes.A) -> Array1D[np
 def get_occupations(kf_file: KFFile, spin: str = SpinTypes.A) -> Array1D[np.float64]:
     """Reads the occupations from the KFFile."""
     # It is either "occupation" or "occupation_B", apparently there is no "occupation_A" key
-    occupation_key = f"occupation_{SpinTypes.B}" if spin == SpinTypes.B and ("SFOs", f"occupation_{SpinTypes.B}") in kf_file else "occupation"
-    occupations = np.array(kf_file.read("SFOs", occupation_key))  # type: ignore
-
-    return occupations
+    sfo_index = get_sfo_section_index(kf_file)
+    return sfo_index.read(kf_file, "SFOs", sfo_index.occupation_variables[spin])
 
 
 # --------------------Unrestricted Property Function(s)-------------------- #
@@ -200,47 +292,47 @@ RESTRICTED_KEY_FUNC_MAPPING: dict[str, Callable] = {
 # --------------------Interface Function(s)-------------------- #
 
 
-def get_fragment_properties(kf_file: KFFile, frag_index: int) -> UnrestrictedPropertyDict:
+@profiled("fragment property")
+def get_fragment_property(kf_file: KFFile, frag_index: int, property: str, spins: Sequence[str] = tuple(SpinTypes)) -> IrrepArray:
+    """Returns one property (see `RESTRICTED_KEY_FUNC_MAPPING`) of the SFOs of one fragment for the given spins as :IrrepArray: with a spin axis."""
+    sfo_index = get_sfo_section_index(kf_file)
+    sfo_indices_of_one_frag = sfo_index.sfo_indices_of_frag(frag_index)
+    func = RESTRICTED_KEY_FUNC_MAPPING[property]
+
+    # Selects the data of the current fragment for all spins at once: shape (n_spins, n_sfos_of_frag)
+    data = np.stack([func(kf_file, spin=spin)[sfo_indices_of_one_frag] for spin in spins])
+
+    # Now we sort the long arrays by irreps (e.g. [.....] -> {"A1": [.....], "A2": [.....]})
+    return IrrepArray.from_labels(data, sfo_index.irreps[sfo_indices_of_one_frag], spins=[str(spin) for spin in spins])
+
+
+@profiled("fragment properties")
+def get_fragment_properties(kf_file: KFFile, frag_index: int, spins: Sequence[str] = tuple(SpinTypes)) -> dict[str, IrrepArray]:
     """
-    Returns a dictionary of dictionaries with the properties of the fragments.
+    Returns a dictionary with the properties of the fragments as :IrrepArray: objects with a spin axis.
 
     The properties are:
         - Orbital Energies
         - Occupations
 
-    Output format:
+    Output format (the :IrrepArray: can be indexed as the nested dictionary):
     {
-        spin ("A"/"B"): {
-            property ("orb_energies" / occupations): {
+        property ("orb_energies" / occupations): {
+            spin ("A"/"B"): {
                 irrep (e.g., "A1", "B2", "E1:1"): [data]
     }
 
-    Note: this will produce double the amount of data when restricted fragments are used because the spin key is not needed for restricted fragments.
-    Currently, the "B" spin is discarded for restricted calcs in the `create_fragment_data` function.
+    Restricted fragments only need the "A" spin, which is selected with `spins`.
     """
-    sfo_indices_of_one_frag = get_sfo_indices_of_one_frag(kf_file, frag_index)
-    frag_irreps_each_sfo = get_irrep_each_sfo_one_frag(kf_file, frag_index)
-
-    data_dic_to_be_unpacked = {property: {str(spin): {} for spin in SpinTypes} for property in RESTRICTED_KEY_FUNC_MAPPING}
-
-    for property, func in RESTRICTED_KEY_FUNC_MAPPING.items():
-        for spin in SpinTypes:
-            data = func(kf_file, spin=spin)
-
-            data = np.array([data[i] for i in sfo_indices_of_one_frag])
-
-            # Now we turn one long array into a dictionary of arrays sorted by irreps (e.g. [.....] -> {"A1": [.....], "A2": [.....]})
-            data_dic_to_be_unpacked[property][spin] = split_1d_array_into_dict_sorted_by_irreps(data_array=data, irreps=frag_irreps_each_sfo)
-
-    return data_dic_to_be_unpacked
+    return {property: get_fragment_property(kf_file, frag_index, property, spins) for property in RESTRICTED_KEY_FUNC_MAPPING}
 
 
 # --------------------Gross Population Function(s)-------------------- #
 
 
-def get_gross_populations(kf_file: KFFile, frag_index: int = 1) -> dict[str, dict[str, Array1D[np.float64]]]:
+def get_gross_population_slices(kf_file: KFFile, frag_index: int = 1) -> dict[str, dict[str, slice]]:
     """
-    Reads the gross populations from the KFFile by taking into account the frozen cores.
+    Returns the slices of the gross populations of the *active* SFOs of one fragment in the ("SFO popul", "sfo_grosspop") array by taking into account the frozen cores.
     Annoyingly, the "SFOs" sections contains the SFOs of both fragments that ALREADY HAVE BEEN FILTERED for the frozen cores.
     For example, the SFOs number may be 114, but the gross population array may have 148 entries. This is because the first 34 entries are the frozen cores.
 
@@ -252,17 +344,16 @@ def get_gross_populations(kf_file: KFFile, frag_index: int = 1) -> dict[str, dic
     Output format:
     {
         spin ("A"/"B"): {
-            irrep (e.g., "A1", "B2", "E1:1"): [data]
+            irrep (e.g., "A1", "B2", "E1:1"): slice(start, stop)
     }
     """
+    sfo_index = get_sfo_section_index(kf_file)
     frags_sfo_irrep_sums = [get_number_sfos_per_irrep_per_frag(kf_file, frag_index=frag_index) for frag_index in [1, 2]]
-    ordered_irreps = get_ordered_irreps_of_one_frag(kf_file, frag_index=frag_index)
+    ordered_irreps = sfo_index.ordered_irreps_of_frag(frag_index)
     frozen_core_per_irrep = get_frozen_cores_per_irrep(kf_file, frag_index=frag_index)
-    complex_has_symmetry = uses_symmetry(kf_file)  # refers to the complex calculation
+    complex_has_symmetry = sfo_index.symmetry  # refers to the complex calculation
     frag_has_symmetry = len(ordered_irreps) > 1  # refers to the fragments
 
-    raw_gross_pop_all_sfos = np.array(kf_file.read("SFO popul", "sfo_grosspop"))
-
     # Table writing (comment out if not needed)
 
     # header = [
@@ -302,20 +393,20 @@ def get_gross_populations(kf_file: KFFile, frag_index: int = 1) -> dict[str, dic
 
         if frag_index == 1:
             return {
-                SpinTypes.A: {"A": raw_gross_pop_all_sfos[start_index : start_index + total_sfo_sum_frag1]},  # NOQA: E203
-                SpinTypes.B: {"A": raw_gross_pop_all_sfos[total_sfo_for_one_spin : total_sfo_for_one_spin + total_sfo_sum_frag1]},  # NOQA: E203
+                SpinTypes.A: {"A": slice(start_index, start_index + total_sfo_sum_frag1)},
+                SpinTypes.B: {"A": slice(total_sfo_for_one_spin, total_sfo_for_one_spin + total_sfo_sum_frag1)},
             }
 
         return {
-            SpinTypes.A: {"A": raw_gross_pop_all_sfos[start_index + total_sfo_sum_frag1 : start_index + total_sfo_sum_frag1 + total_sfo_sum_frag2]},  # NOQA: E203
-            SpinTypes.B: {"A": raw_gross_pop_all_sfos[total_sfo_for_one_spin + total_sfo_sum_frag1 : total_sfo_for_one_spin + total_sfo_sum_frag1 + total_sfo_sum_frag2]},  # NOQA: E203
+            SpinTypes.A: {"A": slice(start_index + total_sfo_sum_frag1, start_index + total_sfo_sum_frag1 + total_sfo_sum_frag2)},
+            SpinTypes.B: {"A": slice(total_sfo_for_one_spin + total_sfo_sum_frag1, total_sfo_for_one_spin + total_sfo_sum_frag1 + total_sfo_sum_frag2)},
         }
 
-    gross_pop_active_sfos = {str(spin): {irrep: np.zeros_like(frags_sfo_irrep_sums[frag_index - 1][irrep], dtype=np.float64) for irrep in frags_sfo_irrep_sums[frag_index - 1]} for spin in SpinTypes}
+    gross_pop_slices = {str(spin): {irrep: slice(0, 0) for irrep in frags_sfo_irrep_sums[frag_index - 1]} for spin in SpinTypes}
 
     # only works if frag1 and frag2 have the same irreps and thus belong to the same point group
     for spin in SpinTypes:
-        raw_gross_pop_index = 0 if spin == SpinTypes.A else get_total_number_sfos(kf_file) + sum(frozen_core_per_irrep.values())
+        raw_gross_pop_index = 0 if spin == SpinTypes.A else sfo_index.n_sfos + sum(frozen_core_per_irrep.values())
         for irrep in ordered_irreps:
             n_frozen_cores = frozen_core_per_irrep.get(irrep, 0)
             n_sfos_frag1 = frags_sfo_irrep_sums[0][irrep]
@@ -328,16 +419,33 @@ def get_gross_populations(kf_file: KFFile, frag_index: int = 1) -> dict[str, dic
                 start_irrep_index += n_sfos_frag1
                 end_irrep_index = start_irrep_index + n_sfos_frag2
 
-            gross_pop_active_sfos[spin][irrep] = raw_gross_pop_all_sfos[start_irrep_index:end_irrep_index]
+            gross_pop_slices[spin][irrep] = slice(start_irrep_index, end_irrep_index)
 
             raw_gross_pop_index += sum(frags_sfo_irrep_sums[frag_i][irrep] for frag_i in [0, 1]) + n_frozen_cores
 
-    return gross_pop_active_sfos
+    return gross_pop_slices
+
+
+@profiled("gross populations")
+def get_gross_populations(kf_file: KFFile, frag_index: int = 1) -> dict[str, dict[str, Array1D[np.float64]]]:
+    """
+    Reads the gross populations of the *active* SFOs of one fragment from the KFFile (see `get_gross_population_slices` for the frozen cores).
+
+    Output format:
+    {
+        spin ("A"/"B"): {
+            irrep (e.g., "A1", "B2", "E1:1"): [data]
+    }
+    """
+    raw_gross_pop_all_sfos = get_sfo_section_index(kf_file).read(kf_file, "SFO popul", "sfo_grosspop")
+    return {spin: {irrep: raw_gross_pop_all_sfos[irrep_slice] for irrep, irrep_slice in irrep_slices.items()} for spin, irrep_slices in get_gross_population_slices(kf_file, frag_index).items()}
 
 
 def main():
     import pathlib as pl
 
+    from scm.plams import KFFile
+
     current_dir = pl.Path(__file__).parent
     rkf_dir = current_dir.parent.parent.parent / "test" / "fixtures" / "rkfs"
     # rkf_file = 'restricted_largecore_differentfragsym_c4v_full.adf.rkf'
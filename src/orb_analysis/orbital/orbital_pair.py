@@ -1,17 +1,18 @@
 ﻿from __future__ import annotations
 
 import pathlib as pl
+from typing import TYPE_CHECKING
 
 import attrs
 import numpy as np
-import pandas as pd
-from orb_visualization.plotter import AMSViewPlotSettings, combine_sfo_images_with_matplotlib, plot_orbital_with_amsview
-from tabulate import tabulate
 
 from orb_analysis.custom_types import Array1D
 from orb_analysis.orbital.orbital import SFO
 from orb_analysis.orbital_manager.shared_functions import calculate_matrix_element
 
+if TYPE_CHECKING:
+    from orb_visualization.plotter import AMSViewPlotSettings
+
 
 @attrs.define
 class OrbitalPair:
@@ -57,15 +58,21 @@ class OrbitalPair:
         return array
 
     def plot(self, rkf_file: pl.Path | str, output_dir: str | pl.Path, plot_settings: AMSViewPlotSettings | None = None):
-        """Plots the orbitals associated with this pair"""
+        """
+        Plots the orbitals associated with this pair. Orbital images that already exist in `output_dir` are reused, the missing ones are rendered at the same time.
+        Raises a :RenderError: when one of the missing images could not be rendered.
+        """
+        # The plotting stack (matplotlib, PIL) is imported when the orbitals are plotted, such that the analysis itself does not pay for it
+        from orb_visualization.plotter import AMSViewPlotSettings, combine_sfo_images_with_matplotlib
+        from orb_visualization.render_queue import RenderJob, render_orbitals
+
         plot_settings = AMSViewPlotSettings() if plot_settings is None else plot_settings
 
-        image_paths = []
-        for orb in [self.sfo1, self.sfo2]:
-            save_file = pl.Path(output_dir) / f"{orb.irrep}_{orb.index}.png"
-            if not save_file.exists():
-                plot_orbital_with_amsview(str(rkf_file), orb.plot_label, plot_settings, save_file=save_file)
-            image_paths.append(save_file)
+        image_paths = [pl.Path(output_dir) / f"{orb.irrep}_{orb.index}.png" for orb in [self.sfo1, self.sfo2]]
+        # Images of the same rkf file, orbital and settings are taken from the image cache
+        jobs = [RenderJob(str(rkf_file), orb.plot_label, plot_settings, save_file) for orb, save_file in zip([self.sfo1, self.sfo2], image_paths) if not save_file.exists()]
+        if jobs:
+            render_orbitals(jobs)
 
         combine_sfo_images_with_matplotlib(
             sfo1=self.sfo1,
@@ -85,6 +92,9 @@ class OrbitalPair:
         Example:
             [sfo1_label] [sfo1_energy] [sfo1_grosspop] [sfo2_label] [sfo2_energy] [sfo2_grosspop] [overlap] [stabilization]
         """
+        import pandas as pd
+        from tabulate import tabulate
+
         headers = ["SFO1", "energy (eV)", "gross pop (a.u.)", "SFO2", "energy (eV)", "gross pop (a.u.)", "Overlap S", "epsilon (eV)", "S^2/epsilon * 100"]
 
         # Create a DataFrame
@@ -4,15 +4,15 @@ from typing import Any
 
 import attrs
 import numpy as np
-import pandas as pd
 from orb_analysis.custom_types import Array2D, SFOInteractionTypes
 from orb_analysis.log_messages import OVERLAP_MATRIX_NOTE, SFO_ORDER_NOTE, format_message, interaction_matrix_message
 from orb_analysis.orbital.orbital import MO, SFO
 from orb_analysis.orbital.orbital_pair import OrbitalPair
 from orb_analysis.orbital_manager.shared_functions import calculate_matrix_element, filter_sfos_by_interaction_type
-from tabulate import tabulate
+from orb_analysis.profiling import profiled
 
-# Used for formatting the tables in the __str__ methods using the tabulate package
+# Used for formatting the tables in the __str__ methods using the tabulate package.
+# tabulate and pandas are imported in the methods that create the tables, as they take a large part of the start-up time
 TABLE_FORMAT_OPTIONS: dict[str, Any] = {
     "numalign": "left",
     "stralign": "left",
@@ -36,10 +36,13 @@ class MOManager(OrbitalManager):
 
     complex_mos: list[MO]
 
+    @profiled("mo report")
     def __str__(self):
         """
         Returns a string with the molecular orbital amsview label, homo_lumo label, energy, and grosspop in the formatted way.
         """
+        from tabulate import tabulate
+
         mos_info = [[orb.amsview_label, orb.homo_lumo_label, orb.energy] for orb in self.complex_mos]
 
         table_headers = ["Molecular Orbitals", "", "Energy (eV)"]
@@ -60,6 +63,7 @@ class SFOManager(OrbitalManager):
     frag2_sfos: list[SFO]  # Is reversed: LUMO+x -> HOMO-x
     overlap_matrix: Array2D[np.float64]
 
+    @profiled("sfo report")
     def __str__(self):
         sfo_overview_table = self.get_sfo_overview_table()
 
@@ -87,7 +91,10 @@ class SFOManager(OrbitalManager):
                 stabilization_matrix[index1, index2] = calculate_matrix_element(sfo1=frag1_orb, sfo2=frag2_orb, overlap=overlap)
         return stabilization_matrix
 
+    @profiled("sfo overview table")
     def get_sfo_overview_table(self):
+        from tabulate import tabulate
+
         frag1_orb_info = [[orb.amsview_label, orb.homo_lumo_label, orb.energy, orb.gross_pop] for orb in self.frag1_sfos]
 
         frag2_orb_info = [
@@ -101,8 +108,12 @@ class SFOManager(OrbitalManager):
         table = tabulate(tabular_data=combined_info, headers=headers, **TABLE_FORMAT_OPTIONS)
         return table
 
+    @profiled("overlap matrix table")
     def get_overlap_matrix_table(self):
         """Returns a table (str) of the overlap matrix"""
+        import pandas as pd
+        from tabulate import tabulate
+
         row_labels = [orb.homo_lumo_label for orb in self.frag1_sfos]
         column_labels = [orb.homo_lumo_label for orb in self.frag2_sfos]
 
@@ -111,6 +122,7 @@ class SFOManager(OrbitalManager):
         table = tabulate(df, headers="keys", **TABLE_FORMAT_OPTIONS)  # type: ignore # df is accepted as argument
         return table
 
+    @profiled("interaction matrix table")
     def get_sfo_interaction_matrix(self, interaction_type: SFOInteractionTypes):
         """
         Calculates interaction matrix which is composed of:
@@ -118,6 +130,9 @@ class SFOManager(OrbitalManager):
             2. The Pauli repulsion matrix (S^2) in units (a.u.^2) for HOMO-HOMO interactions
 
         """
+        import pandas as pd
+        from tabulate import tabulate
+
         frag1_filtered_indices, frag2_filtered_indices = filter_sfos_by_interaction_type(self.frag1_sfos, self.frag2_sfos, interaction_type)
         relevant_frag1_sfos = [self.frag1_sfos[i] for i in frag1_filtered_indices]
         relevant_frag2_sfos = [self.frag2_sfos[i] for i in frag2_filtered_indices]
@@ -0,0 +1,189 @@
+"""
+Module containing lightweight profiling of the stages of the analysis, e.g. reading the fragment data, computing the overlap matrix and formatting the tables.
+
+Stages are marked with `span(name)` (context manager) or `@profiled(name)` (decorator). Nested stages are identified by their path, e.g. "create_calc_analyser/fragment/gross populations".
+Profiling is disabled by default, in which case a stage costs one global lookup. Within `with profile() as profiler:`, the following is accumulated per stage:
+    - wall_time: the wall time in seconds, including the nested stages
+    - calls: the number of times the stage is entered
+    - bytes_read: the number of bytes read from KF files within the stage (reported by the :MemoryMappedKFFile: through `record_bytes_read`)
+
+The `--profile` option of the `orb_analysis` command prints the breakdown of an analysis (see `Profiler.format_table` and `Profiler.to_dict`).
+Note that the reads of the plams :KFFile: (the fallback reader) are not counted.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import threading
+import time
+from typing import Any, Callable, Iterator, TypeVar
+
+import attrs
+
+T = TypeVar("T")
+
+PATH_SEPARATOR = "/"
+
+# The profiler of the current `profile()` context, None when profiling is disabled
+_profiler: Profiler | None = None
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class StageStats:
+    """This class contains the accumulated wall time (s), number of calls and bytes read of a stage."""
+
+    wall_time: float = 0.0
+    calls: int = 0
+    bytes_read: int = 0
+
+
+@attrs.define
+class Profiler:
+    """
+    This class accumulates the :StageStats: of each stage (by path) while profiling is enabled.
+    Each thread has its own stack of stages, so stages of concurrent threads are not nested into each other.
+    """
+
+    stages: dict[str, StageStats] = attrs.field(factory=dict)
+    start_time: float = attrs.field(factory=time.perf_counter)
+    total_time: float | None = None
+    _local: threading.local = attrs.field(factory=threading.local, repr=False)
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, repr=False)
+
+    def _stack(self) -> list[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def enter(self, name: str) -> str:
+        """Enters the stage within the current stage of this thread and returns its path."""
+        stack = self._stack()
+        path = f"{stack[-1]}{PATH_SEPARATOR}{name}" if stack else name
+        stack.append(path)
+        return path
+
+    def exit(self, path: str, wall_time: float) -> None:
+        self._stack().pop()
+        with self._lock:
+            stats = self.stages.setdefault(path, StageStats())
+            stats.wall_time += wall_time
+            stats.calls += 1
+
+    def record_bytes_read(self, n_bytes: int) -> None:
+        """Adds the bytes to the current stage and the stages it is nested in."""
+        with self._lock:
+            for path in self._stack():
+                self.stages.setdefault(path, StageStats()).bytes_read += n_bytes
+
+    def current_stage(self) -> str | None:
+        """Returns the path of the current stage of this thread, or None outside of all stages."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def stop(self) -> None:
+        self.total_time = time.perf_counter() - self.start_time
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the breakdown as a JSON-serializable dictionary: {"total_time": ..., "stages": {path: {"wall_time": ..., "calls": ..., "bytes_read": ...}}}."""
+        total_time = self.total_time if self.total_time is not None else time.perf_counter() - self.start_time
+        return {"total_time": total_time, "stages": {path: attrs.asdict(stats) for path, stats in self.stages.items()}}
+
+    def format_table(self) -> str:
+        """Returns the breakdown as a text table, with the nested stages indented below the stage they are nested in."""
+        breakdown = self.to_dict()
+        lines = [f"{'Stage':<60} {'Wall time (s)':>14} {'Calls':>8} {'Read (MB)':>10}"]
+        lines.append("-" * len(lines[0]))
+        for path in sorted(breakdown["stages"], key=lambda path: path.split(PATH_SEPARATOR)):
+            stats = breakdown["stages"][path]
+            depth = path.count(PATH_SEPARATOR)
+            name = "  " * depth + path.rsplit(PATH_SEPARATOR, 1)[-1]
+            lines.append(f"{name:<60} {stats['wall_time']:>14.4f} {stats['calls']:>8d} {stats['bytes_read'] / 1024**2:>10.3f}")
+        lines.append(f"{'Total':<60} {breakdown['total_time']:>14.4f}")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "path", "start")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> _Span:
+        self.path = self.profiler.enter(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.exit(self.path, time.perf_counter() - self.start)
+
+
+class _DisabledSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> _DisabledSpan:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def span(name: str) -> _Span | _DisabledSpan:
+    """Returns a context manager that marks a stage of the analysis. It does nothing when profiling is disabled."""
+    profiler = _profiler
+    if profiler is None:
+        return _DISABLED_SPAN
+    return _Span(profiler, name)
+
+
+def profiled(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator that marks each call of the function as a stage of the analysis (see `span`)."""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            with _Span(profiler, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_bytes_read(n_bytes: int) -> None:
+    """Reports the number of bytes read from a KF file to the current stage. It does nothing when profiling is disabled."""
+    profiler = _profiler
+    if profiler is not None:
+        profiler.record_bytes_read(n_bytes)
+
+
+def current_stage() -> str | None:
+    """Returns the path of the current stage, or None when profiling is disabled or outside of all stages."""
+    profiler = _profiler
+    return profiler.current_stage() if profiler is not None else None
+
+
+@contextlib.contextmanager
+def profile() -> Iterator[Profiler]:
+    """Enables profiling (in all threads of the process) within the context and yields the :Profiler: with the breakdown of the stages."""
+    global _profiler
+    previous_profiler, profiler = _profiler, Profiler()
+    _profiler = profiler
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _profiler = previous_profiler
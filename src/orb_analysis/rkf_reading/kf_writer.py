@@ -0,0 +1,218 @@
+"""
+Module containing a pure-Python writer of files in the KF format, which can be read by the :MemoryMappedKFFile: and the plams :KFFile:.
+
+The plams :KFFile: can only write KF files with the `udmpkf` tool of an AMS installation. This writer does not need AMS, which makes it possible to create
+(synthetic) rkf files for tests and benchmarks (see `orb_analysis.rkf_reading.synthetic_rkf`). The files use 4-byte little endian integers and blocks of 4096 bytes.
+
+Layout of the written file (see `orb_analysis.rkf_reading.mmap_reader` for the format):
+- The superindex blocks come first, followed by the index blocks and data blocks of each section.
+- The data of each type (integer, real, string, logical) of a section is written as one stream that fills its own data blocks, so a variable that
+  spans multiple blocks continues in the same type region of the next logical block, as required by the format.
+"""
+
+from __future__ import annotations
+
+import math
+import pathlib as pl
+from typing import Any, BinaryIO, Mapping
+
+import attrs
+import numpy as np
+
+from orb_analysis.rkf_reading.mmap_reader import INDEX_ENTRY_WORDS, INDEX_HEADER_WORDS, KF_INTEGER, KF_LOGICAL, KF_REAL, KF_STRING, SUPERINDEX_ENTRY_WORDS
+
+BLOCKSIZE = 4096
+INT_DTYPE = np.dtype("<i4")
+REAL_DTYPE = np.dtype("<f8")
+NAME_LENGTH = 32
+
+# Block types in the superindex
+SUPERINDEX_BLOCK, INDEX_BLOCK, DATA_BLOCK = 2, 3, 4
+
+KF_TYPE_ITEMSIZE = {KF_INTEGER: INT_DTYPE.itemsize, KF_REAL: REAL_DTYPE.itemsize, KF_STRING: 1, KF_LOGICAL: INT_DTYPE.itemsize}
+DATA_HEADER_SIZE = 4 * INT_DTYPE.itemsize
+SUPERINDEX_ENTRY_SIZE = NAME_LENGTH + SUPERINDEX_ENTRY_WORDS * INT_DTYPE.itemsize
+INDEX_HEADER_SIZE = NAME_LENGTH + INDEX_HEADER_WORDS * INT_DTYPE.itemsize
+INDEX_ENTRY_SIZE = NAME_LENGTH + INDEX_ENTRY_WORDS * INT_DTYPE.itemsize
+
+ENTRIES_PER_SUPERINDEX_BLOCK = BLOCKSIZE // SUPERINDEX_ENTRY_SIZE  # including the header entry
+ENTRIES_PER_INDEX_BLOCK = (BLOCKSIZE - INDEX_HEADER_SIZE) // INDEX_ENTRY_SIZE
+
+
+class KFWriteError(ValueError):
+    """Raised when data can not be written to a KF file, e.g. a name that is too long or an empty variable."""
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class _Variable:
+    name: str
+    vtype: int
+    data: np.ndarray  # integers/logicals as INT_DTYPE, reals as REAL_DTYPE and strings as uint8
+    logical_block: int = 0
+    start: int = 0
+
+
+@attrs.define
+class _Section:
+    name: str
+    variables: list[_Variable]
+    # {type: logical block in which the data of the type starts}, types without data are not present
+    first_blocks: dict[int, int] = attrs.field(factory=dict)
+    n_index_blocks: int = 0
+    n_data_blocks: int = 0
+    index_block: int = 0  # physical block of the first index block
+    data_block: int = 0  # physical block of the first data block
+
+    def stream(self, vtype: int) -> list[np.ndarray]:
+        return [variable.data for variable in self.variables if variable.vtype == vtype]
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = name.encode()
+    if len(encoded) > NAME_LENGTH:
+        raise KFWriteError(f"The name {name!r} is longer than {NAME_LENGTH} characters")
+    return encoded.ljust(NAME_LENGTH)
+
+
+def _to_variable(name: str, value: Any) -> _Variable:
+    """Converts a value (str, bool, int, float or a sequence/array of these) to a :_Variable: with the data in the representation of the KF file."""
+    if isinstance(value, str):
+        return _Variable(name, KF_STRING, np.frombuffer(value.encode(), dtype=np.uint8))
+
+    data = np.asarray(value)
+    if data.dtype == np.bool_:
+        vtype, data = KF_LOGICAL, data.astype(INT_DTYPE)
+    elif np.issubdtype(data.dtype, np.integer):
+        if data.size and (data.min() < np.iinfo(INT_DTYPE).min or data.max() > np.iinfo(INT_DTYPE).max):
+            raise KFWriteError(f"The integers of variable {name!r} do not fit in 4-byte integers")
+        vtype, data = KF_INTEGER, data.astype(INT_DTYPE)
+    elif np.issubdtype(data.dtype, np.floating):
+        vtype, data = KF_REAL, data.astype(REAL_DTYPE)
+    else:
+        raise KFWriteError(f"The data type {data.dtype} of variable {name!r} can not be written to a KF file")
+
+    data = data.ravel()
+    if data.size == 0:
+        raise KFWriteError(f"Variable {name!r} is empty, which can not be stored in a KF file")
+    return _Variable(name, vtype, data)
+
+
+def _layout_section(section: _Section) -> None:
+    """Assigns the logical block and start position of each variable and determines the number of index and data blocks of the section."""
+    logical_block = 1
+    for vtype in [KF_INTEGER, KF_REAL, KF_STRING, KF_LOGICAL]:
+        capacity = (BLOCKSIZE - DATA_HEADER_SIZE) // KF_TYPE_ITEMSIZE[vtype]
+        offset = 0
+        for variable in section.variables:
+            if variable.vtype != vtype:
+                continue
+            variable.logical_block = logical_block + offset // capacity
+            variable.start = offset % capacity + 1
+            offset += variable.data.size
+        if offset:
+            section.first_blocks[vtype] = logical_block
+            logical_block += math.ceil(offset / capacity)
+
+    section.n_data_blocks = logical_block - 1
+    section.n_index_blocks = max(1, math.ceil(len(section.variables) / ENTRIES_PER_INDEX_BLOCK))
+
+
+def _write_superindex(file: BinaryIO, sections: list[_Section], n_superindex_blocks: int, n_blocks: int) -> None:
+    entries = [("SUPERINDEX", (1, 1, n_superindex_blocks, SUPERINDEX_BLOCK))]
+    for section in sections:
+        entries.append((section.name, (section.index_block, 1, section.n_index_blocks, INDEX_BLOCK)))
+        if section.n_data_blocks:
+            entries.append((section.name, (section.data_block, 1, section.n_data_blocks, DATA_BLOCK)))
+
+    entries_per_block = ENTRIES_PER_SUPERINDEX_BLOCK - 1
+    for block in range(1, n_superindex_blocks + 1):
+        block_entries = entries[(block - 1) * entries_per_block : block * entries_per_block]
+        next_block = block + 1 if block < n_superindex_blocks else 1
+        # The header entry of each superindex block points to the next superindex block (1 if there is none)
+        content = _encode_name("SUPERINDEX") + np.array([n_blocks, 1, len(block_entries), next_block], dtype=INT_DTYPE).tobytes()
+        for name, words in block_entries:
+            content += _encode_name(name) + np.array(words, dtype=INT_DTYPE).tobytes()
+        for _ in range(entries_per_block - len(block_entries)):
+            content += _encode_name("EMPTY") + bytes(SUPERINDEX_ENTRY_WORDS * INT_DTYPE.itemsize)
+        file.write(content.ljust(BLOCKSIZE, b"\0"))
+
+
+def _write_index_blocks(file: BinaryIO, section: _Section) -> None:
+    n_per_type = [sum(data.size for data in section.stream(vtype)) for vtype in [KF_INTEGER, KF_REAL, KF_STRING, KF_LOGICAL]]
+    for block in range(section.n_index_blocks):
+        block_variables = section.variables[block * ENTRIES_PER_INDEX_BLOCK : (block + 1) * ENTRIES_PER_INDEX_BLOCK]
+        # The header words are not used by the readers: index block number, number of index blocks, number of variables and the number of values per type
+        content = _encode_name(section.name) + np.array([block + 1, section.n_index_blocks, len(section.variables), *n_per_type], dtype=INT_DTYPE).tobytes()
+        for variable in block_variables:
+            size = variable.data.size
+            # logical block, start position, length, unused, used length, type
+            content += _encode_name(variable.name) + np.array([variable.logical_block, variable.start, size, size, size, variable.vtype], dtype=INT_DTYPE).tobytes()
+        for _ in range(ENTRIES_PER_INDEX_BLOCK - len(block_variables)):
+            content += _encode_name("EMPTY") + bytes(INDEX_ENTRY_WORDS * INT_DTYPE.itemsize)
+        file.write(content.ljust(BLOCKSIZE, b"\0"))
+
+
+def _write_data_block(file: BinaryIO, vtype: int, chunks: list[np.ndarray]) -> None:
+    counts = [0, 0, 0, 0]
+    counts[[KF_INTEGER, KF_REAL, KF_STRING, KF_LOGICAL].index(vtype)] = sum(chunk.size for chunk in chunks)
+    file.write((np.array(counts, dtype=INT_DTYPE).tobytes() + b"".join(chunk.tobytes() for chunk in chunks)).ljust(BLOCKSIZE, b"\0"))
+
+
+def _write_data_blocks(file: BinaryIO, section: _Section) -> None:
+    # The variables are sliced into blocks instead of concatenated per type, such that large variables (e.g. "S-CoreSFO") are not copied as a whole
+    for vtype in section.first_blocks:
+        capacity = (BLOCKSIZE - DATA_HEADER_SIZE) // KF_TYPE_ITEMSIZE[vtype]
+        chunks: list[np.ndarray] = []
+        n_in_block = 0
+        for data in section.stream(vtype):
+            position = 0
+            while position < data.size:
+                n_take = min(capacity - n_in_block, data.size - position)
+                chunks.append(data[position : position + n_take])
+                n_in_block += n_take
+                position += n_take
+                if n_in_block == capacity:
+                    _write_data_block(file, vtype, chunks)
+                    chunks, n_in_block = [], 0
+        if chunks:
+            _write_data_block(file, vtype, chunks)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def write_kf_file(path: str | pl.Path, sections: Mapping[str, Mapping[str, Any]]) -> pl.Path:
+    """
+    Writes the sections to a KF file and returns its path. The format is {section: {variable: value}}, in which a value is one of:
+        - str: a string variable (arrays of strings are stored by AMS as one string with fixed-width entries, e.g. 160 characters)
+        - bool or a sequence/array of bools: a logical variable
+        - int or a sequence/array of ints: an integer variable (4-byte)
+        - float or a sequence/array of floats: a real variable
+    Multi-dimensional arrays are flattened (in C order). Empty variables can not be written.
+    """
+    path = pl.Path(path)
+    kf_sections = [_Section(_encode_name(name).decode().rstrip(), [_to_variable(variable, value) for variable, value in variables.items()]) for name, variables in sections.items()]
+    for section in kf_sections:
+        _layout_section(section)
+
+    n_superindex_entries = 1 + sum(1 + (section.n_data_blocks > 0) for section in kf_sections)
+    n_superindex_blocks = math.ceil(n_superindex_entries / (ENTRIES_PER_SUPERINDEX_BLOCK - 1))
+
+    block = n_superindex_blocks + 1
+    for section in kf_sections:
+        section.index_block = block
+        section.data_block = block + section.n_index_blocks
+        block += section.n_index_blocks + section.n_data_blocks
+
+    with open(path, "wb") as file:
+        _write_superindex(file, kf_sections, n_superindex_blocks, n_blocks=block - 1)
+        for section in kf_sections:
+            _write_index_blocks(file, section)
+            _write_data_blocks(file, section)
+    return path
@@ -0,0 +1,281 @@
+"""
+Module containing a memory-mapped reader for files in the KF format (e.g. adf.rkf and .t41 files) of the AMS software package.
+
+The plams :KFFile: parses every variable with `struct` into Python lists, which are then converted to numpy arrays again by this package.
+For the large sections of fragment analysis calculations (e.g. "[IRREP]", "S-CoreSFO") that conversion is the dominant cost.
+:MemoryMappedKFFile: parses the superindex and index blocks once and returns numeric variables as numpy arrays that point directly into the memory-mapped file.
+
+Layout of a KF file (see also `scm.plams.tools.kftools.KFReader`):
+- The file is divided into blocks of (usually) 4096 bytes.
+- The superindex (starting in block 1) maps each section to its index blocks (type 3) and data blocks (type 4) through (logical block, physical block, length) triples.
+- An index block lists the variables of a section with (logical block, start position, length, type) of each variable.
+- A data block starts with four integers (number of ints, doubles, characters and logicals), followed by these four regions in that order.
+  A variable starts in the region of its type in its first logical block and continues in the same region of the subsequent logical blocks.
+
+Variables that fit in their first data block are returned as zero-copy views. Variables that span multiple blocks are gathered with one concatenation, as the block headers interrupt the data.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pathlib as pl
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+
+from orb_analysis.profiling import record_bytes_read
+from orb_analysis.rkf_reading.read_tracer import TracedKFFile, trace_if_enabled
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
+
+# Integer codes of the variable types in KF files
+KF_INTEGER, KF_REAL, KF_STRING, KF_LOGICAL = 1, 2, 3, 4
+
+# Entry of the superindex: name (32 characters), physical block, logical block, number of blocks, type (3 for index and 4 for data blocks)
+# Entry of an index block: name (32 characters), logical block, start position, length, unused, used length, type
+SUPERINDEX_ENTRY_WORDS = 4
+INDEX_ENTRY_WORDS = 6
+INDEX_HEADER_WORDS = 7
+
+
+class KFFormatError(ValueError):
+    """Raised when a file can not be interpreted as a KF file by the :MemoryMappedKFFile:."""
+
+
+class MemoryMappedKFFile:
+    """
+    Read-only KF file reader that memory-maps the file and returns numeric variables as numpy arrays.
+
+    The reading interface mirrors the plams :KFFile: as it is used in this package:
+        - read(section, variable, return_as_list=False)
+        - (section, variable) in kf_file
+        - sections()
+
+    Differences with respect to :KFFile: are that numeric variables are returned as (read-only) numpy arrays instead of lists and that
+    checking whether a variable is present does not read the variable.
+    """
+
+    def __init__(self, path: str | pl.Path):
+        self.path = os.path.abspath(path)
+        with open(self.path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                raise KFFormatError(f"The file {self.path} is empty")
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._detect_format()
+        # {section: {variable: (type, logical block, start position, length)}}
+        self._variables: dict[str, dict[str, tuple[int, int, int, int]]] = {}
+        # {section: {logical block: physical block}}
+        self._data_blocks: dict[str, dict[int, int]] = {}
+        self._create_index()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def __getstate__(self) -> dict[str, str]:
+        # The memory map can not be pickled, so the file is mapped again when unpickling (e.g. in worker processes)
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict[str, str]) -> None:
+        self.__init__(state["path"])
+
+    # -------------------- Public interface -------------------- #
+
+    def read(self, section: str, variable: str, return_as_list: bool = False) -> np.ndarray | str | int | float | bool:
+        """
+        Returns the data of a variable in a section. Strings are returned as `str`, numeric and logical data as numpy arrays.
+        Like the plams KFFile, single values are returned as scalars unless `return_as_list` is True.
+        """
+        try:
+            vtype, first_block, start, length = self._variables[section][variable]
+        except KeyError:
+            raise KeyError(f"Variable {variable} of section {section} not present in {self.path}") from None
+
+        data = self._read_variable(section, vtype, first_block, start, length)
+        record_bytes_read(data.nbytes)
+
+        if vtype == KF_STRING:
+            try:
+                return data.tobytes().decode()
+            except UnicodeDecodeError:
+                return data.tobytes().decode("Latin-1")
+
+        if vtype == KF_LOGICAL:
+            data = data != 0
+
+        if length == 1 and not return_as_list:
+            return data[0].item()
+        return data
+
+    def iter_chunks(self, section: str, variable: str, chunk_size: int) -> Iterator[np.ndarray]:
+        """
+        Yields the numeric data of a variable in chunks of `chunk_size` values (the last chunk may be smaller), without reading the whole variable at once.
+        This is meant for large variables such as the fields on a grid in t41 files. Chunks are gathered from the regions of the data blocks, so the memory use is bounded by the chunk size.
+        """
+        try:
+            vtype, logical_block, start, length = self._variables[section][variable]
+        except KeyError:
+            raise KeyError(f"Variable {variable} of section {section} not present in {self.path}") from None
+
+        block_mapping = self._data_blocks[section]
+        region = self._type_region(block_mapping[logical_block], vtype)[start - 1 :]
+        pieces: list[np.ndarray] = []
+        n_chunk, n_read = 0, 0
+        while n_read < length:
+            if region.size == 0:
+                logical_block += 1
+                region = self._type_region(block_mapping[logical_block], vtype)
+            n_take = min(chunk_size - n_chunk, region.size, length - n_read)
+            pieces.append(region[:n_take])
+            region = region[n_take:]
+            n_chunk += n_take
+            n_read += n_take
+            if n_chunk == chunk_size or n_read == length:
+                yield pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+                pieces, n_chunk = [], 0
+
+    def sections(self) -> list[str]:
+        """Returns a list with all section names, ordered alphabetically."""
+        return sorted(self._variables)
+
+    def variable_type(self, section: str, variable: str) -> int:
+        """Returns the integer code of the variable type (integer: 1, real: 2, string: 3, logical: 4)."""
+        return self._variables[section][variable][0]
+
+    def __contains__(self, arg: str | tuple[str, str]) -> bool:
+        if isinstance(arg, str):
+            return arg in self._variables
+        section, variable = arg
+        return section in self._variables and variable in self._variables[section]
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        for section, variables in self._variables.items():
+            for variable in variables:
+                yield section, variable
+
+    # -------------------- Parsing of the file structure -------------------- #
+
+    def _detect_format(self) -> None:
+        """Detects the block size, integer size and endianness in the same way as the plams KFReader."""
+        header = self._buffer[:128]
+        if len(header) < 104:
+            raise KFFormatError(f"The file {self.path} is too small to be a KF file")
+
+        blocksize = int(np.frombuffer(header, dtype="<i4", count=1, offset=28)[0])
+        self._blocksize = 4096 if blocksize == 538976288 else blocksize  # 538976288 are four spaces, which means the default size
+
+        if header[48:80] == b"SUPERINDEX".ljust(32):
+            word_size, one = 4, header[80:84]
+        elif header[64:96] == b"SUPERINDEX".ljust(32):
+            word_size, one = 8, header[96:104]
+        else:
+            raise KFFormatError(f"Unable to detect the integer size and endianness of {self.path}")
+
+        for endian in ["<", ">"]:
+            if int(np.frombuffer(one, dtype=f"{endian}i{word_size}")[0]) == 1:
+                self._int_dtype = np.dtype(f"{endian}i{word_size}")
+                self._real_dtype = np.dtype(f"{endian}f8")
+                return
+        raise KFFormatError(f"Unable to detect the endianness of {self.path}")
+
+    def _entries(self, block: int, offset: int, n_words: int) -> Iterator[tuple[str, np.ndarray]]:
+        """Yields the (name, words) entries of a superindex or index block."""
+        word_size = self._int_dtype.itemsize
+        entry_size = 32 + n_words * word_size
+        block_start = (block - 1) * self._blocksize
+        for entry_start in range(block_start + offset, block_start + self._blocksize - entry_size + 1, entry_size):
+            raw_name = self._buffer[entry_start : entry_start + 32]
+            try:
+                name = raw_name.decode().rstrip(" ")
+            except UnicodeDecodeError:
+                name = raw_name.decode("Latin-1").rstrip(" ")
+            yield name, np.frombuffer(self._buffer, dtype=self._int_dtype, count=n_words, offset=entry_start + 32)
+
+    def _create_index(self) -> None:
+        index_blocks: list[tuple[str, int, int]] = []
+        superindex_block = 1
+        while True:
+            # The first entry of each superindex block is a header of which the last word points to the next superindex block (1 if there is none)
+            header, *entries = self._entries(superindex_block, 0, SUPERINDEX_ENTRY_WORDS)
+            next_superindex_block = int(header[1][3])
+            for name, (physical_block, logical_block, n_blocks, block_type) in entries:
+                if name in ["SUPERINDEX", "EMPTY"]:
+                    continue
+                if block_type == 4:
+                    block_mapping = self._data_blocks.setdefault(name, {})
+                    for i in range(int(n_blocks)):
+                        block_mapping[int(logical_block) + i] = int(physical_block) + i
+                elif block_type == 3:
+                    index_blocks.append((name, int(physical_block), int(n_blocks)))
+            if next_superindex_block == 1:
+                break
+            superindex_block = next_superindex_block
+
+        header_size = 32 + INDEX_HEADER_WORDS * self._int_dtype.itemsize
+        for section, physical_block, n_blocks in index_blocks:
+            variables = self._variables.setdefault(section, {})
+            for block in range(physical_block, physical_block + n_blocks):
+                for name, (logical_block, start, _, _, used_length, vtype) in self._entries(block, header_size, INDEX_ENTRY_WORDS):
+                    if name == "EMPTY":
+                        continue
+                    variables[name] = (int(vtype), int(logical_block), int(start), int(used_length))
+
+    # -------------------- Reading of the data blocks -------------------- #
+
+    def _type_region(self, physical_block: int, vtype: int) -> np.ndarray:
+        """Returns the region of a data block that contains the data of the given type as a numpy array pointing into the memory map."""
+        word_size = self._int_dtype.itemsize
+        block_start = (physical_block - 1) * self._blocksize
+        n_ints, n_reals, n_chars, n_logicals = (int(n) for n in np.frombuffer(self._buffer, dtype=self._int_dtype, count=4, offset=block_start))
+
+        offset = block_start + 4 * word_size
+        if vtype == KF_INTEGER:
+            return np.frombuffer(self._buffer, dtype=self._int_dtype, count=n_ints, offset=offset)
+        offset += n_ints * word_size
+        if vtype == KF_REAL:
+            return np.frombuffer(self._buffer, dtype=self._real_dtype, count=n_reals, offset=offset)
+        offset += n_reals * 8
+        if vtype == KF_STRING:
+            return np.frombuffer(self._buffer, dtype=np.uint8, count=n_chars, offset=offset)
+        offset += n_chars
+        if vtype == KF_LOGICAL:
+            return np.frombuffer(self._buffer, dtype=self._int_dtype, count=n_logicals, offset=offset)
+        raise KFFormatError(f"Unknown variable type {vtype} in {self.path}")
+
+    def _read_variable(self, section: str, vtype: int, first_block: int, start: int, length: int) -> np.ndarray:
+        block_mapping = self._data_blocks[section]
+        region = self._type_region(block_mapping[first_block], vtype)[start - 1 :]
+        if region.size >= length:
+            return region[:length]
+
+        pieces = [region]
+        n_read = region.size
+        logical_block = first_block + 1
+        while n_read < length:
+            region = self._type_region(block_mapping[logical_block], vtype)[: length - n_read]
+            pieces.append(region)
+            n_read += region.size
+            logical_block += 1
+        return np.concatenate(pieces)
+
+
+# -------------------- Interface Function(s) -------------------- #
+
+
+def open_kf_file(path: str | pl.Path, memory_map: bool = True) -> MemoryMappedKFFile | KFFile | TracedKFFile:
+    """
+    Opens a KF file for reading. If `memory_map` is True, the file is opened with the :MemoryMappedKFFile:.
+    The plams :KFFile: is used as a fallback when memory mapping is disabled, or when the file can not be memory-mapped (e.g. it does not exist or has an unknown format).
+    Within a `trace_kf_reads()` context, the reads of the file are traced (see `orb_analysis.rkf_reading.read_tracer`).
+    """
+    if memory_map:
+        try:
+            return trace_if_enabled(MemoryMappedKFFile(path))
+        except (OSError, ValueError):
+            pass
+
+    from scm.plams import KFFile  # plams is only imported when it is needed, as it takes a large part of the start-up time
+
+    return trace_if_enabled(KFFile(str(path)))
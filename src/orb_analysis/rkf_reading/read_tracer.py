@@ -0,0 +1,202 @@
+"""
+Module containing a tracer of the reads from KF files, which makes redundant reads visible and allows tests to enforce read budgets.
+
+Within `with trace_kf_reads() as trace:`, the files that are opened with `open_kf_file` (e.g. by `create_calc_analyser`) are wrapped in a :TracedKFFile:,
+which records each read as a :KFRead: with:
+    - section and variable
+    - n_bytes: the size of the data (exact for the :MemoryMappedKFFile:, approximate for the plams :KFFile:)
+    - duration: the wall time of the read in seconds
+    - stage: the profiled stage (see `orb_analysis.profiling`) in which the read took place, None when profiling is disabled
+    - caller: the function that called `read` ("[module].[function]")
+
+The reads of a file are recorded in the trace of the context in which it is opened, also when they take place after the context (e.g. in the lazy mode).
+Files that are opened in another way can be traced with `trace.wrap(kf_file)`. Example of a read budget in a test:
+    with trace_kf_reads() as trace:
+        analyzer = create_calc_analyser("adf.rkf")
+    trace.assert_budget({"SFOs/subspecies": 1, "*/S-CoreSFO": 1})
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import fnmatch
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Iterator, Mapping
+
+import attrs
+import numpy as np
+
+from orb_analysis.profiling import current_stage
+
+if TYPE_CHECKING:
+    from scm.plams import KFFile
+
+    from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile
+
+# The trace of the current `trace_kf_reads()` context, None when tracing is disabled
+_trace: KFReadTrace | None = None
+
+
+class ReadBudgetExceeded(AssertionError):
+    """Raised when variables are read more often than the read budget allows (see `KFReadTrace.assert_budget`)."""
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True)
+class KFRead:
+    """This class contains one read of a variable (see the module docstring)."""
+
+    section: str
+    variable: str
+    n_bytes: int
+    duration: float
+    stage: str | None
+    caller: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.section}/{self.variable}"
+
+
+@attrs.define
+class KFReadTrace:
+    """This class contains the :KFRead: records of all traced KF files, in the order of reading."""
+
+    reads: list[KFRead] = attrs.field(factory=list)
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, repr=False)
+
+    def record(self, read: KFRead) -> None:
+        with self._lock:
+            self.reads.append(read)
+
+    def wrap(self, kf_file: MemoryMappedKFFile | KFFile) -> TracedKFFile:
+        """Returns the KF file wrapped in a :TracedKFFile: that records its reads in this trace."""
+        return TracedKFFile(kf_file, self)
+
+    def counts(self) -> collections.Counter[str]:
+        """Returns the number of reads of each variable as {"[section]/[variable]": count}."""
+        return collections.Counter(read.key for read in self.reads)
+
+    def count(self, section: str, variable: str) -> int:
+        return self.counts()[f"{section}/{variable}"]
+
+    def duplicates(self) -> dict[str, int]:
+        """Returns the variables that are read more than once as {"[section]/[variable]": count}."""
+        return {key: count for key, count in self.counts().items() if count > 1}
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Returns the reads, bytes, duration and callers per variable, sorted by the number of bytes that are read (most first)."""
+        per_variable: dict[str, dict[str, Any]] = {}
+        for read in self.reads:
+            entry = per_variable.setdefault(read.key, {"variable": read.key, "reads": 0, "n_bytes": 0, "duration": 0.0, "callers": set(), "stages": set()})
+            entry["reads"] += 1
+            entry["n_bytes"] += read.n_bytes
+            entry["duration"] += read.duration
+            entry["callers"].add(read.caller)
+            if read.stage is not None:
+                entry["stages"].add(read.stage)
+        return sorted(per_variable.values(), key=lambda entry: entry["n_bytes"], reverse=True)
+
+    def format_summary(self, only_duplicates: bool = False) -> str:
+        """Returns the summary as a text table, optionally limited to the variables that are read more than once."""
+        lines = [f"{'Variable':<50} {'Reads':>6} {'Read (kB)':>10} {'Time (ms)':>10}  Callers"]
+        for entry in self.summary():
+            if only_duplicates and entry["reads"] < 2:
+                continue
+            lines.append(f"{entry['variable']:<50} {entry['reads']:>6d} {entry['n_bytes'] / 1024:>10.1f} {entry['duration'] * 1000:>10.2f}  {', '.join(sorted(entry['callers']))}")
+        return "\n".join(lines)
+
+    def check_budget(self, budget: Mapping[str, int]) -> list[str]:
+        """
+        Returns a description of each variable that is read more often than its budget, or an empty list.
+        The budget is {"[section]/[variable]" pattern: maximum number of reads of each matching variable}, in which the pattern may contain wildcards (e.g. "*/S-CoreSFO").
+        """
+        violations = []
+        counts = self.counts()
+        for pattern, max_reads in budget.items():
+            for key, count in counts.items():
+                if fnmatch.fnmatchcase(key, pattern) and count > max_reads:
+                    callers = sorted({read.caller for read in self.reads if read.key == key})
+                    violations.append(f"{key} is read {count} times (budget {pattern}: {max_reads}) by {', '.join(callers)}")
+        return violations
+
+    def assert_budget(self, budget: Mapping[str, int]) -> None:
+        """Raises a :ReadBudgetExceeded: error if a variable is read more often than the budget allows (see `check_budget`)."""
+        violations = self.check_budget(budget)
+        if violations:
+            raise ReadBudgetExceeded("Read budget exceeded:\n" + "\n".join(violations))
+
+
+class TracedKFFile:
+    """Wrapper of a :MemoryMappedKFFile: or plams :KFFile: that records each `read` in a :KFReadTrace:. All other attributes are those of the wrapped file."""
+
+    def __init__(self, kf_file: MemoryMappedKFFile | KFFile, trace: KFReadTrace):
+        self.kf_file = kf_file
+        self.trace = trace
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.kf_file!r})"
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that the wrapper does not have. While unpickling or copying, the wrapped file is not set yet, which would otherwise recurse
+        if name in ("kf_file", "trace"):
+            raise AttributeError(name)
+        return getattr(self.kf_file, name)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # The trace (with its lock) stays in the current process: the unpickled file is traced by the trace of the unpickling process, if any (e.g. in worker processes)
+        return trace_if_enabled, (self.kf_file,)
+
+    def __contains__(self, arg: str | tuple[str, str]) -> bool:
+        return arg in self.kf_file
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return iter(self.kf_file)
+
+    def read(self, section: str, variable: str, return_as_list: bool = False) -> Any:
+        start = time.perf_counter()
+        data = self.kf_file.read(section, variable, return_as_list=return_as_list)
+        duration = time.perf_counter() - start
+
+        caller = sys._getframe(1)
+        self.trace.record(KFRead(section, variable, _get_n_bytes(data), duration, current_stage(), f"{caller.f_globals.get('__name__')}.{caller.f_code.co_name}"))
+        return data
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _get_n_bytes(data: Any) -> int:
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, str):
+        return len(data)
+    if isinstance(data, (list, tuple)):
+        return 8 * len(data)  # the plams KFFile returns lists of Python numbers, which are (at most) 8 bytes in the file
+    return 8
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def trace_if_enabled(kf_file: MemoryMappedKFFile | KFFile) -> MemoryMappedKFFile | KFFile | TracedKFFile:
+    """Returns the KF file wrapped in a :TracedKFFile: within a `trace_kf_reads()` context, and otherwise the KF file itself."""
+    trace = _trace
+    return kf_file if trace is None else trace.wrap(kf_file)
+
+
+@contextlib.contextmanager
+def trace_kf_reads() -> Iterator[KFReadTrace]:
+    """Traces the reads of all KF files that are opened with `open_kf_file` within the context and yields the :KFReadTrace:."""
+    global _trace
+    previous_trace, trace = _trace, KFReadTrace()
+    _trace = trace
+    try:
+        yield trace
+    finally:
+        _trace = previous_trace
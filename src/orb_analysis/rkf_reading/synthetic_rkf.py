@@ -0,0 +1,224 @@
+"""
+Module containing a generator of synthetic fragment analysis rkf files, which makes it possible to test and benchmark large systems (e.g. 5,000+ SFOs) without running AMS.
+
+The files are written with `orb_analysis.rkf_reading.kf_writer` and contain the sections that are read by this package (see `sfo_functions` and `mo_functions`):
+    - "General": nspin, nspinf, ioprel
+    - "Symmetry": grouplabel, symlab, nsym, ncbs (frozen cores per irrep), norb
+    - "SFOs": number, fragtype, fragment, subspecies, isfo, occupation, energy and escale (+ "_B" variants for unrestricted calculations)
+    - "SFO popul": sfo_grosspop (frozen cores included)
+    - "[IRREP]": nmo_[SPIN], froc_[SPIN], eps_[SPIN], escale_[SPIN] and the packed overlap triangle S-CoreSFO (S-CoreSFO_B for spin B)
+
+The data is random but structurally valid and reproducible for a given seed: the SFOs of each fragment are orthonormal, SFOs of different fragments overlap,
+the lowest SFOs and MOs of each irrep are occupied, and the "escale" variables are only present for relativistic calculations. Example:
+    write_synthetic_rkf("adf.rkf", SyntheticCalcSpec(n_sfos_per_fragment=2500, point_group="C(2V)", n_frozen_cores=10, unrestricted=True, seed=1))
+"""
+
+from __future__ import annotations
+
+import pathlib as pl
+from typing import Any
+
+import attrs
+import numpy as np
+
+from orb_analysis.rkf_reading.kf_writer import write_kf_file
+
+# Width of the entries of string arrays in rkf files (e.g. "symlab" and "subspecies")
+KF_STRING_WIDTH = 160
+
+POINT_GROUP_IRREPS: dict[str, tuple[str, ...]] = {
+    "NOSYM": ("A",),
+    "C(S)": ("AA", "AAA"),
+    "C(2V)": ("A1", "A2", "B1", "B2"),
+    "C(3V)": ("A1", "A2", "E1:1", "E1:2"),
+    "D(2H)": ("AG", "B1G", "B2G", "B3G", "AU", "B1U", "B2U", "B3U"),
+}
+
+# Standard deviation of the overlap between SFOs of different fragments and between frozen cores and SFOs
+INTERFRAGMENT_OVERLAP_SCALE = 0.1
+CORE_OVERLAP_SCALE = 0.01
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True)
+class SyntheticCalcSpec:
+    """
+    This class contains the parameters of a synthetic fragment analysis calculation:
+        - n_sfos_per_fragment: number of active SFOs (frozen cores excluded) of each fragment, distributed evenly over the irreps
+        - point_group: one of `POINT_GROUP_IRREPS`, which determines the irreps ("NOSYM" has only irrep "A")
+        - n_frozen_cores: number of frozen core orbitals per irrep, either one number for all irreps or one per irrep
+        - n_fragments: number of fragments
+        - unrestricted: whether the calculation is spin-unrestricted
+        - spin_polarization: number of unpaired (spin A) electrons of each fragment, only for unrestricted calculations
+        - occupied_fraction: fraction of the SFOs of each fragment and irrep that is occupied
+        - relativistic: whether the "escale" variables (ZORA scaled energies) are written next to "energy" and "eps_[SPIN]"
+        - seed: seed of the random data
+    """
+
+    n_sfos_per_fragment: int = 50
+    point_group: str = "NOSYM"
+    n_frozen_cores: int | tuple[int, ...] = 0
+    n_fragments: int = 2
+    unrestricted: bool = False
+    spin_polarization: int = 0
+    occupied_fraction: float = 0.25
+    relativistic: bool = True
+    seed: int = 0
+
+    def __attrs_post_init__(self):
+        if self.point_group not in POINT_GROUP_IRREPS:
+            raise ValueError(f"Unknown point group {self.point_group}. Options are {', '.join(POINT_GROUP_IRREPS)}")
+        if self.n_sfos_per_fragment < len(self.irreps):
+            raise ValueError(f"Each fragment needs at least one SFO per irrep ({len(self.irreps)} irreps), got {self.n_sfos_per_fragment} SFOs per fragment")
+        if self.n_fragments < 2:
+            raise ValueError("A fragment analysis calculation needs at least two fragments")
+        if not isinstance(self.n_frozen_cores, int) and len(self.n_frozen_cores) != len(self.irreps):
+            raise ValueError(f"The number of frozen cores should be given for all {len(self.irreps)} irreps, got {len(self.n_frozen_cores)}")
+        if self.spin_polarization and not self.unrestricted:
+            raise ValueError("Spin polarization is only possible for unrestricted calculations")
+
+    @property
+    def irreps(self) -> tuple[str, ...]:
+        return POINT_GROUP_IRREPS[self.point_group]
+
+    @property
+    def spins(self) -> list[str]:
+        return ["A", "B"] if self.unrestricted else ["A"]
+
+    @property
+    def frozen_cores_per_irrep(self) -> list[int]:
+        return [self.n_frozen_cores] * len(self.irreps) if isinstance(self.n_frozen_cores, int) else list(self.n_frozen_cores)
+
+    @property
+    def n_sfos_per_irrep(self) -> list[int]:
+        """Returns the number of active SFOs of each fragment per irrep. The remainder of the division over the irreps goes to the first irreps."""
+        n_per_irrep, remainder = divmod(self.n_sfos_per_fragment, len(self.irreps))
+        return [n_per_irrep + (i < remainder) for i in range(len(self.irreps))]
+
+    def n_occupied(self, n_sfos: int, spin: str, first_irrep: bool) -> int:
+        """Returns the number of occupied SFOs of a fragment in an irrep. The unpaired electrons of spin A occupy the first irrep."""
+        n_occupied = max(1, round(self.occupied_fraction * n_sfos))
+        if spin == "A" and first_irrep:
+            n_occupied += self.spin_polarization
+        return min(n_occupied, n_sfos)
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _string_array(labels: list[str]) -> str:
+    """Returns the labels in the format of string arrays in rkf files: one string of fixed-width entries."""
+    return "".join(label.ljust(KF_STRING_WIDTH) for label in labels)
+
+
+def _create_overlap_triangle(rng: np.random.Generator, owners: np.ndarray) -> np.ndarray:
+    """
+    Returns the packed lower triangle (row by row: S11, S21, S22, S31, ...) of the overlap matrix of the orbitals with the given owners
+    (0 for frozen cores, otherwise the fragment index). Orbitals of the same owner are orthonormal, so their overlap is 0 (1 on the diagonal).
+    The owners are contiguous, which makes the orthonormal part of each row a single slice.
+    """
+    n = owners.size
+    triangle = rng.standard_normal(n * (n + 1) // 2)
+    triangle *= INTERFRAGMENT_OVERLAP_SCALE
+    np.clip(triangle, -0.9, 0.9, out=triangle)
+
+    owner_starts = {owner: int(np.argmax(owners == owner)) for owner in np.unique(owners).tolist()}
+    n_cores = int(np.count_nonzero(owners == 0))
+    for row in range(n):
+        start = row * (row + 1) // 2
+        row_values = triangle[start : start + row + 1]
+        if owners[row] != 0:
+            row_values[:n_cores] *= CORE_OVERLAP_SCALE / INTERFRAGMENT_OVERLAP_SCALE
+        row_values[owner_starts[int(owners[row])] : row] = 0.0
+        row_values[row] = 1.0
+    return triangle
+
+
+def create_synthetic_sections(spec: SyntheticCalcSpec) -> dict[str, dict[str, Any]]:
+    """Returns the sections of the synthetic calculation in the format of `write_kf_file` ({section: {variable: value}})."""
+    rng = np.random.default_rng(spec.seed)
+    irreps = spec.irreps
+    frozen_cores = spec.frozen_cores_per_irrep
+    fragments = list(range(1, spec.n_fragments + 1))
+    occupation = 1.0 if spec.unrestricted else 2.0
+
+    # The SFOs are ordered by irrep and then by fragment, each block sorted by energy (as in rkf files of AMS)
+    fragment, subspecies, isfo = [], [], []
+    energies: dict[str, list[np.ndarray]] = {spin: [] for spin in spec.spins}
+    occupations: dict[str, list[np.ndarray]] = {spin: [] for spin in spec.spins}
+    for irrep_index, (irrep, n_sfos) in enumerate(zip(irreps, spec.n_sfos_per_irrep)):
+        for frag_index in fragments:
+            fragment += [frag_index] * n_sfos
+            subspecies += [irrep] * n_sfos
+            isfo += list(range((frag_index - 1) * n_sfos + 1, frag_index * n_sfos + 1))  # the index within the irrep continues over the fragments
+            energies_a = np.sort(rng.uniform(-1.0, 2.0, n_sfos))
+            for spin in spec.spins:
+                # Spin B is slightly destabilized with respect to spin A by the unpaired electrons
+                spin_energies = energies_a if spin == "A" else np.sort(energies_a + 0.005 * spec.spin_polarization + rng.normal(0.0, 0.002, n_sfos))
+                n_occupied = spec.n_occupied(n_sfos, spin, first_irrep=irrep_index == 0)
+                energies[spin].append(spin_energies)
+                occupations[spin].append(np.where(np.arange(n_sfos) < n_occupied, occupation, 0.0))
+
+    suffixes = {"A": "", "B": "_B"}
+    sfos: dict[str, Any] = {
+        "number": len(fragment),
+        "fragtype": _string_array([f"frag{frag_index}" for frag_index in fragment]),
+        "fragment": np.array(fragment),
+        "subspecies": _string_array(subspecies),
+        "isfo": np.array(isfo),
+    }
+    for spin in spec.spins:
+        sfos[f"occupation{suffixes[spin]}"] = np.concatenate(occupations[spin])
+        sfos[f"energy{suffixes[spin]}"] = np.concatenate(energies[spin]) * (1 + 5e-5)  # non-relativistic energies are slightly different
+        if spec.relativistic:
+            sfos[f"escale{suffixes[spin]}"] = np.concatenate(energies[spin])
+
+    # Gross populations per spin and irrep: [frozen cores, SFOs of fragment 1, SFOs of fragment 2, ...]
+    sfo_occupations = {spin: np.concatenate(occupations[spin]) for spin in spec.spins}
+    irreps_each_sfo = np.array(subspecies)
+    gross_populations = []
+    for spin in spec.spins:
+        for irrep, n_cores in zip(irreps, frozen_cores):
+            gross_populations += [np.full(n_cores, occupation), sfo_occupations[spin][irreps_each_sfo == irrep] + rng.normal(0.0, 0.05, np.count_nonzero(irreps_each_sfo == irrep))]
+
+    sections: dict[str, dict[str, Any]] = {
+        "General": {"nspin": len(spec.spins), "nspinf": len(spec.spins), "ioprel": 3 if spec.relativistic else 0, "title": "Synthetic fragment analysis"},
+        "Symmetry": {
+            "grouplabel": spec.point_group.ljust(KF_STRING_WIDTH),
+            "symlab": _string_array(list(irreps)),
+            "nsym": len(irreps),
+            "ncbs": np.array(frozen_cores),
+            "norb": np.array([spec.n_fragments * n_sfos for n_sfos in spec.n_sfos_per_irrep]),
+        },
+        "SFOs": sfos,
+        "SFO popul": {"sfo_grosspop": np.concatenate(gross_populations)},
+    }
+
+    # The MOs of each irrep: as many as there are active SFOs in the irrep, occupied by the electrons of the SFOs of that irrep
+    for irrep, n_cores, n_sfos in zip(irreps, frozen_cores, spec.n_sfos_per_irrep):
+        n_mos = spec.n_fragments * n_sfos
+        owners = np.concatenate([np.zeros(n_cores, dtype=np.int64), np.repeat(fragments, n_sfos)])
+        irrep_section: dict[str, Any] = {}
+        for spin in spec.spins:
+            n_occupied_mos = int(np.count_nonzero(sfo_occupations[spin][irreps_each_sfo == irrep]))
+            mo_energies = np.sort(rng.uniform(-1.2, 2.0, n_mos))
+            irrep_section[f"nmo_{spin}"] = n_mos
+            irrep_section[f"froc_{spin}"] = np.where(np.arange(n_mos) < n_occupied_mos, occupation, 0.0)
+            irrep_section[f"eps_{spin}"] = mo_energies * (1 + 5e-5)
+            if spec.relativistic:
+                irrep_section[f"escale_{spin}"] = mo_energies
+            irrep_section["S-CoreSFO" if spin == "A" else "S-CoreSFO_B"] = _create_overlap_triangle(rng, owners)
+        sections[irrep] = irrep_section
+
+    return sections
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def write_synthetic_rkf(path: str | pl.Path, spec: SyntheticCalcSpec | None = None, **spec_kwargs: Any) -> pl.Path:
+    """Writes a synthetic fragment analysis rkf file and returns its path. The calculation is given as :SyntheticCalcSpec: or as its parameters (e.g. `n_sfos_per_fragment=2500`)."""
+    spec = SyntheticCalcSpec(**spec_kwargs) if spec is None else attrs.evolve(spec, **spec_kwargs)
+    return write_kf_file(path, create_synthetic_sections(spec))
@@ -0,0 +1,140 @@
+"""
+Module containing a cache for the t41 files (orbitals on a grid) that are computed by DensF.
+
+A cache entry is identified by a hash of:
+    - the content of the input rkf file, such that a copied or moved rkf file reuses the t41 files and a recomputed one never does
+    - the normalized DensF settings (see `normalize_densf_settings`), without the input file, output file and orbitals, i.e., mainly the grid
+
+The requested orbitals are not part of the key. Instead, every entry directory ("[directory]/[first two characters of the key]/[key]") contains t41 files with
+different sets of orbitals, and an "index.json" file with the orbitals ({SCF,SFO}_* sections with the orbital index as variable) in each t41 file.
+The t41 files are scanned once, when they are not yet in the index or have changed since. The DensF planner (see `plan_densf_jobs`) only plans jobs for the orbitals that are not in any
+t41 file of the entry, of which the t41 file is written to a stable location in the entry. Therefore, the input file of the amsview images is the same on every run, and the image cache is hit as well.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib as pl
+import uuid
+from functools import lru_cache
+from typing import Any, Sequence
+
+import attrs
+from orb_analysis.orbital.orbital import Orbital
+from orb_analysis.rkf_reading.mmap_reader import open_kf_file
+from scm.plams import Settings
+
+from orb_visualization.image_cache import get_input_file_identity
+
+INDEX_FILE = "index.json"
+ORBITAL_SECTION_PREFIXES = ("SCF_", "SFO_")
+NOT_CACHED_KEYS = ["inputfile", "outputfile", "cuboutput", "orbitals"]  # these are handled separately or do not change the grid
+
+# --------------------Helper Functions-------------------- #
+
+
+@lru_cache(maxsize=256)
+def _hash_file(path: str, size: int, mtime_ns: int) -> str:
+    """Returns the hash of the file content. The size and modification time are only used to recompute the hash when the file changes."""
+    file_hash = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024**2), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_input_file_hash(input_file: str | pl.Path) -> str | None:
+    """Returns the hash of the content of the input file, or None if the file does not exist."""
+    identity = get_input_file_identity(input_file)
+    if identity is None:
+        return None
+    return _hash_file(identity["path"], identity["size"], identity["mtime_ns"])
+
+
+def _lower_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key).lower(): _lower_keys(entry) for key, entry in value.items()}
+    return value
+
+
+def normalize_densf_settings(settings: Settings) -> dict[str, Any]:
+    """Returns the DensF settings as a dictionary with lowercase keys (DensF input is case insensitive) without the input file, output file and orbitals."""
+    normalized = _lower_keys(settings.as_dict())
+    normalized["input"] = {key: value for key, value in normalized.get("input", {}).items() if key not in NOT_CACHED_KEYS}
+    normalized.pop("runscript", None)  # the number of cores does not change the result
+    return normalized
+
+
+def scan_t41_orbitals(t41_file: str | pl.Path) -> list[tuple[str, str]]:
+    """Returns the (section, variable) pairs of all orbitals in the t41 file, e.g. ("SFO_A1_A", "11")."""
+    kf_file = open_kf_file(t41_file)
+    return sorted((section, variable) for section, variable in kf_file if section.startswith(ORBITAL_SECTION_PREFIXES) and variable.isdigit())
+
+
+def _write_json_atomically(content: Any, destination: pl.Path) -> None:
+    temp_file = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        temp_file.write_text(json.dumps(content, indent=1))
+        os.replace(temp_file, destination)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class DensfCache:
+    """Cache of DensF t41 files, of which the orbitals are indexed per entry (see the module docstring)."""
+
+    directory: pl.Path = attrs.field(converter=lambda directory: pl.Path(directory).expanduser())
+
+    def get_key(self, rkf_file: str | pl.Path, settings: Settings) -> str | None:
+        """Returns the key of the entry of the rkf file and DensF settings, or None when the rkf file does not exist."""
+        input_hash = get_input_file_hash(rkf_file)
+        if input_hash is None:
+            return None
+        content = {"input": input_hash, "settings": normalize_densf_settings(settings)}
+        return hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode(), digest_size=20).hexdigest()
+
+    def get_entry_dir(self, key: str) -> pl.Path:
+        return self.directory / key[:2] / key
+
+    def get_t41_path(self, key: str, name: str, orbitals: Sequence[Orbital]) -> pl.Path:
+        """Returns the stable location of the t41 file with the orbitals: the same set of orbitals is always written to the same file."""
+        orbitals_hash = hashlib.blake2b(" ".join(sorted(orb.amsview_label for orb in orbitals)).encode(), digest_size=8).hexdigest()
+        return self.get_entry_dir(key) / f"{name}_{orbitals_hash}.t41"
+
+    def get_orbital_index(self, key: str) -> dict[tuple[str, str], pl.Path]:
+        """
+        Returns the orbitals of all t41 files in the entry as {(section, variable): t41 file}.
+        Only the t41 files that are new or changed since the last call are scanned, after which the updated index is written to the entry.
+        """
+        entry_dir = self.get_entry_dir(key)
+        index_file = entry_dir / INDEX_FILE
+        try:
+            index: dict[str, dict[str, Any]] = json.loads(index_file.read_text())
+        except (OSError, ValueError):
+            index = {}
+
+        updated_index: dict[str, dict[str, Any]] = {}
+        for t41_file in sorted(entry_dir.glob("*.t41")):
+            mtime_ns = t41_file.stat().st_mtime_ns
+            if t41_file.name in index and index[t41_file.name]["mtime_ns"] == mtime_ns:
+                updated_index[t41_file.name] = index[t41_file.name]
+                continue
+            try:
+                orbitals = scan_t41_orbitals(t41_file)
+            except (OSError, ValueError):
+                continue  # e.g. a t41 file that is being written; it is scanned on the next call
+            updated_index[t41_file.name] = {"mtime_ns": mtime_ns, "orbitals": orbitals}
+
+        if updated_index != index and entry_dir.is_dir():
+            try:
+                _write_json_atomically(updated_index, index_file)
+            except OSError:
+                pass  # The index is only an optimization, e.g. the cache directory may be read-only
+
+        return {tuple(orbital): entry_dir / name for name, entry in updated_index.items() for orbital in entry["orbitals"]}
@@ -0,0 +1,211 @@
+"""
+Module containing a planner that groups the requested orbitals (SFOs and MOs) of many rkf files into the fewest possible DensF jobs.
+
+One DensF job can only compute one type of orbital (SFO or SCF) and, for unrestricted calculations, one spin. The planner therefore creates one job per
+(rkf file, orbital type, spin) with all requested irreps and indices in a single ORBITALS block, using the presets of `orb_visualization.densf_presets` (grid, output and orbital).
+The jobs are run in parallel with a plams :JobRunner: within a core budget, after which the t41 variable of each orbital is looked up in the written t41 files.
+With a :DensfCache:, the orbitals that are already in a cached t41 file (of the same rkf file and grid) are not computed again, and the new t41 files are written to the cache.
+
+Typical usage:
+    plan = plan_densf_jobs({"system1/adf.rkf": sfos + mos, "system2/adf.rkf": sfos}, output_dir)
+    variables = run_densf_plan(plan, n_cores=16, cores_per_job=4)
+    variables[("system1/adf.rkf", sfos[0].amsview_label)].label  # e.g. "SFO_A_A_11", which can be plotted with amsview
+"""
+
+from __future__ import annotations
+
+import os
+import pathlib as pl
+from collections import defaultdict
+from typing import Mapping, Sequence
+
+import attrs
+from orb_analysis.custom_types import SpinTypes
+from orb_analysis.orbital.orbital import MO, Orbital
+from orb_analysis.rkf_reading.mmap_reader import open_kf_file
+from scm.plams import DensfJob, JobManager, JobRunner, Settings, config
+
+from orb_visualization.densf_cache import DensfCache
+from orb_visualization.densf_presets import grid, orbital, output
+
+SPIN_TO_DENSF_SPIN = {SpinTypes.A: "alpha", SpinTypes.B: "beta"}
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True)
+class DensfVariable:
+    """This class contains the location of a computed orbital in a t41 file."""
+
+    t41_file: pl.Path
+    section: str
+    variable: str
+
+    @property
+    def label(self) -> str:
+        """Returns the "[section]_[variable]" label that is used for plotting the orbital with amsview"""
+        return f"{self.section}_{self.variable}"
+
+
+@attrs.define
+class PlannedDensfJob:
+    """This class contains the settings of one DensF job and the orbitals that it computes."""
+
+    rkf_file: pl.Path
+    name: str
+    orbital_type: str
+    spin: str | None
+    orbitals: list[Orbital]
+    settings: Settings
+
+    @property
+    def t41_file(self) -> pl.Path:
+        return pl.Path(self.settings.input.OUTPUTFILE)
+
+    def create_job(self) -> DensfJob:
+        return DensfJob(inputjob=str(self.rkf_file.resolve()), name=self.name, settings=self.settings.copy())
+
+
+@attrs.define
+class DensfPlan:
+    """This class contains the planned DensF jobs of all rkf files, and the t41 variables of the orbitals that are already in the DensF cache as {(rkf file, amsview label): t41 variable}."""
+
+    jobs: list[PlannedDensfJob] = attrs.field(factory=list)
+    cached_variables: dict[tuple[str, str], DensfVariable] = attrs.field(factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _get_orbital_type(orb: Orbital) -> str:
+    return "SCF" if isinstance(orb, MO) else "SFO"
+
+
+def _get_spin(orb: Orbital) -> str | None:
+    """Returns the spin of an orbital of an unrestricted calculation, or None for restricted calculations"""
+    return str(orb.spin) if str(orb.spin) in SPIN_TO_DENSF_SPIN else None
+
+
+def _get_t41_sections(orbital_type: str, spin: str | None, orb: Orbital) -> list[str]:
+    """DensF writes the orbitals to the "[type]_[irrep]_[spin]" section (or "[type]_[irrep]"), with the orbital index as variable name."""
+    return [f"{orbital_type}_{orb.irrep}_{'A' if spin is None else spin}", f"{orbital_type}_{orb.irrep}"]
+
+
+def _create_densf_settings(orbital_type: str, spin: str | None, orbitals: Sequence[Orbital], t41_file: pl.Path, grid_type: str) -> Settings:
+    settings = Settings()
+    settings.update(grid(grid_type=grid_type))
+    settings.update(output(outputfile=str(t41_file)))
+    if spin is not None:
+        settings.update(orbital(type=orbital_type, spin=SPIN_TO_DENSF_SPIN[SpinTypes(spin)]))
+
+    # Each irrep becomes one line of the same ORBITALS block, e.g. "A1 3, 4" and "E1 1"
+    indices_per_irrep: dict[str, set[int]] = defaultdict(set)
+    for orb in orbitals:
+        indices_per_irrep[orb.irrep].add(orb.index)
+    for irrep, indices in indices_per_irrep.items():
+        settings.update(orbital(type=orbital_type, irrep_number_label=(irrep, sorted(indices))))
+    return settings
+
+
+def get_t41_variables(planned_job: PlannedDensfJob) -> dict[str, DensfVariable]:
+    """
+    Returns the t41 variables of the orbitals of a finished DensF job as {amsview label: t41 variable}. Orbitals that are not in the t41 file are left out.
+    """
+    if not planned_job.t41_file.is_file():
+        return {}
+
+    kf_file = open_kf_file(planned_job.t41_file)
+    variables: dict[str, DensfVariable] = {}
+    for orb in planned_job.orbitals:
+        for section in _get_t41_sections(planned_job.orbital_type, planned_job.spin, orb):
+            if (section, str(orb.index)) in kf_file:
+                variables[orb.amsview_label] = DensfVariable(planned_job.t41_file, section, str(orb.index))
+                break
+    return variables
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def plan_densf_jobs(requested_orbitals: Mapping[str | pl.Path, Sequence[Orbital]], output_dir: str | pl.Path, grid_type: str = "coarse", densf_cache: DensfCache | None = None) -> DensfPlan:
+    """
+    Groups the requested orbitals into one DensF job per (rkf file, orbital type, spin). Orbitals that are requested more than once are computed once.
+
+    Args:
+        requested_orbitals: The SFOs and/or MOs to compute per rkf file
+        output_dir: The directory in which the t41 files are written, as "[output_dir]/[job name].t41"
+        grid_type: The DensF grid ("coarse", "medium" or "fine"). Defaults to "coarse".
+        densf_cache: The cache of which the t41 files are reused. The t41 files of the planned jobs are then written to the cache instead of the output directory. Defaults to no cache.
+    """
+    output_dir = pl.Path(output_dir).resolve()
+    plan = DensfPlan()
+    cached_indices: dict[str, dict[tuple[str, str], pl.Path]] = {}  # the orbitals in the cache entries, which are shared by the orbital types and spins of an rkf file
+
+    for rkf_index, (rkf_file, orbitals) in enumerate(requested_orbitals.items()):
+        rkf_file = pl.Path(rkf_file)
+        groups: dict[tuple[str, str | None], dict[str, Orbital]] = defaultdict(dict)
+        for orb in orbitals:
+            groups[(_get_orbital_type(orb), _get_spin(orb))].setdefault(orb.amsview_label, orb)
+
+        for (orbital_type, spin), unique_orbitals in groups.items():
+            group_name = orbital_type if spin is None else f"{orbital_type}_{spin}"
+            name = f"{rkf_index:03d}_{rkf_file.resolve().parent.name}_{group_name}"
+            missing_orbitals = list(unique_orbitals.values())
+            settings = _create_densf_settings(orbital_type, spin, missing_orbitals, output_dir / f"{name}.t41", grid_type)
+
+            key = densf_cache.get_key(rkf_file, settings) if densf_cache is not None else None
+            if densf_cache is not None and key is not None:
+                if key not in cached_indices:
+                    cached_indices[key] = densf_cache.get_orbital_index(key)
+                orbital_index = cached_indices[key]
+                missing_orbitals = []
+                for orb in unique_orbitals.values():
+                    section = next((section for section in _get_t41_sections(orbital_type, spin, orb) if (section, str(orb.index)) in orbital_index), None)
+                    if section is None:
+                        missing_orbitals.append(orb)
+                        continue
+                    plan.cached_variables[(str(rkf_file), orb.amsview_label)] = DensfVariable(orbital_index[(section, str(orb.index))], section, str(orb.index))
+
+                if not missing_orbitals:
+                    continue
+                t41_file = densf_cache.get_t41_path(key, group_name, missing_orbitals)
+                settings = _create_densf_settings(orbital_type, spin, missing_orbitals, t41_file, grid_type)
+
+            plan.jobs.append(PlannedDensfJob(rkf_file, name, orbital_type, spin, missing_orbitals, settings))
+
+    return plan
+
+
+def run_densf_plan(plan: DensfPlan, n_cores: int | None = None, cores_per_job: int = 1, plams_dir: str | pl.Path | None = None) -> dict[tuple[str, str], DensfVariable]:
+    """
+    Runs the planned DensF jobs in parallel and returns the t41 variable of each orbital as {(rkf file, amsview label): t41 variable}.
+
+    Args:
+        plan: The planned DensF jobs, see `plan_densf_jobs`
+        n_cores: The total number of cores that the jobs may use. Defaults to the number of cores of the machine.
+        cores_per_job: The number of cores of each DensF job. Defaults to 1, such that `n_cores` jobs run at the same time.
+        plams_dir: The directory in which the plams working folder ("densf_jobs") is made. Defaults to the current working directory.
+
+    The orbitals that are already in the DensF cache (see `plan_densf_jobs`) are returned as well. Orbitals of failed jobs are not in the returned dictionary.
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    job_runner = JobRunner(parallel=True, maxjobs=max(n_cores // cores_per_job, 1))
+    job_manager = JobManager(config.jobmanager, path=str(plams_dir) if plams_dir is not None else None, folder="densf_jobs")
+
+    for planned_job in plan.jobs:
+        planned_job.t41_file.parent.mkdir(parents=True, exist_ok=True)
+
+    jobs = [planned_job.create_job() for planned_job in plan.jobs]
+    for job in jobs:
+        job.settings.runscript.nproc = cores_per_job
+        job.run(jobrunner=job_runner, jobmanager=job_manager)
+
+    variables = dict(plan.cached_variables)
+    for planned_job, job in zip(plan.jobs, jobs):
+        job.results.wait()
+        variables.update({(str(planned_job.rkf_file), label): variable for label, variable in get_t41_variables(planned_job).items()})
+    return variables
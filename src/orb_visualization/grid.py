@@ -0,0 +1,253 @@
+"""
+Module containing a reader for orbitals on a grid (t41 files of DensF and Gaussian cube files) and integrals of these orbitals.
+
+The orbitals can be ranked and screened numerically instead of looking at each of them in amsview:
+    - `get_norm`: the integral of the density (ψ²) over the grid
+    - `get_spatial_extent`: the root-mean-square distance of the density to its centre
+    - `get_overlap_integral`: the overlap integral ∫ψ1ψ2 of two orbitals on the same grid
+    - `get_overlap_density`: the overlap density ψ1ψ2 on the grid
+    - `get_density_fraction`: the fraction of the density within a region (e.g. a sphere around a fragment, see `sphere` and `box`)
+
+The fields are not loaded as a whole. t41 files are memory-mapped (see :MemoryMappedKFFile:) and all integrals are computed with reductions over chunks of `chunk_size` points,
+including the coordinates of the points. As such, the memory use of the integrals does not grow with the grid size (e.g. a 200³ grid never needs a second full-size array).
+Cube files are text files, of which the values are parsed once into one array.
+
+All coordinates are in bohr.
+"""
+
+from __future__ import annotations
+
+import pathlib as pl
+from typing import Callable, Iterator
+
+import attrs
+import numpy as np
+from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile
+from scm.plams import Units
+
+DEFAULT_CHUNK_SIZE = 2**18  # points per chunk, i.e. 2 MiB of values
+ORBITAL_SECTION_PREFIXES = ("SCF_", "SFO_")
+
+# A region returns for each point (an (n, 3) array of coordinates) whether the point is in the region
+Region = Callable[[np.ndarray], np.ndarray]
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True, eq=False)
+class Grid:
+    """
+    This class contains the geometry of a regular grid:
+        - origin: the coordinates of the first point
+        - shape: the number of points along the three axes
+        - vectors: the step vectors of the three axes (rows)
+        - order: the order of the points in the field, "F" if the first axis runs fastest (t41 files) or "C" if the last axis runs fastest (cube files)
+    """
+
+    origin: np.ndarray = attrs.field(converter=lambda origin: np.asarray(origin, dtype=np.float64))
+    shape: tuple[int, int, int] = attrs.field(converter=lambda shape: tuple(int(n) for n in shape))
+    vectors: np.ndarray = attrs.field(converter=lambda vectors: np.asarray(vectors, dtype=np.float64).reshape(3, 3))
+    order: str = "F"
+
+    @property
+    def n_points(self) -> int:
+        return self.shape[0] * self.shape[1] * self.shape[2]
+
+    @property
+    def voxel_volume(self) -> float:
+        return float(abs(np.linalg.det(self.vectors)))
+
+    def is_compatible(self, other: Grid) -> bool:
+        """Returns True if the points of both grids are at the same coordinates and in the same order."""
+        return self.shape == other.shape and self.order == other.order and np.allclose(self.origin, other.origin) and np.allclose(self.vectors, other.vectors)
+
+    def get_coordinates(self, start: int, stop: int) -> np.ndarray:
+        """Returns the (stop - start, 3) coordinates of the points start up to stop."""
+        indices = np.unravel_index(np.arange(start, stop), self.shape, order=self.order)
+        return self.origin + np.column_stack(indices).astype(np.float64) @ self.vectors
+
+
+@attrs.define(eq=False)
+class OrbitalField:
+    """This class contains an orbital on a grid, of which the values are read in chunks with `iter_chunks`."""
+
+    name: str
+    grid: Grid
+    _read_chunks: Callable[[int], Iterator[np.ndarray]]
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the (index of the first point, values) of consecutive chunks of at most `chunk_size` points."""
+        start = 0
+        for values in self._read_chunks(chunk_size):
+            yield start, values
+            start += values.size
+
+    def to_array(self) -> np.ndarray:
+        """Returns the values as an array with the shape of the grid. Note that this reads the whole field into memory."""
+        values = np.concatenate([values for _, values in self.iter_chunks()])
+        return values.reshape(self.grid.shape, order=self.grid.order)  # type: ignore
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _iter_chunk_pairs(field1: OrbitalField, field2: OrbitalField, chunk_size: int) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+    if not field1.grid.is_compatible(field2.grid):
+        raise ValueError(f"The orbitals {field1.name} and {field2.name} are not on the same grid")
+    for (start, values1), (_, values2) in zip(field1.iter_chunks(chunk_size), field2.iter_chunks(chunk_size)):
+        yield start, values1, values2
+
+
+def _read_t41_grid(kf_file: MemoryMappedKFFile) -> Grid:
+    shape = [kf_file.read("Grid", f"nr of points {axis}") for axis in "xyz"]
+    vectors = [kf_file.read("Grid", f"{axis}-vector") for axis in "xyz"]
+    return Grid(kf_file.read("Grid", "Start_point"), shape, vectors, order="F")  # type: ignore
+
+
+def _read_cube_header(file) -> tuple[Grid, int]:
+    """Reads the header of a cube file and returns the grid and the number of values per point (more than one if the file contains several orbitals)."""
+    for _ in range(2):
+        file.readline()  # comment lines
+    n_atoms, *origin = file.readline().split()[:4]
+    n_atoms = int(n_atoms)
+
+    shape, vectors = [], []
+    for _ in range(3):
+        n_points, *vector = file.readline().split()[:4]
+        shape.append(int(n_points))
+        vectors.append([float(value) for value in vector])
+    # A negative number of points means that the coordinates are in angstrom
+    unit_factor = Units.convert(1.0, "angstrom", "bohr") if shape[0] < 0 else 1.0
+    shape = [abs(n_points) for n_points in shape]
+
+    for _ in range(abs(n_atoms)):
+        file.readline()
+
+    # A negative number of atoms means that the line after the atoms contains the number of orbitals and their indices
+    n_values = 1
+    if n_atoms < 0:
+        orbital_indices = file.readline().split()
+        n_values = int(orbital_indices[0])
+
+    grid = Grid(np.array(origin, dtype=np.float64) * unit_factor, shape, np.array(vectors) * unit_factor, order="C")
+    return grid, n_values
+
+
+# --------------------Interface Function(s) (reading)-------------------- #
+
+
+def read_t41_field(t41_file: str | pl.Path, section: str, variable: str) -> OrbitalField:
+    """Returns the orbital of the variable in the section of the t41 file (e.g. "SFO_A_A" and "11", see :DensfVariable:). The file is memory-mapped and read in chunks."""
+    kf_file = MemoryMappedKFFile(t41_file)
+    if (section, variable) not in kf_file:
+        raise KeyError(f"Variable {variable} of section {section} not present in {t41_file}")
+    return OrbitalField(f"{section}_{variable}", _read_t41_grid(kf_file), lambda chunk_size: kf_file.iter_chunks(section, variable, chunk_size))
+
+
+def read_t41_fields(t41_file: str | pl.Path) -> dict[str, OrbitalField]:
+    """Returns all orbitals ({SCF,SFO}_* sections) of the t41 file as {"[section]_[variable]": orbital}, e.g. "SFO_A_A_11"."""
+    kf_file = MemoryMappedKFFile(t41_file)
+    grid = _read_t41_grid(kf_file)
+
+    fields: dict[str, OrbitalField] = {}
+    for section, variable in kf_file:
+        if section.startswith(ORBITAL_SECTION_PREFIXES) and variable.isdigit():
+            fields[f"{section}_{variable}"] = OrbitalField(f"{section}_{variable}", grid, lambda chunk_size, section=section, variable=variable: kf_file.iter_chunks(section, variable, chunk_size))
+    return fields
+
+
+def read_cube_fields(cube_file: str | pl.Path) -> list[OrbitalField]:
+    """Returns the orbital(s) of the cube file, named "[file name]" or "[file name]_[i]" if the file contains several orbitals."""
+    cube_file = pl.Path(cube_file)
+    with open(cube_file) as file:
+        grid, n_values = _read_cube_header(file)
+        values = np.fromstring(file.read(), dtype=np.float64, sep=" ")  # fast parsing of the whitespace separated values
+
+    if values.size != grid.n_points * n_values:
+        raise ValueError(f"Expected {grid.n_points * n_values} values in {cube_file}, found {values.size}")
+    values = values.reshape(grid.n_points, n_values)
+
+    def read_chunks(chunk_size: int, column: int) -> Iterator[np.ndarray]:
+        for start in range(0, grid.n_points, chunk_size):
+            yield values[start : start + chunk_size, column]
+
+    names = [cube_file.stem] if n_values == 1 else [f"{cube_file.stem}_{i}" for i in range(1, n_values + 1)]
+    return [OrbitalField(name, grid, lambda chunk_size, column=column: read_chunks(chunk_size, column)) for column, name in enumerate(names)]
+
+
+# --------------------Interface Function(s) (regions)-------------------- #
+
+
+def sphere(center: np.ndarray | list[float], radius: float) -> Region:
+    """Returns the region within `radius` of `center`."""
+    center = np.asarray(center, dtype=np.float64)
+    return lambda coordinates: np.einsum("ij,ij->i", coordinates - center, coordinates - center) <= radius**2
+
+
+def box(lower: np.ndarray | list[float], upper: np.ndarray | list[float]) -> Region:
+    """Returns the region between the `lower` and `upper` corners of an axis-aligned box."""
+    lower, upper = np.asarray(lower, dtype=np.float64), np.asarray(upper, dtype=np.float64)
+    return lambda coordinates: np.all((coordinates >= lower) & (coordinates <= upper), axis=1)
+
+
+# --------------------Interface Function(s) (integrals)-------------------- #
+
+
+def get_norm(field: OrbitalField, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Returns the integral of the density ψ² over the grid, which is close to 1 for a normalized orbital on a large enough grid."""
+    total = sum(float(np.dot(values, values)) for _, values in field.iter_chunks(chunk_size))
+    return total * field.grid.voxel_volume
+
+
+def get_spatial_extent(field: OrbitalField, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Returns the spatial extent sqrt(<r²> - <r>²) of the density ψ², i.e. the root-mean-square distance to the centre of the density."""
+    total_density, first_moment, second_moment = 0.0, np.zeros(3), 0.0
+    for start, values in field.iter_chunks(chunk_size):
+        density = values * values
+        coordinates = field.grid.get_coordinates(start, start + values.size)
+        total_density += float(density.sum())
+        first_moment += density @ coordinates
+        second_moment += float(density @ np.einsum("ij,ij->i", coordinates, coordinates))
+
+    if total_density == 0.0:
+        return 0.0
+    center = first_moment / total_density
+    return float(np.sqrt(max(second_moment / total_density - center @ center, 0.0)))
+
+
+def get_overlap_integral(field1: OrbitalField, field2: OrbitalField, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Returns the overlap integral ∫ψ1ψ2 of two orbitals on the same grid."""
+    total = sum(float(np.dot(values1, values2)) for _, values1, values2 in _iter_chunk_pairs(field1, field2, chunk_size))
+    return total * field1.grid.voxel_volume
+
+
+def get_overlap_density(field1: OrbitalField, field2: OrbitalField, out_file: str | pl.Path | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> OrbitalField:
+    """
+    Returns the overlap density ψ1ψ2 of two orbitals on the same grid as a new orbital field.
+    The values are written chunk by chunk into one array, which is a memory-mapped .npy file if `out_file` is given (such that it does not need to fit in memory).
+    """
+    n_points = field1.grid.n_points
+    if out_file is not None:
+        values = np.lib.format.open_memmap(out_file, mode="w+", dtype=np.float64, shape=(n_points,))
+    else:
+        values = np.empty(n_points, dtype=np.float64)
+
+    for start, values1, values2 in _iter_chunk_pairs(field1, field2, chunk_size):
+        np.multiply(values1, values2, out=values[start : start + values1.size])
+
+    def read_chunks(chunk_size: int) -> Iterator[np.ndarray]:
+        for start in range(0, n_points, chunk_size):
+            yield values[start : start + chunk_size]
+
+    return OrbitalField(f"{field1.name}*{field2.name}", field1.grid, read_chunks)
+
+
+def get_density_fraction(field: OrbitalField, region: Region, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Returns the fraction of the density ψ² of the orbital that is within the region (e.g. `sphere(center, radius)`)."""
+    total_density, region_density = 0.0, 0.0
+    for start, values in field.iter_chunks(chunk_size):
+        density = values * values
+        total_density += float(density.sum())
+        region_density += float(density[region(field.grid.get_coordinates(start, start + values.size))].sum())
+    return region_density / total_density if total_density > 0.0 else 0.0
@@ -0,0 +1,184 @@
+"""
+Module containing a content-addressed cache for rendered orbital images (amsview and amsreport).
+
+The key of an image is a hash of:
+    - the identity of the input file (absolute path, size and modification time), such that a changed or different rkf/t41 file never reuses old images
+    - the orbital label (e.g. SFO_A_6 or HOMO-1)
+    - the full settings dict (e.g. :AMSViewPlotSettings:)
+    - the tool and its version (the name, path and modification time of the executable)
+
+The images are stored as "[directory]/[first two characters of the key]/[key][suffix]". Images are written to a temporary file in the cache directory and then moved,
+such that renderers that run in parallel never see a partially written image. The modification time of an image is updated on every hit, and the least recently used
+images are removed when the total size exceeds `max_bytes`.
+
+The total size is tracked approximately in "[directory]/size.json", which is increased on every stored image. Only when it exceeds `max_bytes`, the directory is scanned,
+the least recently used images are removed until the size is below `EVICTION_TARGET * max_bytes` and the counter is reset to the actual size. Storing an image therefore
+does not cost a scan of the whole cache.
+
+The default cache is configured with `orb_config.image_cache` (enabled, directory and max_bytes). The renderers take `image_cache="default"` for the default cache and
+`image_cache=None` for no cache at all.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib as pl
+import shutil
+import uuid
+from typing import Any, Literal
+
+import attrs
+
+from orb_analysis import orb_config
+
+SIZE_FILE = "size.json"
+DEFAULT_IMAGE_CACHE = "default"  # the `image_cache` argument of the renderers that stands for the cache that is configured in `orb_config.image_cache`
+EVICTION_TARGET = 0.9  # fraction of `max_bytes` that is left after an eviction, such that the directory is not scanned again on the next store
+
+# --------------------Helper Functions-------------------- #
+
+
+def get_input_file_identity(input_file: str | pl.Path) -> dict[str, Any] | None:
+    """Returns the absolute path, size and modification time (in ns) of the input file, or None if the file does not exist (then the images can not be cached)."""
+    try:
+        stat = os.stat(input_file)
+    except OSError:
+        return None
+    return {"path": os.path.abspath(input_file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_tool_version(executable: str) -> str:
+    """
+    Returns a string that identifies the installation of the tool (e.g. amsview) without running it: the resolved path and modification time of the executable.
+    Starting amsview to ask for its version would cost as much as rendering an image.
+    """
+    path = shutil.which(executable)
+    if path is None:
+        return executable
+    return f"{os.path.realpath(path)}:{os.stat(path).st_mtime_ns}"
+
+
+def _copy_atomically(source: pl.Path, destination: pl.Path) -> None:
+    """Copies the file to a temporary file next to the destination and moves it in place, such that readers see either the old or the new file."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copyfile(source, temp_file)
+        os.replace(temp_file, destination)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+def _write_text_atomically(text: str, destination: pl.Path) -> None:
+    temp_file = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        temp_file.write_text(text)
+        os.replace(temp_file, destination)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define
+class ImageCache:
+    """Cache of rendered images with a size cap and least recently used eviction (see the module docstring)."""
+
+    directory: pl.Path = attrs.field(converter=lambda directory: pl.Path(directory).expanduser())
+    max_bytes: int = 2 * 1024**3
+
+    def get_key(self, tool: str, input_file: str | pl.Path, label: str, settings: dict[str, Any]) -> str | None:
+        """Returns the key of the image, or None when the input file does not exist."""
+        input_identity = get_input_file_identity(input_file)
+        if input_identity is None:
+            return None
+        content = {"tool": tool, "version": get_tool_version(tool), "input": input_identity, "label": label, "settings": settings}
+        return hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode(), digest_size=20).hexdigest()
+
+    def _get_path(self, key: str, suffix: str) -> pl.Path:
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def fetch(self, key: str | None, destination: str | pl.Path) -> bool:
+        """Copies the cached image to the destination and returns True, or returns False when the image is not in the cache."""
+        if key is None:
+            return False
+        destination = pl.Path(destination)
+        cached_file = self._get_path(key, destination.suffix)
+        try:
+            _copy_atomically(cached_file, destination)
+            os.utime(cached_file)  # marks the image as recently used
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _read_size(self) -> int | None:
+        """Returns the approximate total size of the images, or None when it has not been recorded yet."""
+        try:
+            return int(json.loads((self.directory / SIZE_FILE).read_text())["bytes"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_size(self, size: int) -> None:
+        try:
+            _write_text_atomically(json.dumps({"bytes": size}), self.directory / SIZE_FILE)
+        except OSError:
+            pass  # The size is recorded again on the next eviction
+
+    def store(self, key: str | None, image_file: str | pl.Path) -> None:
+        """Stores the rendered image in the cache and removes the least recently used images when the cache is too large. Missing images are ignored."""
+        image_file = pl.Path(image_file)
+        if key is None or not image_file.is_file():
+            return
+        try:
+            _copy_atomically(image_file, self._get_path(key, image_file.suffix))
+        except OSError:
+            return  # The cache is only an optimization, e.g. the cache directory may be read-only
+
+        size = self._read_size()
+        if size is None:
+            self.evict()  # records the actual size
+            return
+        size += image_file.stat().st_size
+        if size > self.max_bytes:
+            self.evict()
+        else:
+            self._write_size(size)
+
+    def evict(self) -> None:
+        """Removes the least recently used images until the total size is at most `EVICTION_TARGET * max_bytes` (if it exceeds `max_bytes`) and records the total size."""
+        images = []
+        for image in self.directory.glob("*/*"):
+            if image.name.startswith("."):
+                continue  # temporary files of writers
+            try:
+                stat = image.stat()
+            except FileNotFoundError:
+                continue  # removed by another process
+            images.append((stat.st_mtime_ns, stat.st_size, image))
+
+        total_size = sum(size for _, size, _ in images)
+        if total_size > self.max_bytes:
+            for _, size, image in sorted(images, key=lambda entry: entry[0]):
+                if total_size <= EVICTION_TARGET * self.max_bytes:
+                    break
+                image.unlink(missing_ok=True)
+                total_size -= size
+        self._write_size(total_size)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def get_default_image_cache() -> ImageCache | None:
+    """Returns the image cache that is configured in `orb_config.image_cache`, or None when the cache is disabled."""
+    if not orb_config.image_cache.enabled:
+        return None
+    return ImageCache(directory=orb_config.image_cache.directory, max_bytes=orb_config.image_cache.max_bytes)
+
+
+def resolve_image_cache(image_cache: ImageCache | None | Literal["default"]) -> ImageCache | None:
+    """Returns the default image cache (see `get_default_image_cache`) for `DEFAULT_IMAGE_CACHE` and the given cache (or None, no cache) otherwise."""
+    return get_default_image_cache() if image_cache == DEFAULT_IMAGE_CACHE else image_cache
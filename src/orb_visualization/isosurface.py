@@ -0,0 +1,309 @@
+"""
+Module containing a headless renderer of orbital isosurfaces, which is an alternative to amsview that does not need the AMS GUI.
+
+`render_orbital_isosurface` has the same interface as `plot_orbital_with_amsview` and uses the same :AMSViewPlotSettings: (val, viewplane, zoom, bgcolor, scmgeometry, antialias, transparent, grid):
+    1. the orbital is read from a t41 or cube file (see `orb_visualization.grid`)
+    2. the positive and negative isosurfaces (±val) are extracted with marching tetrahedra, vectorized with numpy over slabs of the grid.
+       With `grid="Coarse"` (preview mode), the volume is decimated by a factor of two along each axis first.
+    3. the meshes and the atoms (read from the "Geometry" section of the rkf/t41 file) are projected along the viewplane and rasterized with Pillow,
+       with the triangles and atoms drawn from back to front and lit by a light at the camera
+
+The meshes are cached per (input file, orbital, isovalue, decimation) and the images per (input file, orbital, settings) in the image cache (see `orb_visualization.image_cache`).
+As the renderer is pure Python, many images can be rendered in parallel processes with `render_orbitals_headless`.
+"""
+
+from __future__ import annotations
+
+import pathlib as pl
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal, Sequence
+
+import numpy as np
+from attrs import asdict
+from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile
+from PIL import Image, ImageColor, ImageDraw
+
+from orb_visualization.grid import Grid, OrbitalField, read_cube_fields, read_t41_fields
+from orb_visualization.image_cache import DEFAULT_IMAGE_CACHE, ImageCache, resolve_image_cache
+from orb_visualization.plotter import AMSViewPlotSettings
+from orb_visualization.render_queue import RenderJob
+
+POSITIVE_COLOR = (31, 119, 180)
+NEGATIVE_COLOR = (214, 96, 39)
+SURFACE_ALPHA = 200  # opacity of the isosurfaces when `transparent` is set
+AMBIENT_LIGHT = 0.35
+SLAB_SIZE = 16  # number of cube layers that are processed at once by the marching tetrahedra
+SUPERSAMPLING = 2  # the image is drawn at this scale and downsampled when `antialias` is set
+
+# Corners of a grid cube and the six tetrahedra (sharing the diagonal from corner 0 to 6) that fill the cube
+CUBE_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]])
+TETRAHEDRA = np.array([[0, 5, 1, 6], [0, 1, 2, 6], [0, 2, 3, 6], [0, 3, 7, 6], [0, 7, 4, 6], [0, 4, 5, 6]])
+
+# Radius (in bohr) and colour of the atoms that are drawn, other elements are drawn in grey
+ATOM_STYLES: dict[str, tuple[float, tuple[int, int, int]]] = {
+    "H": (0.6, (240, 240, 240)),
+    "B": (0.9, (255, 181, 181)),
+    "C": (0.9, (80, 80, 80)),
+    "N": (0.9, (48, 80, 248)),
+    "O": (0.9, (255, 13, 13)),
+    "F": (0.9, (144, 224, 80)),
+    "Al": (1.1, (191, 166, 166)),
+    "Si": (1.1, (240, 200, 160)),
+    "P": (1.1, (255, 128, 0)),
+    "S": (1.1, (255, 255, 48)),
+    "Cl": (1.1, (31, 240, 31)),
+    "Ga": (1.2, (194, 143, 143)),
+    "Ge": (1.2, (102, 143, 143)),
+    "As": (1.2, (189, 128, 227)),
+    "Se": (1.2, (255, 161, 0)),
+    "Br": (1.2, (166, 41, 41)),
+    "I": (1.3, (148, 0, 148)),
+}
+DEFAULT_ATOM_STYLE = (1.0, (160, 160, 160))
+
+
+# --------------------Marching Tetrahedra-------------------- #
+
+
+def _get_tetrahedron_triangles(case: int) -> list[list[tuple[int, int]]]:
+    """Returns the triangles (as three edges between the vertices of a tetrahedron) of the isosurface in a tetrahedron of which bit k of `case` says whether vertex k is inside."""
+    inside = [vertex for vertex in range(4) if case >> vertex & 1]
+    outside = [vertex for vertex in range(4) if not case >> vertex & 1]
+    if len(inside) in [0, 4]:
+        return []
+    if len(inside) in [1, 3]:
+        lone, others = (inside[0], outside) if len(inside) == 1 else (outside[0], inside)
+        return [[(lone, other) for other in others]]
+    (a, b), (c, d) = inside, outside
+    return [[(a, c), (a, d), (b, d)], [(a, c), (b, d), (b, c)]]
+
+
+TRIANGLE_TABLE = {case: np.array(_get_tetrahedron_triangles(case)) for case in range(1, 15)}
+
+
+def extract_isosurface(values: np.ndarray, level: float, grid: Grid) -> np.ndarray:
+    """
+    Returns the isosurface of the values at the level as (n_triangles, 3, 3) coordinates of the triangle vertices.
+    The values (with the shape of the grid) are processed in slabs of `SLAB_SIZE` cube layers, such that the temporaries are small compared to the grid.
+    """
+    nx, ny, nz = values.shape
+    triangles: list[np.ndarray] = []
+
+    for slab_start in range(0, nx - 1, SLAB_SIZE):
+        slab_stop = min(slab_start + SLAB_SIZE, nx - 1)
+        slab_shape = (slab_stop - slab_start, ny - 1, nz - 1)
+        # The values at the eight corners of all cubes in the slab (views of the values)
+        corner_values = [values[slab_start + dx : slab_stop + dx, dy : ny - 1 + dy, dz : nz - 1 + dz] for dx, dy, dz in CUBE_CORNERS]
+
+        for tetrahedron in TETRAHEDRA:
+            vertex_values = np.stack([corner_values[corner].ravel() for corner in tetrahedron])
+            cases = ((vertex_values > level) * np.array([[1], [2], [4], [8]])).sum(axis=0)
+
+            for case in np.unique(cases):
+                if case in [0, 15]:
+                    continue
+                cubes = np.flatnonzero(cases == case)
+                cube_indices = np.column_stack(np.unravel_index(cubes, slab_shape)) + [slab_start, 0, 0]
+                vertex_positions = cube_indices[:, None, :] + CUBE_CORNERS[tetrahedron][None, :, :]  # (n_cubes, 4, 3) in grid indices
+
+                for triangle in TRIANGLE_TABLE[case]:
+                    start, end = triangle[:, 0], triangle[:, 1]
+                    start_values, end_values = vertex_values[start][:, cubes], vertex_values[end][:, cubes]
+                    fraction = ((level - start_values) / (end_values - start_values)).T[:, :, None]
+                    points = vertex_positions[:, start] + fraction * (vertex_positions[:, end] - vertex_positions[:, start])
+                    triangles.append(grid.origin + points @ grid.vectors)
+
+    return np.concatenate(triangles) if triangles else np.empty((0, 3, 3))
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _read_orbital_field(input_file: str | pl.Path, label: str | None) -> OrbitalField:
+    """Returns the orbital with the label ("[section]_[variable]" for t41 files, the field name for cube files, or None for the first field)."""
+    if pl.Path(input_file).suffix.lower() in [".cube", ".cub"]:
+        fields = {field.name: field for field in read_cube_fields(input_file)}
+    else:
+        fields = read_t41_fields(input_file)
+
+    if label is None and fields:
+        return next(iter(fields.values()))
+    if label not in fields:
+        raise KeyError(f"Orbital {label} not present in {input_file}. Available orbitals: {', '.join(fields)}")
+    return fields[label]
+
+
+def read_geometry(kf_path: str | pl.Path) -> tuple[list[str], np.ndarray]:
+    """Returns the element symbols and the (n_atoms, 3) coordinates (in bohr) of the "Geometry" section of an rkf or t41 file, or no atoms if the file has no "Geometry" section (e.g. cube files)."""
+    try:
+        kf_file = MemoryMappedKFFile(kf_path)
+        n_atoms = int(kf_file.read("Geometry", "nr of atoms"))
+        coordinates = np.asarray(kf_file.read("Geometry", "xyz", return_as_list=True), dtype=np.float64).reshape(n_atoms, 3)
+        atom_types = str(kf_file.read("Geometry", "atomtype")).split()
+        type_indices = np.asarray(kf_file.read("Geometry", "fragment and atomtype index", return_as_list=True)).ravel()[n_atoms:]
+    except (KeyError, OSError, ValueError):
+        return [], np.empty((0, 3))
+    return [atom_types[index - 1].split(".")[0] for index in type_indices], coordinates
+
+
+def _get_view_axes(viewplane: str) -> np.ndarray:
+    """Returns the (right, up, towards the viewer) unit vectors of the camera that looks along the viewplane normal."""
+    normal = np.array([float(value) for value in viewplane.strip("{} ").split()])
+    normal /= np.linalg.norm(normal)
+    up = np.array([0.0, 0.0, 1.0]) if abs(normal[2]) < 0.9 else np.array([0.0, 1.0, 0.0])  # e.g. x to the right and y up for the viewplane "0 0 1"
+    right = np.cross(up, normal)
+    right /= np.linalg.norm(right)
+    return np.array([right, np.cross(normal, right), normal])
+
+
+def _shade(color: tuple[int, int, int], intensity: np.ndarray) -> np.ndarray:
+    return (np.array(color)[None, :] * intensity[:, None]).round().astype(int)
+
+
+def rasterize(
+    surfaces: Sequence[tuple[np.ndarray, tuple[int, int, int]]],
+    symbols: Sequence[str],
+    coordinates: np.ndarray,
+    plot_settings: AMSViewPlotSettings,
+) -> Image.Image:
+    """Returns the image of the surfaces ((n_triangles, 3, 3) triangles and their colour) and atoms, projected along the viewplane of the plot settings."""
+    width, height = (int(size) for size in plot_settings.scmgeometry.lower().split("x"))
+    scale = SUPERSAMPLING if plot_settings.antialias else 1
+    axes = _get_view_axes(plot_settings.viewplane)
+
+    # The scene is centred on the atoms (or the surfaces) and zoom=2 fits the scene in the image
+    points = np.concatenate([coordinates] + [triangles.reshape(-1, 3) for triangles, _ in surfaces]) if len(coordinates) or surfaces else np.zeros((1, 3))
+    center = coordinates.mean(axis=0) if len(coordinates) else points.mean(axis=0)
+    radius = max(float(np.linalg.norm(points - center, axis=1).max()), 1.0)
+    pixels_per_bohr = plot_settings.zoom * min(width, height) * scale / (4 * radius)
+
+    def project(positions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        view = (positions - center) @ axes.T
+        screen = np.column_stack([width * scale / 2 + view[..., 0].ravel() * pixels_per_bohr, height * scale / 2 - view[..., 1].ravel() * pixels_per_bohr])
+        return screen.reshape(*positions.shape[:-1], 2), view[..., 2]
+
+    # Primitives are (depth, kind, screen coordinates, colour), drawn from back (low depth) to front
+    primitives: list[tuple[float, int, np.ndarray, tuple[int, ...]]] = []
+    alpha = SURFACE_ALPHA if plot_settings.transparent else 255
+    for triangles, color in surfaces:
+        if len(triangles) == 0:
+            continue
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        colors = _shade(color, AMBIENT_LIGHT + (1 - AMBIENT_LIGHT) * np.abs(normals @ axes[2]))  # two-sided light at the camera
+        screen, depth = project(triangles)
+        primitives += [(float(d), 0, s, (*c, alpha)) for d, s, c in zip(depth.mean(axis=1), screen, colors)]
+
+    if len(coordinates):
+        screen, depth = project(coordinates)
+        for symbol, position, atom_depth in zip(symbols, screen, depth):
+            atom_radius, color = ATOM_STYLES.get(symbol, DEFAULT_ATOM_STYLE)
+            primitives.append((float(atom_depth), 1, np.array([position, [atom_radius * 0.5 * pixels_per_bohr, 0]]), (*color, 255)))
+
+    image = Image.new("RGB", (width * scale, height * scale), ImageColor.getrgb(plot_settings.bgcolor))
+    draw = ImageDraw.Draw(image, "RGBA")
+    for _, kind, shape, color in sorted(primitives, key=lambda primitive: primitive[0]):
+        if kind == 0:
+            draw.polygon([tuple(point) for point in shape], fill=color)
+        else:
+            (x, y), (r, _) = shape
+            draw.ellipse([x - r, y - r, x + r, y + r], fill=color, outline=(0, 0, 0, 255))
+
+    if scale > 1:
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    return image
+
+
+def get_isosurfaces(
+    input_file: str | pl.Path,
+    label: str | None,
+    isovalue: float,
+    decimation: int = 1,
+    image_cache: ImageCache | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the positive and negative isosurface (±isovalue) of the orbital, from the cache of meshes when possible."""
+    key = image_cache.get_key("isosurface-mesh", input_file, str(label), {"val": isovalue, "decimation": decimation}) if image_cache is not None else None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mesh_file = pl.Path(temp_dir) / "mesh.npz"
+        if image_cache is not None and image_cache.fetch(key, mesh_file):
+            with np.load(mesh_file) as meshes:
+                return meshes["positive"], meshes["negative"]
+
+        field = _read_orbital_field(input_file, label)
+        values, grid = field.to_array(), field.grid
+        if decimation > 1:
+            values = values[::decimation, ::decimation, ::decimation]
+            grid = Grid(grid.origin, values.shape, grid.vectors * decimation, grid.order)
+
+        positive, negative = extract_isosurface(values, isovalue, grid), extract_isosurface(-values, isovalue, grid)
+        if image_cache is not None:
+            np.savez(mesh_file, positive=positive, negative=negative)
+            image_cache.store(key, mesh_file)
+    return positive, negative
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def render_orbital_isosurface(
+    input_file: str | pl.Path,
+    sfo_specifier: str | None = None,
+    plot_settings: AMSViewPlotSettings | None = None,
+    save_file: str | pl.Path | None = None,
+    geometry_file: str | pl.Path | None = None,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
+) -> Image.Image:
+    """
+    Renders the ±isosurfaces of an orbital without amsview and returns the image, which is also saved as png if `save_file` is given.
+
+    Args:
+        input_file: Path to the t41 file (or cube file) that contains the orbital
+        sfo_specifier: The orbital in the t41 file as "[section]_[variable]", e.g. SFO_A_A_11 or SCF_A_8 (see :DensfVariable:). Defaults to the first orbital in the file.
+        plot_settings: The amsview plot settings, of which val, viewplane, zoom, bgcolor, scmgeometry, antialias, transparent and grid ("Coarse" for the preview mode) are used
+        save_file: The path of the png image
+        geometry_file: The rkf file with the geometry. Defaults to the input file.
+        image_cache: The cache of rendered images and meshes. Defaults to the cache that is configured in `orb_config.image_cache` (see `orb_visualization.image_cache`), None renders without cache
+    """
+    plot_settings = plot_settings or AMSViewPlotSettings()
+    image_cache = resolve_image_cache(image_cache)
+    # The image is always saved as png, like amsview does (see `RenderJob.output_file`)
+    save_file = pl.Path(save_file).with_suffix(".png") if save_file is not None else None
+
+    image_key = None
+    if image_cache is not None and save_file is not None:
+        settings = {**asdict(plot_settings), "geometry_file": str(geometry_file)}
+        image_key = image_cache.get_key("isosurface", input_file, str(sfo_specifier), settings)
+        if image_cache.fetch(image_key, save_file):
+            with Image.open(save_file) as image:
+                return image.copy()
+
+    decimation = 2 if plot_settings.grid.lower() == "coarse" else 1
+    positive, negative = get_isosurfaces(input_file, sfo_specifier, plot_settings.val, decimation, image_cache)
+    symbols, coordinates = read_geometry(geometry_file or input_file)
+    image = rasterize([(positive, POSITIVE_COLOR), (negative, NEGATIVE_COLOR)], symbols, coordinates, plot_settings)
+
+    if save_file is not None:
+        save_file.parent.mkdir(parents=True, exist_ok=True)
+        image.save(save_file)
+        if image_cache is not None:
+            image_cache.store(image_key, save_file)
+    return image
+
+
+def _render_job(job: RenderJob, image_cache: ImageCache | None) -> pl.Path | None:
+    render_orbital_isosurface(job.input_file, job.label, job.settings, job.save_file, image_cache=image_cache)
+    return job.output_file
+
+
+def render_orbitals_headless(jobs: Sequence[RenderJob], max_workers: int | None = None, image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE) -> list[pl.Path | None]:
+    """Renders the jobs (see :RenderJob:) with the headless renderer in parallel processes and returns the paths of the images."""
+    if any(job.calculated_field is not None for job in jobs):
+        raise ValueError("Calculated fields are only supported by amsview")
+
+    image_cache = resolve_image_cache(image_cache)
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_render_job(job, image_cache) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_job, jobs, [image_cache] * len(jobs)))
@@ -0,0 +1,117 @@
+"""
+Module containing a fast compositor that tiles many orbital images into one (or more) PNG files without matplotlib.
+
+It has the same layout as `combine_orb_images_with_matplotlib`: the system name on top and the orbitals row by row in 4 columns,
+each with the amsview label, HOMO/LUMO label and energy above the image. Instead of creating a matplotlib axis per orbital, the cropped images
+(see `load_orbital_image`) are copied into one preallocated array and the labels are rasterized with Pillow, which keeps the time linear in the number of orbitals.
+Large sets of orbitals are split over several pages ("[name]_page[i].png").
+"""
+
+from __future__ import annotations
+
+import math
+import pathlib as pl
+from typing import Sequence
+
+import numpy as np
+from orb_analysis.orbital.orbital import Orbital
+from PIL import Image, ImageDraw, ImageFont
+
+from orb_visualization.plotter import CENTER_CROP, load_orbital_image
+
+BACKGROUND_COLOR = (255, 255, 255)
+TEXT_COLOR = (0, 0, 0)
+
+# --------------------Helper Functions-------------------- #
+
+
+def _get_orbital_title(orbital: Orbital) -> str:
+    return f"{orbital.amsview_label}\n{orbital.homo_lumo_label}\nEnergy (eV): {orbital.energy :.3f}"  # NOQA E203
+
+
+def _as_rgb(image: np.ndarray) -> np.ndarray:
+    """Returns the uint8 image as RGB, of which transparent pixels are blended with the background colour."""
+    if image.ndim == 2:
+        return np.repeat(image[:, :, None], 3, axis=2)
+    if image.shape[2] == 3:
+        return image
+    alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+    blended = image[:, :, :3] * alpha + np.array(BACKGROUND_COLOR, dtype=np.float32) * (1.0 - alpha)
+    return blended.round().astype(np.uint8)
+
+
+def _get_page_paths(out_path: pl.Path, n_pages: int) -> list[pl.Path]:
+    out_path = out_path.with_suffix(".png")
+    if n_pages == 1:
+        return [out_path]
+    return [out_path.with_name(f"{out_path.stem}_page{i}.png") for i in range(1, n_pages + 1)]
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def create_orbital_montage(
+    system_name: str,
+    orbitals: Sequence[Orbital],
+    image_paths: Sequence[str | pl.Path],
+    out_path: str | pl.Path,
+    n_cols: int = 4,
+    tile_size: int = 400,
+    crop: tuple[float, float] | str | None = CENTER_CROP,
+    max_orbitals_per_page: int = 48,
+    font_size: int = 20,
+) -> list[pl.Path]:
+    """
+    Tiles the orbital images with their labels into PNG files and returns the paths of the pages.
+
+    Args:
+        system_name: The title on top of each page
+        orbitals: The orbitals (SFOs or MOs) of which the labels are shown
+        image_paths: The images of the orbitals, in the same order
+        out_path: The path of the montage. With more than `max_orbitals_per_page` orbitals, the pages are written to "[stem]_page[i].png"
+        n_cols: The number of columns. Defaults to 4.
+        tile_size: The width and maximum height (in pixels) of each image. Defaults to 400.
+        crop: The part of each image that is shown, see `load_orbital_image`. Defaults to the centre.
+        max_orbitals_per_page: The maximum number of orbitals per page. Defaults to 48.
+        font_size: The size of the label font in pixels. Defaults to 20.
+    """
+    if len(orbitals) != len(image_paths):
+        raise ValueError(f"The number of orbitals ({len(orbitals)}) and images ({len(image_paths)}) should be the same")
+
+    font = ImageFont.load_default(size=font_size)
+    line_height = int(font_size * 1.25)
+    title_height = 3 * line_height + line_height // 2  # three lines of labels and some space
+    header_height = 2 * line_height
+    cell_height = title_height + tile_size
+
+    n_pages = max(math.ceil(len(orbitals) / max_orbitals_per_page), 1)
+    page_paths = _get_page_paths(pl.Path(out_path), n_pages)
+
+    for page, page_path in enumerate(page_paths):
+        page_orbitals = orbitals[page * max_orbitals_per_page : (page + 1) * max_orbitals_per_page]
+        page_images = image_paths[page * max_orbitals_per_page : (page + 1) * max_orbitals_per_page]
+        n_rows = max(math.ceil(len(page_orbitals) / n_cols), 1)
+
+        canvas = np.empty((header_height + n_rows * cell_height, n_cols * tile_size, 3), dtype=np.uint8)
+        canvas[...] = BACKGROUND_COLOR
+
+        # The images are read (cropped and downsampled) one at a time and copied into the canvas, centred in their cell
+        for i, image_path in enumerate(page_images):
+            image = _as_rgb(load_orbital_image(image_path, crop, max_size=tile_size))
+            row, col = divmod(i, n_cols)
+            top = header_height + row * cell_height + title_height + (tile_size - image.shape[0]) // 2
+            left = col * tile_size + (tile_size - image.shape[1]) // 2
+            canvas[top : top + image.shape[0], left : left + image.shape[1]] = image
+
+        montage = Image.fromarray(canvas)
+        draw = ImageDraw.Draw(montage)
+        draw.text((montage.width // 2, line_height // 2), system_name, fill=TEXT_COLOR, font=font, anchor="ma")
+        for i, orbital in enumerate(page_orbitals):
+            row, col = divmod(i, n_cols)
+            x, y = col * tile_size + tile_size // 2, header_height + row * cell_height
+            draw.multiline_text((x, y), _get_orbital_title(orbital), fill=TEXT_COLOR, font=font, anchor="ma", align="center", spacing=line_height - font_size)
+
+        page_path.parent.mkdir(parents=True, exist_ok=True)
+        montage.save(page_path)
+
+    return page_paths
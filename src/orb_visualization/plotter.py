@@ -1,13 +1,20 @@
+import os
 import pathlib as pl
-import shutil
 import subprocess
-from typing import Sequence, TypeVar
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Sequence, TypeVar
 
-import matplotlib.image as mpimg
 import matplotlib.pyplot as plt
-from attrs import asdict, define
+import numpy as np
+from attrs import Factory, asdict, define
+from matplotlib.figure import Figure
+from PIL import Image, ImageChops
+from orb_analysis.log_messages import logger
 from orb_analysis.orbital.orbital import SFO, Orbital
 
+from orb_visualization.image_cache import DEFAULT_IMAGE_CACHE, ImageCache, resolve_image_cache
+
 
 @define
 class PlotSettings:
@@ -46,6 +53,68 @@ class AMSReportPlotSettings(PlotSettings):
 
 PlotSettingsType = TypeVar("PlotSettingsType", bound=PlotSettings)
 
+CENTER_CROP = (0.28, 0.72)  # Fractions of the width and height of amsview images that contain the molecule (with the default zoom)
+DEFAULT_MAX_IMAGE_SIZE = 800  # Maximum width or height (in pixels) of the images in the composites
+
+
+def build_amsview_command(
+    input_file: str | pl.Path,
+    sfo_specifier: str | None = None,
+    plot_settings: AMSViewPlotSettings | None = None,
+    save_file: str | pl.Path | None = None,
+    calculated_field_specified: str | None = None,
+) -> list[str]:
+    """Returns the amsview command as a list of arguments. See `plot_orbital_with_amsview` for the arguments."""
+    plot_settings = plot_settings or AMSViewPlotSettings()
+
+    command = ["amsview", str(input_file)]
+
+    # Either calculate a product of MOs with
+    if calculated_field_specified is not None:
+        command.append("-calculated")
+        command.append(f"'{str(calculated_field_specified)}'")
+    elif sfo_specifier is not None:
+        command.append("-var")
+        command.append(str(sfo_specifier))
+
+    if plot_settings.hide_view:
+        command.append("-batch")
+
+    if save_file is not None:
+        save_file = pl.Path(save_file).with_suffix(".png")
+        command.append("-save")
+        command.append(str(save_file))
+
+    dict_settings = asdict(plot_settings)
+
+    if plot_settings.camera > 0:
+        dict_settings.pop("viewplane")
+    elif plot_settings.camera < 0:
+        dict_settings.pop("camera")
+
+    for key, value in dict_settings.items():
+        if key.lower() in ["wireframe", "transparent", "antialias", "printrange", "ciso"]:
+            if value:
+                command.append(f"-{key}")
+            continue
+
+        command.append(f"-{key}")
+        command.append(str(value))
+
+    return command
+
+
+def get_amsview_image_key(
+    image_cache: ImageCache,
+    input_file: str | pl.Path,
+    sfo_specifier: str | None = None,
+    plot_settings: AMSViewPlotSettings | None = None,
+    calculated_field_specified: str | None = None,
+) -> str | None:
+    """Returns the key of the amsview image in the image cache, or None when the image can not be cached."""
+    label = f"calculated:{calculated_field_specified}" if calculated_field_specified is not None else str(sfo_specifier)
+    return image_cache.get_key("amsview", input_file, label, asdict(plot_settings or AMSViewPlotSettings()))
+
 
 def plot_orbital_with_amsview(
     input_file: str | pl.Path,
@@ -53,9 +122,12 @@ def plot_orbital_with_amsview(
     plot_settings: AMSViewPlotSettings | None = None,
     save_file: str | pl.Path | None = None,
     calculated_field_specified: str | None = None,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
 ) -> None:
     """
     Runs the amsview command on the rkf files. Can be used to plot orbitals and geometry.
+    For rendering many orbitals, use the :RenderQueue: of `orb_visualization.render_queue`, which runs the amsview commands concurrently.
+    When a save file is given, the image cache is consulted first and amsview only runs when the image of this input file, orbital and settings is not in the cache.
 
     Args:
         input_file: Path to the input file that contains volume data such as .t21, .t41, .rkf, .vtk and .runkf files
@@ -74,6 +146,7 @@ def plot_orbital_with_amsview(
             - camera: The camera load-outs from AMS (int)
             - hide_view: Whether to hide the amsview application (bool)
             - print_command: Whether to print the command (bool)
+        image_cache: The cache of rendered images. Defaults to the cache that is configured in `orb_config.image_cache` (see `orb_visualization.image_cache`), None runs without cache
 
     Check for all options by running amsview -h
 
@@ -82,44 +155,142 @@ def plot_orbital_with_amsview(
     Example command for overlap field: amsview result.t41 -calculated "SFO_7 * SFO_7" -save "my_pic.png" -bgcolor "#FFFFFF" -transparent -antialias -scmgeometry "2160x1440" -wireframe
     """
     plot_settings = plot_settings or AMSViewPlotSettings()
+    image_cache = resolve_image_cache(image_cache)
+    image_key = None
+    if image_cache is not None and save_file is not None:
+        save_file = pl.Path(save_file).with_suffix(".png")
+        image_key = get_amsview_image_key(image_cache, input_file, sfo_specifier, plot_settings, calculated_field_specified)
+        if image_cache.fetch(image_key, save_file):
+            return
 
-    command = ["amsview", str(input_file)]
-
-    # Either calculate a product of MOs with
-    if calculated_field_specified is not None:
-        command.append("-calculated")
-        command.append(f"'{str(calculated_field_specified)}'")
-    elif sfo_specifier is not None:
-        command.append("-var")
-        command.append(str(sfo_specifier))
+    command = build_amsview_command(input_file, sfo_specifier, plot_settings, save_file, calculated_field_specified)
 
-    if plot_settings.hide_view:
-        command.append("-batch")
+    if plot_settings.print_command:
+        print(" ".join(command))
+    process = subprocess.run(command)
 
-    if save_file is not None:
-        save_file = pl.Path(save_file).with_suffix(".png")
-        command.append("-save")
-        command.append(str(save_file))
+    if image_cache is not None and save_file is not None and process.returncode == 0:
+        image_cache.store(image_key, save_file)
 
-    dict_settings = asdict(plot_settings)
 
-    if plot_settings.camera > 0:
-        dict_settings.pop("viewplane")
-    elif plot_settings.camera < 0:
-        dict_settings.pop("camera")
+def build_amsreport_command(
+    input_file: str | pl.Path,
+    out_name: str | pl.Path,
+    sfo_specifiers: Sequence[str],
+    plot_settings: PlotSettings | None = None,
+) -> list[str]:
+    """Returns the amsreport command as a list of arguments. amsreport writes the images of the specifiers to "[out_name].jpgs/[i].jpg" (i = 0, 1, ...)."""
+    plot_settings = plot_settings or AMSViewPlotSettings()
+    command = ["amsreport", "-i", str(input_file), "-o", str(out_name), *sfo_specifiers]
 
+    dict_settings = asdict(plot_settings)
     for key, value in dict_settings.items():
-        if key.lower() in ["wireframe", "transparent", "antialias", "printrange", "ciso"]:
+        if key == "antialias":
             if value:
-                command.append(f"-{key}")
+                command.append("-v")
+                command.append("-antialias")
             continue
 
-        command.append(f"-{key}")
-        command.append(str(value))
+        command.append("-v")
+        command.append(f"-{key} {value}")
 
-    if plot_settings.print_command:
-        print(" ".join(command))
-    subprocess.run(command)
+    return command
+
+
+@define
+class AMSReportSummary:
+    """Summary of a `plot_orbitals_with_amsreport` call: the produced images per specifier, the specifiers taken from the image cache and the errors of the failed specifiers."""
+
+    produced: dict[str, pl.Path] = Factory(dict)
+    cached: list[str] = Factory(list)
+    failed: dict[str, str] = Factory(dict)  # the stderr of amsreport, or a description of the missing image
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def _run_amsreport(
+    input_file: str | pl.Path,
+    out_dir: pl.Path,
+    sfo_specifiers: Sequence[str],
+    plot_settings: PlotSettings,
+) -> tuple[dict[str, pl.Path], dict[str, str]]:
+    """
+    Runs amsreport once for the specifiers in a temporary directory that is unique for this call, such that concurrent calls never write to the same files.
+    The images are moved to "[out_dir]/[specifier].jpg" with `os.replace`. Returns the produced images and the errors per specifier.
+    """
+    produced: dict[str, pl.Path] = {}
+    failed: dict[str, str] = {}
+
+    with tempfile.TemporaryDirectory(prefix=".amsreport-", dir=out_dir) as tmp_dir:
+        out_name = pl.Path(tmp_dir) / "report"
+        command = build_amsreport_command(input_file, out_name, sfo_specifiers, plot_settings)
+        if plot_settings.print_command:
+            print(" ".join(command))
+
+        process = subprocess.run(command, capture_output=True, text=True)
+        for i, sfo_specifier in enumerate(sfo_specifiers):
+            image = pl.Path(f"{out_name}.jpgs") / f"{i}.jpg"
+            if image.is_file():
+                produced[sfo_specifier] = out_dir / f"{sfo_specifier}.jpg"
+                os.replace(image, produced[sfo_specifier])
+            else:
+                failed[sfo_specifier] = process.stderr or f"amsreport exited with code {process.returncode} without writing {image.name}"
+
+    return produced, failed
+
+
+def plot_orbitals_with_amsreport(
+    input_file: str | pl.Path,
+    out_dir: str | pl.Path,
+    sfo_specifiers: Sequence[str],
+    plot_settings: PlotSettings | None = None,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
+    max_concurrency: int = 4,
+    single_invocation: bool = False,
+) -> AMSReportSummary:
+    """
+    Runs amsreport for many orbital specifiers (e.g. ["HOMO", "HOMO-1", "LUMO"]) and writes the images to "[out_dir]/[specifier].jpg".
+    See `plot_orbital_with_amsreport` for the plot settings.
+
+    Args:
+        max_concurrency: The number of amsreport processes that run at the same time. Defaults to 4.
+        single_invocation: Whether all specifiers are passed to one amsreport process, which then writes one numbered image per specifier.
+            Only use this when the installed amsreport supports multiple reports per call. Specifiers of which no image is written are reported as failed. Defaults to False.
+        image_cache: The cache of rendered images that is consulted before amsreport runs. Defaults to the cache that is configured in `orb_config.image_cache`, None runs without cache
+
+    Returns:
+        AMSReportSummary: The produced, cached and failed specifiers.
+    """
+    plot_settings = plot_settings or AMSViewPlotSettings()
+    out_dir = pl.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = AMSReportSummary()
+
+    image_cache = resolve_image_cache(image_cache)
+    image_keys = {sfo_specifier: image_cache.get_key("amsreport", input_file, sfo_specifier, asdict(plot_settings)) if image_cache is not None else None for sfo_specifier in sfo_specifiers}
+    remaining_specifiers = []
+    for sfo_specifier in dict.fromkeys(sfo_specifiers):
+        out_file = out_dir / f"{sfo_specifier}.jpg"
+        if image_cache is not None and image_cache.fetch(image_keys[sfo_specifier], out_file):
+            summary.produced[sfo_specifier] = out_file
+            summary.cached.append(sfo_specifier)
+        else:
+            remaining_specifiers.append(sfo_specifier)
+
+    batches = [remaining_specifiers] if single_invocation else [[sfo_specifier] for sfo_specifier in remaining_specifiers]
+    with ThreadPoolExecutor(max_workers=max(min(max_concurrency, len(batches)), 1)) as executor:
+        for produced, failed in executor.map(lambda batch: _run_amsreport(input_file, out_dir, batch, plot_settings), [batch for batch in batches if batch]):
+            summary.produced.update(produced)
+            summary.failed.update(failed)
+
+    if image_cache is not None:
+        for sfo_specifier in remaining_specifiers:
+            if sfo_specifier in summary.produced:
+                image_cache.store(image_keys[sfo_specifier], summary.produced[sfo_specifier])
+
+    return summary
 
 
 def plot_orbital_with_amsreport(
@@ -127,9 +298,10 @@ def plot_orbital_with_amsreport(
     out_dir: str | pl.Path,
     sfo_specifier: str,
     plot_settings: PlotSettings | None = None,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
 ) -> None:
     """
-    Runs the amsreport command on the rkf files
+    Runs the amsreport command on the rkf files. For many orbitals, use `plot_orbitals_with_amsreport`, which runs the amsreport commands in parallel.
     Look at https://www.scm.com/doc/Scripting/Commandline_Tools/AMSreport.html for options and more informations
 
     Args:
@@ -144,33 +316,50 @@ def plot_orbital_with_amsreport(
             - grid: The grid size (Coarse, Medium, Fine)
             - hide_view: Whether to hide the amsview application (bool)
             - print_command: Whether to print the command (bool)
+        image_cache: The cache of rendered images that is consulted before amsreport runs. Defaults to the cache that is configured in `orb_config.image_cache`, None runs without cache
     """
-    plot_settings = plot_settings or AMSViewPlotSettings()
-    out_dir = pl.Path(out_dir)
-    tmp_dir = out_dir / sfo_specifier
+    summary = plot_orbitals_with_amsreport(input_file, out_dir, [sfo_specifier], plot_settings, image_cache=image_cache)
+    for sfo_specifier, error in summary.failed.items():
+        logger.warning(f"amsreport did not produce an image for {sfo_specifier}: {error}")
 
-    command = ["amsreport", "-i", str(input_file), "-o", str(tmp_dir), sfo_specifier]
 
-    dict_settings = asdict(plot_settings)
-    for key, value in dict_settings.items():
-        if key == "antialias":
-            if value:
-                command.append("-v")
-                command.append("-antialias")
-            continue
+def _get_content_box(image: Image.Image) -> tuple[int, int, int, int] | None:
+    """Returns the bounding box of the pixels that differ from the background: the transparent pixels, or else the colour of the top-left pixel."""
+    if "A" in image.getbands() and image.getchannel("A").getextrema()[0] < 255:
+        return image.getchannel("A").getbbox()
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    return ImageChops.difference(image, background).getbbox()
 
-        command.append("-v")
-        command.append(f"-{key} {value}")
 
-    if plot_settings.print_command:
-        print(" ".join(command))
+def load_orbital_image(
+    image_path: str | pl.Path,
+    crop: tuple[float, float] | str | None = CENTER_CROP,
+    max_size: int | None = DEFAULT_MAX_IMAGE_SIZE,
+) -> np.ndarray:
+    """
+    Reads an image and returns the cropped (and downsampled) part as an uint8 array, such that the full-resolution image is only held while it is decoded.
+
+    Args:
+        image_path: Path to the image (e.g. a .png of amsview or a .jpg of amsreport)
+        crop: The part of the image that is kept: (start, end) fractions of the width and height (e.g. (0.28, 0.72) keeps the centre),
+            "auto" for the box around all non-background pixels, or None for the full image. Defaults to CENTER_CROP.
+        max_size: The maximum width or height (in pixels) of the returned image. Larger images are downsampled while keeping the aspect ratio. None keeps the resolution.
+    """
+    with Image.open(image_path) as image:
+        if image.mode not in ["RGB", "RGBA"]:
+            image = image.convert("RGBA")  # e.g. palette images, of which the array would contain the palette indices
 
-    subprocess.run(command)
+        box = None
+        if crop == "auto":
+            box = _get_content_box(image)
+        elif crop is not None:
+            start, end = crop
+            box = (int(image.width * start), int(image.height * start), int(np.ceil(image.width * end)), int(np.ceil(image.height * end)))
 
-    # Copy all the files from the tmp directory to the out_dir
-    subprocess.run(["cp", f"{str(tmp_dir)}.jpgs/0.jpg", str(out_dir / f"{sfo_specifier}.jpg")])
-    shutil.rmtree(f"{tmp_dir}.jpgs")
-    (out_dir / sfo_specifier).unlink()  # remove a file that is created by amsreport which is not used
+        image = image.crop(box) if box is not None else image
+        if max_size is not None and max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        return np.asarray(image)
 
 
 def combine_orb_images_with_matplotlib(
@@ -178,8 +367,13 @@ def combine_orb_images_with_matplotlib(
     sfos: Sequence[Orbital],
     sfo_image_paths: Sequence[str | pl.Path],
     out_path: str | pl.Path,
+    crop: tuple[float, float] | str | None = CENTER_CROP,
+    max_size: int | None = DEFAULT_MAX_IMAGE_SIZE,
 ) -> None:
-    """Combines multiple orbital images into one image using matplotlib. The images are plotted in an array of subplots."""
+    """
+    Combines multiple orbital images into one image using matplotlib. The images are plotted in an array of subplots.
+    The images are read one at a time, cropped and downsampled while reading (see `load_orbital_image` for `crop` and `max_size`).
+    """
     n_sfos = len(sfos)
     n_cols = 4
     n_rows = n_sfos // n_cols + 1
@@ -189,19 +383,12 @@ def combine_orb_images_with_matplotlib(
     # Flatten the axes
     ax = ax.flatten()
 
-    sfo_images = [mpimg.imread(sfo_image_path) for sfo_image_path in sfo_image_paths]
-
     for i in range(n_rows * n_cols):
         if i < n_sfos:
             sfo = sfos[i]
-            img = sfo_images[i]
-            ax[i].imshow(img)
+            ax[i].imshow(load_orbital_image(sfo_image_paths[i], crop, max_size))
             ax[i].set_title(f"{sfo.amsview_label}\n{sfo.homo_lumo_label}\nEnergy (eV): {sfo.energy :.3f}", fontsize=12)  # NOQA E203
             ax[i].axis("off")  # Turn off the axis
-
-            # Zoom in on the image
-            ax[i].set_xlim(img.shape[1] * 0.28, img.shape[1] * 0.72)
-            ax[i].set_ylim(img.shape[0] * 0.72, img.shape[0] * 0.28)
         else:
             # Remove the extra subplot
             fig.delaxes(ax[i])
@@ -222,6 +409,8 @@ def combine_sfo_images_with_matplotlib(
     overlap: float | None = None,
     energy_gap: float | None = None,
     stabilization: float | None = None,
+    crop: tuple[float, float] | str | None = CENTER_CROP,
+    max_size: int | None = DEFAULT_MAX_IMAGE_SIZE,
 ) -> None:
     """
     Combines two SFO images into one image using matplotlib. The images are plotted on top of each other.
@@ -232,27 +421,43 @@ def combine_sfo_images_with_matplotlib(
         sfo2: The second SFO
         sfo2_image_path: The path to the second SFO image
         out_path: The path to the output image
+        crop, max_size: The part of the images that is shown and their maximum size, see `load_orbital_image`
     """
 
-    fig, ax = plt.subplots(1, 2, figsize=(5, 5))
-    img1 = mpimg.imread(sfo1_image_path)
-    img2 = mpimg.imread(sfo2_image_path)
+    fig = plt.figure(figsize=(5, 5))
+    img1 = load_orbital_image(sfo1_image_path, crop, max_size)
+    img2 = load_orbital_image(sfo2_image_path, crop, max_size)
+
+    draw_sfo_pair(fig, sfo1, img1, sfo2, img2, overlap, energy_gap, stabilization)
+    fig.savefig(out_path)
+    plt.close(fig)
+
+
+def draw_sfo_pair(
+    fig: Figure,
+    sfo1: SFO,
+    img1: np.ndarray,
+    sfo2: SFO,
+    img2: np.ndarray,
+    overlap: float | None = None,
+    energy_gap: float | None = None,
+    stabilization: float | None = None,
+) -> None:
+    """
+    Draws the two (already read and cropped, see `load_orbital_image`) SFO images next to each other on the figure.
+    The figure is not cleared, such that it can be reused for many pairs (see `orb_visualization.render_planner`).
+    """
+    ax = fig.subplots(1, 2)
 
     for i, (sfo, img) in enumerate(zip([sfo1, sfo2], [img1, img2])):
         ax[i].imshow(img)
         ax[i].set_title(f"{sfo.amsview_label}\nGross Pop: {sfo.gross_pop :.3f}\nEnergy (eV): {sfo.energy :.2f}", fontsize=12)  # NOQA E203
         ax[i].axis("off")  # Turn off the axis
 
-        # Zoom in on the image
-        ax[i].set_xlim(img.shape[1] * 0.28, img.shape[1] * 0.72)
-        ax[i].set_ylim(img.shape[0] * 0.72, img.shape[0] * 0.28)
-
-    overlap_str = f"Overlap: {overlap:.3f}" or ""
-    energy_gap_str = f"Energy gap (eV): {energy_gap:.3f}" or ""
+    overlap_str = f"Overlap: {overlap:.3f}" if overlap is not None else ""
+    energy_gap_str = f"Energy gap (eV): {energy_gap:.3f}" if energy_gap is not None else ""
     stabilization_str = f"Stabilization: {stabilization:.3f}" if stabilization is not None else ""
 
     fig.tight_layout()
 
-    plt.suptitle(f"{overlap_str}\n{energy_gap_str}\n{stabilization_str}")
-    plt.savefig(out_path)
-    plt.close()
+    fig.suptitle(f"{overlap_str}\n{energy_gap_str}\n{stabilization_str}")
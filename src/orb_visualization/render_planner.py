@@ -0,0 +1,165 @@
+"""
+Module containing a planner that renders the images of many orbital pairs (e.g. the most destabilizing Pauli and most stabilizing orbital interaction pairs of many systems).
+
+Plotting every pair with `OrbitalPair.plot` renders each SFO once per pair it appears in and creates a new matplotlib figure per composite. The planner instead:
+    1. collects the unique (rkf file, SFO plot label) images of all pairs, which are rendered once with the :RenderQueue: (and the image cache)
+    2. builds the composites of all pairs in a pool of worker processes, of which each reuses one Agg figure and keeps the recently read (cropped) images in memory
+
+Such that the number of amsview processes is proportional to the number of unique orbitals instead of the number of pairs.
+
+Layout of the output directory:
+    - [output_dir]/[system]/orbitals/[plot label].png: the rendered SFO images, where [system] is "[rkf directory name]_[rkf stem]_[short hash of the rkf path]"
+    - [output_dir]/[system]/[sfo1 amsview label]-[sfo2 amsview label].png: the composites of the pairs
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib as pl
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Literal, Sequence
+
+import attrs
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from orb_analysis.orbital.orbital_pair import OrbitalPair
+from orb_analysis.orbital_manager.orb_manager import SFOManager
+
+from orb_visualization.image_cache import DEFAULT_IMAGE_CACHE, ImageCache
+from orb_visualization.plotter import AMSViewPlotSettings, draw_sfo_pair, load_orbital_image
+from orb_visualization.render_queue import DEFAULT_MAX_CONCURRENCY, RenderJob, render_orbitals
+
+COMPOSITE_FIGSIZE = (5, 5)
+IMAGE_MEMORY_SIZE = 32  # Number of decoded images that each composite worker keeps in memory
+
+_figure: Figure | None = None  # The figure that is reused by the composite worker (one per process)
+
+
+# --------------------Classes-------------------- #
+
+
+@attrs.define(frozen=True)
+class PlannedComposite:
+    """This class contains a pair of which the composite is built from the two rendered SFO images."""
+
+    pair: OrbitalPair
+    image1: pl.Path
+    image2: pl.Path
+    out_path: pl.Path
+
+
+@attrs.define
+class RenderPlan:
+    """This class contains the unique images to render, as {(rkf file, plot label): image path}, and the composites that are built from them."""
+
+    images: dict[tuple[str, str], pl.Path] = attrs.field(factory=dict)
+    composites: list[PlannedComposite] = attrs.field(factory=list)
+    plot_settings: AMSViewPlotSettings = attrs.field(factory=AMSViewPlotSettings)
+
+    @property
+    def render_jobs(self) -> list[RenderJob]:
+        return [RenderJob(rkf_file, plot_label, self.plot_settings, image_path) for (rkf_file, plot_label), image_path in self.images.items()]
+
+
+# --------------------Helper Functions-------------------- #
+
+
+def _get_system_name(rkf_file: str | pl.Path) -> str:
+    """Returns the name of the directory of a system, e.g. "calcs/NH3-BH3/adf.rkf" -> "NH3-BH3_adf_1a2b3c4d". The hash of the resolved path keeps runs with the same directory name apart."""
+    rkf_file = pl.Path(rkf_file)
+    path_hash = hashlib.blake2b(str(rkf_file.resolve()).encode(), digest_size=4).hexdigest()
+    return f"{rkf_file.parent.name}_{rkf_file.stem}_{path_hash}"
+
+
+def _get_pairs(pairs: Sequence[OrbitalPair] | SFOManager, n_pairs: int) -> list[OrbitalPair]:
+    if isinstance(pairs, SFOManager):
+        return pairs.get_most_destabilizing_pauli_pairs(n_pairs) + pairs.get_most_stabilizing_oi_pairs(n_pairs)
+    return list(pairs)
+
+
+@lru_cache(maxsize=IMAGE_MEMORY_SIZE)
+def _read_image(image_path: pl.Path, mtime_ns: int) -> np.ndarray:
+    # The modification time is part of the cache key, such that re-rendered images are read again. The cached images are cropped and downsampled
+    return load_orbital_image(image_path)
+
+
+def _build_composite(composite: PlannedComposite) -> pl.Path:
+    """Draws the composite on the figure of this process. The figure is created once and cleared for every composite."""
+    global _figure
+    if _figure is None:
+        _figure = Figure(figsize=COMPOSITE_FIGSIZE)
+        FigureCanvasAgg(_figure)
+    _figure.clear()
+
+    pair = composite.pair
+    img1, img2 = (_read_image(image, image.stat().st_mtime_ns) for image in [composite.image1, composite.image2])
+    draw_sfo_pair(_figure, pair.sfo1, img1, pair.sfo2, img2, pair.overlap, pair.energy_gap, pair.stabilization)
+    _figure.savefig(composite.out_path)
+    return composite.out_path
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def plan_pair_renders(
+    systems: Iterable[tuple[str | pl.Path, Sequence[OrbitalPair] | SFOManager]],
+    output_dir: str | pl.Path,
+    plot_settings: AMSViewPlotSettings | None = None,
+    n_pairs: int = 4,
+) -> RenderPlan:
+    """
+    Creates the :RenderPlan: for the pairs of many systems.
+
+    Args:
+        systems: (rkf file, pairs) per system. The rkf file is the file that contains the SFOs (e.g. the .t41 file of a DensF calculation).
+            Instead of a list of pairs, a :SFOManager: can be given, of which the `n_pairs` most destabilizing Pauli and most stabilizing orbital interaction pairs are used.
+        output_dir: The directory in which the images and composites are stored (see the module docstring)
+        plot_settings: The amsview plot settings of the SFO images. Defaults to AMSViewPlotSettings().
+        n_pairs: The number of pairs of each type that are taken from a :SFOManager:. Defaults to 4.
+    """
+    plan = RenderPlan(plot_settings=plot_settings or AMSViewPlotSettings())
+    planned_composites: set[pl.Path] = set()
+
+    for rkf_file, pairs in systems:
+        system_dir = pl.Path(output_dir) / _get_system_name(rkf_file)
+        for pair in _get_pairs(pairs, n_pairs):
+            images = []
+            for sfo in [pair.sfo1, pair.sfo2]:
+                images.append(plan.images.setdefault((str(rkf_file), sfo.plot_label), system_dir / "orbitals" / f"{sfo.plot_label}.png"))
+
+            out_path = system_dir / f"{pair.sfo1.amsview_label}-{pair.sfo2.amsview_label}.png"
+            if out_path not in planned_composites:
+                planned_composites.add(out_path)
+                plan.composites.append(PlannedComposite(pair, images[0], images[1], out_path))
+
+    return plan
+
+
+def execute_render_plan(
+    plan: RenderPlan,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_workers: int | None = None,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
+) -> list[pl.Path]:
+    """
+    Renders the unique images of the plan with `max_concurrency` amsview processes and builds the composites with `max_workers` processes (1 builds them in the current process).
+    Returns the paths of the composites in the order of the plan. Raises the :RenderError: of the first image that could not be rendered.
+    """
+    for composite in plan.composites:
+        composite.out_path.parent.mkdir(parents=True, exist_ok=True)
+    render_orbitals(plan.render_jobs, max_concurrency=max_concurrency, image_cache=image_cache)
+
+    # Composites that share images are built after each other, such that the images are read once per worker
+    composites = sorted(plan.composites, key=lambda composite: (composite.image1, composite.image2))
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(composites), 1))
+    if max_workers == 1:
+        for composite in composites:
+            _build_composite(composite)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_build_composite, composites, chunksize=max(len(composites) // (4 * max_workers), 1)))
+
+    return [composite.out_path for composite in plan.composites]
@@ -0,0 +1,177 @@
+"""
+Module containing the :RenderQueue: that renders orbital images with amsview concurrently.
+
+`plot_orbital_with_amsview` runs one blocking amsview process per orbital, such that rendering many orbitals means many sequential amsview start-ups.
+The :RenderQueue: accepts :RenderJob: objects (input file, orbital label, plot settings and save file) and runs the amsview processes in a thread pool with:
+    - a maximum number of concurrent amsview processes
+    - a timeout per attempt and a number of retries for failed or timed out attempts
+    - the captured stderr (and stdout) of the last attempt in the :RenderResult:
+    - the image cache (see `orb_visualization.image_cache`), which is consulted before an amsview process is started
+
+Submitting a job returns a `concurrent.futures.Future` that resolves to the :RenderResult:, or raises a :RenderError: when all attempts failed.
+The amsview executable is looked up on the PATH when a job starts, such that a stand-in executable can be used for testing.
+"""
+
+from __future__ import annotations
+
+import pathlib as pl
+import shutil
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Literal
+
+import attrs
+
+from orb_visualization.image_cache import DEFAULT_IMAGE_CACHE, ImageCache, get_default_image_cache, resolve_image_cache
+from orb_visualization.plotter import AMSViewPlotSettings, build_amsview_command, get_amsview_image_key
+
+DEFAULT_MAX_CONCURRENCY = 4  # amsview is a heavy application, so the default is conservative
+DEFAULT_TIMEOUT = 300.0  # seconds per attempt
+DEFAULT_RETRIES = 1
+
+
+class RenderError(RuntimeError):
+    """Raised (through the future) when a :RenderJob: failed in all attempts. The last :RenderResult: is stored in `result`."""
+
+    def __init__(self, result: RenderResult):
+        self.result = result
+        reason = "timed out" if result.timed_out else f"exited with code {result.returncode}"
+        super().__init__(f"Rendering {result.job.label} of {result.job.input_file} {reason} after {result.attempts} attempt(s):\n{result.stderr}")
+
+
+@attrs.define(frozen=True)
+class RenderJob:
+    """This class contains the information to render one orbital image with amsview (see `plot_orbital_with_amsview` for the meaning of the arguments)."""
+
+    input_file: str | pl.Path
+    label: str | None  # The orbital specifier, e.g. SCF_A_6 or SFO_E1:1_1
+    settings: AMSViewPlotSettings = attrs.field(factory=AMSViewPlotSettings)
+    save_file: str | pl.Path | None = None
+    calculated_field: str | None = None
+
+    @property
+    def command(self) -> list[str]:
+        return build_amsview_command(self.input_file, self.label, self.settings, self.save_file, self.calculated_field)
+
+    @property
+    def output_file(self) -> pl.Path | None:
+        """The file that amsview writes, which always has the .png suffix."""
+        return pl.Path(self.save_file).with_suffix(".png") if self.save_file is not None else None
+
+
+@attrs.define
+class RenderResult:
+    """This class contains the outcome of the last attempt of a :RenderJob:."""
+
+    job: RenderJob
+    returncode: int | None  # None when the last attempt timed out
+    stdout: str = ""
+    stderr: str = ""
+    attempts: int = 1  # 0 when the image was taken from the image cache
+    elapsed: float = 0.0  # Time (in seconds) of all attempts together
+
+    @property
+    def timed_out(self) -> bool:
+        return self.returncode is None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+@attrs.define
+class RenderQueue:
+    """
+    Runs :RenderJob: objects with a bounded number of concurrent amsview processes. Use it as a context manager (or call `shutdown`) to wait for all jobs at the end:
+
+        with RenderQueue(max_concurrency=8) as queue:
+            futures = queue.submit_many(RenderJob(t41_file, label, save_file=out_dir / f"{label}.png") for label in labels)
+        results = [future.result() for future in futures]
+    """
+
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    timeout: float | None = DEFAULT_TIMEOUT  # seconds per attempt, None means no timeout
+    retries: int = DEFAULT_RETRIES  # number of extra attempts after a failed or timed out attempt
+    executable: str = "amsview"
+    image_cache: ImageCache | None = attrs.field(factory=get_default_image_cache)  # None disables the cache
+    _executor: ThreadPoolExecutor = attrs.field(init=False)
+
+    def __attrs_post_init__(self):
+        if self.max_concurrency < 1:
+            raise ValueError(f"max_concurrency should be at least 1. Got {self.max_concurrency}")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="amsview")
+
+    def __enter__(self) -> RenderQueue:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown(wait=True)
+
+    def _resolve_executable(self) -> str:
+        executable = shutil.which(self.executable)
+        if executable is None:
+            raise FileNotFoundError(f"The executable {self.executable} is not found on the PATH. Make sure that AMS is loaded (e.g. by sourcing amsbashrc.sh)")
+        return executable
+
+    def _run(self, job: RenderJob) -> RenderResult:
+        """Runs the job (in a thread of the pool) and retries it when it fails or times out."""
+        image_key = None
+        if self.image_cache is not None and job.output_file is not None:
+            image_key = get_amsview_image_key(self.image_cache, job.input_file, job.label, job.settings, job.calculated_field)
+            if self.image_cache.fetch(image_key, job.output_file):
+                return RenderResult(job=job, returncode=0, attempts=0)
+
+        command = [self._resolve_executable(), *job.command[1:]]
+        if job.settings.print_command:
+            print(" ".join(job.command))
+        if job.output_file is not None:
+            job.output_file.parent.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            try:
+                process = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+                result = RenderResult(job=job, returncode=process.returncode, stdout=process.stdout, stderr=process.stderr, attempts=attempt)
+            except subprocess.TimeoutExpired as timeout:
+                stderr = timeout.stderr.decode(errors="replace") if isinstance(timeout.stderr, bytes) else timeout.stderr or ""
+                result = RenderResult(job=job, returncode=None, stderr=stderr, attempts=attempt)
+            if result.ok:
+                break
+
+        result.elapsed = time.perf_counter() - start
+        if not result.ok:
+            raise RenderError(result)
+        if self.image_cache is not None and job.output_file is not None:
+            self.image_cache.store(image_key, job.output_file)
+        return result
+
+    def submit(self, job: RenderJob) -> Future[RenderResult]:
+        """Schedules the job and returns a future that resolves to the :RenderResult: (or raises a :RenderError:)."""
+        return self._executor.submit(self._run, job)
+
+    def submit_many(self, jobs: Iterable[RenderJob]) -> list[Future[RenderResult]]:
+        return [self.submit(job) for job in jobs]
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+
+# --------------------Interface Function(s)-------------------- #
+
+
+def render_orbitals(
+    jobs: Iterable[RenderJob],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+    image_cache: ImageCache | None | Literal["default"] = DEFAULT_IMAGE_CACHE,
+) -> list[RenderResult]:
+    """
+    Renders all jobs concurrently and returns the results in the order of the jobs. Raises the :RenderError: of the first failed job after all jobs are finished.
+    The image cache defaults to the cache that is configured in `orb_config.image_cache`, None renders without cache.
+    """
+    image_cache = resolve_image_cache(image_cache)
+    with RenderQueue(max_concurrency=max_concurrency, timeout=timeout, retries=retries, image_cache=image_cache) as queue:
+        futures = queue.submit_many(jobs)
+    return [future.result() for future in futures]
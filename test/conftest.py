@@ -0,0 +1,67 @@
+"""
+Fixtures that are shared by the test modules.
+"""
+
+import os
+import pathlib as pl
+import sys
+from typing import Callable
+
+import orb_analysis
+import pytest
+
+# Stand-in for densf: writes the orbitals of the ORBITALS block (except index 99) to the OUTPUTFILE, which is a real KF file with a "[type]_[irrep]_[A|B]"
+# section per irrep and the orbital index as variable name, as DensF does (see `orb_visualization.densf_planner`)
+STAND_IN_DENSF = """
+import sys
+
+from orb_analysis.rkf_reading.kf_writer import write_kf_file
+
+lines = [line.strip() for line in sys.stdin.read().splitlines() if line.strip()]
+outputfile = next(line.split()[1] for line in lines if line.startswith("OUTPUTFILE"))
+start = next(i for i, line in enumerate(lines) if line.startswith("ORBITALS"))
+orbital_type = lines[start].split()[1]
+block = lines[start + 1 : lines.index("end", start)]
+spin = "B" if "beta" in block else "A"
+
+sections = {}
+for line in block:
+    if line in ["alpha", "beta"]:
+        continue
+    irrep, indices = line.split(maxsplit=1)
+    for index in indices.split(","):
+        if index.strip() != "99":
+            sections.setdefault(f"{orbital_type}_{irrep}_{spin}", {})[index.strip()] = [0.0, 0.0]
+write_kf_file(outputfile, sections)
+print("NORMAL TERMINATION")
+"""
+
+
+@pytest.fixture
+def install_stand_in(tmp_path, monkeypatch) -> Callable[..., pl.Path]:
+    """
+    Returns a function that installs a stand-in for an AMS executable (e.g. amsview, amsreport or densf), such that the tests do not need an AMS installation.
+    The stand-in runs the given Python source and is found through the PATH, or through $AMSBIN with `on_path=False` (e.g. densf, which is started by plams).
+    """
+    bin_dir = tmp_path / "bin"
+
+    def install(name: str, source: str, on_path: bool = True) -> pl.Path:
+        bin_dir.mkdir(exist_ok=True)
+        executable = bin_dir / name
+        executable.write_text(f"#!{sys.executable}\n{source}")
+        executable.chmod(0o755)
+        if on_path:
+            monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        else:
+            monkeypatch.setenv("AMSBIN", str(bin_dir))
+        return executable
+
+    return install
+
+
+@pytest.fixture
+def stand_in_densf(install_stand_in, monkeypatch) -> pl.Path:
+    """Installs the densf stand-in in $AMSBIN. The package is put on the PYTHONPATH, such that the stand-in can write the t41 files with `write_kf_file`."""
+    src_dir = pl.Path(orb_analysis.__file__).parent.parent
+    monkeypatch.setenv("PYTHONPATH", f"{src_dir}{os.pathsep}{os.environ.get('PYTHONPATH', '')}")
+    return install_stand_in("densf", STAND_IN_DENSF, on_path=False)
@@ -0,0 +1,76 @@
+"""
+Testmodule that tests the (batched) amsreport plotting against a stand-in amsreport executable on the PATH.
+"""
+
+import pathlib as pl
+
+import pytest
+from orb_visualization.image_cache import ImageCache
+from orb_visualization.plotter import AMSReportPlotSettings, plot_orbital_with_amsreport, plot_orbitals_with_amsreport
+
+# Stand-in for amsreport: writes "[out].jpgs/[i].jpg" for every specifier (except "LUMO+99") and the unused "[out]" file, and logs the call
+STAND_IN_AMSREPORT = """
+import os
+import pathlib as pl
+import sys
+
+args = sys.argv[1:]
+out_name = pl.Path(args[args.index("-o") + 1])
+first_option = args.index("-v") if "-v" in args else len(args)
+specifiers = args[args.index("-o") + 2 : first_option]
+
+out_name.write_text("")
+pl.Path(f"{out_name}.jpgs").mkdir()
+for i, specifier in enumerate(specifiers):
+    if specifier == "LUMO+99":
+        sys.stderr.write("no such orbital LUMO+99")
+        continue
+    (pl.Path(f"{out_name}.jpgs") / f"{i}.jpg").write_text(specifier)
+with open(os.environ["STAND_IN_LOG"], "a") as log:
+    log.write(" ".join(specifiers) + "\\n")
+"""
+
+plot_settings = AMSReportPlotSettings(print_command=False)
+
+
+@pytest.fixture
+def amsreport_log(install_stand_in, tmp_path, monkeypatch) -> pl.Path:
+    install_stand_in("amsreport", STAND_IN_AMSREPORT)
+    monkeypatch.setenv("STAND_IN_LOG", str(tmp_path / "calls.log"))
+    return tmp_path / "calls.log"
+
+
+@pytest.fixture
+def input_file(tmp_path) -> pl.Path:
+    input_file = tmp_path / "adf.rkf"
+    input_file.write_bytes(b"rkf data")
+    return input_file
+
+
+@pytest.mark.parametrize("single_invocation", [False, True])
+def test_plot_orbitals_with_amsreport(amsreport_log, tmp_path, input_file, single_invocation):
+    out_dir = tmp_path / "images"
+    specifiers = ["HOMO", "HOMO-1", "LUMO+99", "LUMO"]
+    summary = plot_orbitals_with_amsreport(input_file, out_dir, specifiers, plot_settings, image_cache=ImageCache(tmp_path / "cache"), single_invocation=single_invocation)
+
+    assert sorted(summary.produced) == ["HOMO", "HOMO-1", "LUMO"]
+    assert all(summary.produced[specifier].read_text() == specifier for specifier in summary.produced)
+    assert summary.failed == {"LUMO+99": "no such orbital LUMO+99"}
+    assert sorted(file.name for file in out_dir.iterdir()) == ["HOMO-1.jpg", "HOMO.jpg", "LUMO.jpg"]  # the temporary directories are removed
+    assert len(amsreport_log.read_text().splitlines()) == (1 if single_invocation else 4)
+
+    summary = plot_orbitals_with_amsreport(input_file, out_dir, specifiers, plot_settings, image_cache=ImageCache(tmp_path / "cache"), single_invocation=single_invocation)
+    assert sorted(summary.cached) == ["HOMO", "HOMO-1", "LUMO"]
+    assert list(summary.failed) == ["LUMO+99"]
+
+
+def test_plot_orbital_with_amsreport(amsreport_log, tmp_path, input_file):
+    plot_orbital_with_amsreport(input_file, tmp_path / "images", "HOMO", plot_settings, image_cache=ImageCache(tmp_path / "cache"))
+
+    assert (tmp_path / "images" / "HOMO.jpg").read_text() == "HOMO"
+
+
+def test_plot_orbital_with_amsreport_logs_failures(amsreport_log, tmp_path, input_file, caplog):
+    plot_orbital_with_amsreport(input_file, tmp_path / "images", "LUMO+99", plot_settings, image_cache=ImageCache(tmp_path / "cache"))
+
+    assert "amsreport did not produce an image for LUMO+99: no such orbital LUMO+99" in caplog.messages
@@ -0,0 +1,92 @@
+"""
+Testmodule that tests the parallel analysis of many rkf files (`analyze_many`) and the `orb_analysis batch` command.
+"""
+
+import pathlib as pl
+import shutil
+import time
+
+import numpy as np
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.batch import BatchProgress, analyze_many, expand_rkf_paths, run_in_process_pool
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.main import batch_main
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+restricted_largecore_nofragsym_nosym = fixtures_dir / "restricted_largecore_nofragsym_nosym_full.adf.rkf"
+missing_rkf_file = fixtures_dir / "does_not_exist.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+
+@pytest.fixture
+def calc_dir(tmp_path) -> pl.Path:
+    for name, rkf_file in [("c3v", restricted_largecore_fragsym_c3v), ("nosym", restricted_largecore_nofragsym_nosym)]:
+        (tmp_path / name).mkdir()
+        shutil.copyfile(rkf_file, tmp_path / name / "adf.rkf")
+    return tmp_path
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_analyze_many_matches_serial_analysis(max_workers):
+    paths = [restricted_largecore_fragsym_c3v, missing_rkf_file, restricted_largecore_nofragsym_nosym]
+    progress: list[BatchProgress] = []
+    results = list(analyze_many(paths, orb_range=(3, 3), max_workers=max_workers, progress=progress.append))
+
+    assert [result.path for result in results] == [str(path) for path in paths]
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error is not None
+    assert [p.n_done for p in progress] == [1, 2, 3]
+    assert progress[-1].n_failed == 1 and progress[-1].eta == 0.0
+
+    for result in [results[0], results[2]]:
+        analyzer = create_calc_analyser(result.path)
+        assert result.analysis == analyzer(orb_range=(3, 3))
+        assert result.sfo_manager is not None
+        assert np.allclose(result.sfo_manager.overlap_matrix, analyzer.get_sfo_orbitals((3, 3), (3, 3)).overlap_matrix)
+
+
+def test_analyze_many_unordered_yields_all_results():
+    paths = [restricted_largecore_fragsym_c3v, restricted_largecore_nofragsym_nosym] * 2
+    results = list(analyze_many(paths, orb_range=(2, 2), max_workers=2, ordered=False))
+
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    assert all(result.ok for result in results)
+
+
+def _record_start(index: int, started_dir: pl.Path, delay: float) -> int:
+    (started_dir / str(index)).touch()
+    time.sleep(delay)
+    return index
+
+
+def test_run_in_process_pool_bounds_results_waiting_for_slow_job(tmp_path):
+    jobs = [(index, tmp_path, 2.0 if index == 0 else 0.0) for index in range(20)]
+    results = run_in_process_pool(_record_start, jobs, max_workers=2)
+
+    # While the first (slow) job runs, the finished jobs behind it wait to be yielded and count towards the 2 * max_workers limit
+    assert next(results) == 0
+    assert len(list(tmp_path.iterdir())) <= 4
+    assert list(results) == list(range(1, 20))
+
+
+def test_expand_rkf_paths(calc_dir):
+    expected = [calc_dir / "c3v" / "adf.rkf", calc_dir / "nosym" / "adf.rkf"]
+
+    assert expand_rkf_paths([calc_dir]) == expected
+    assert expand_rkf_paths([str(calc_dir / "*" / "adf.rkf"), calc_dir / "c3v" / "adf.rkf"]) == expected
+    assert expand_rkf_paths([missing_rkf_file]) == [missing_rkf_file]
+
+
+def test_batch_command_writes_output_files(calc_dir, tmp_path):
+    output_dir = tmp_path / "output"
+
+    assert batch_main([str(calc_dir), "--orb_range", "2", "2", "--workers", "2", "--output_dir", str(output_dir)]) == 0
+    assert sorted(file.name for file in output_dir.iterdir()) == ["c3v_adf.txt", "nosym_adf.txt"]
+    assert batch_main([str(missing_rkf_file), "--workers", "1"]) == 1
@@ -0,0 +1,64 @@
+"""
+Testmodule that tests the benchmark suite (`orb_analysis.benchmarks`): running a selection of benchmarks and comparing results with a baseline.
+"""
+
+import json
+import pathlib as pl
+
+from orb_analysis.benchmarks import Benchmark, Comparison, benchmark_main, compare_results, format_comparison, run_benchmarks
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+
+def create_results(times: dict[str, float]) -> dict:
+    return {"metadata": {}, "benchmarks": {name: {"min": time, "median": time, "mean": time, "stdev": 0.0, "repeat": 1} for name, time in times.items()}, "skipped": {}}
+
+
+def test_run_selected_benchmarks():
+    results = run_benchmarks(fixtures_dir, repeat=2, select=["synthetic/filter_orbitals[[]1000]", "restricted_sym/get_sfo_orbitals*", "restricted_sym/SFOManager.__str__"])
+
+    assert sorted(results["benchmarks"]) == [
+        "restricted_sym/SFOManager.__str__",
+        "restricted_sym/get_sfo_orbitals[100]",
+        "restricted_sym/get_sfo_orbitals[20]",
+        "restricted_sym/get_sfo_orbitals[5]",
+        "synthetic/filter_orbitals[1000]",
+    ]
+    assert all(0 < stats["min"] <= stats["median"] and stats["repeat"] == 2 for stats in results["benchmarks"].values())
+    assert {"platform", "python", "numpy", "cpu_count", "git_commit", "timestamp"} <= set(results["metadata"])
+    json.dumps(results)  # the results are stored as JSON
+
+
+def test_setup_per_call_gives_each_call_a_new_argument():
+    shared_args, per_call_args = [], []
+    Benchmark("case/shared", func=shared_args.append, setup=object).run(3)
+    Benchmark("case/per_call", func=per_call_args.append, setup=object, setup_per_call=True).run(3)
+
+    assert len({id(arg) for arg in shared_args}) == 1
+    assert len({id(arg) for arg in per_call_args}) == 3
+
+
+def test_missing_fixtures_are_skipped(tmp_path):
+    results = run_benchmarks(tmp_path, repeat=1, select=["restricted_sym/*"])
+
+    assert results["benchmarks"] == {}
+    assert "restricted_sym" in results["skipped"]
+
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    baseline = create_results({"case/fast": 0.010, "case/slow": 0.010, "case/improved": 0.010, "case/removed": 0.010})
+    current = create_results({"case/fast": 0.011, "case/slow": 0.015, "case/improved": 0.005, "case/new": 0.010})
+
+    comparisons = compare_results(baseline, current)
+    assert [comparison.name for comparison in comparisons] == ["case/fast", "case/slow", "case/improved"]
+    assert [comparison.is_regression(0.2) for comparison in comparisons] == [False, True, False]
+    assert Comparison("case/improved", 0.010, 0.005).is_improvement(0.2)
+    assert "REGRESSION" in format_comparison(comparisons, 0.2)
+
+    baseline_file, current_file = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline_file.write_text(json.dumps(baseline))
+    current_file.write_text(json.dumps(current))
+    assert benchmark_main(["compare", str(baseline_file), str(current_file), "--threshold", "0.2"]) == 1
+    assert benchmark_main(["compare", str(baseline_file), str(current_file), "--threshold", "0.6"]) == 0
+    assert "case/slow" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+"""
+Testmodule that tests the lazily loaded config (`orb_config`) and the context-scoped overrides of its settings (`config_override`).
+"""
+
+import pathlib as pl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from orb_analysis import bind_config, config_override, get_config, orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from pydantic import ValidationError
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+
+HARTREE_TO_EV = 27.211386245988
+
+
+def get_sfo_energies(analyzer) -> list[float]:
+    sfo_manager = analyzer.get_sfo_orbitals()
+    return [sfo.energy for sfo in sfo_manager.frag1_sfos + sfo_manager.frag2_sfos]
+
+
+def test_config_override_is_scoped_and_validated():
+    default_settings = orb_config.rkf_reading.model_dump()
+
+    with config_override(rkf_reading={"orbital_energy_unit": "eV", "orbital_energy_key": "energy"}):
+        assert (orb_config.rkf_reading.orbital_energy_unit, orb_config.rkf_reading.orbital_energy_key) == ("eV", "energy")
+        with config_override(rkf_reading={"orbital_energy_unit": "hartree"}):
+            assert (orb_config.rkf_reading.orbital_energy_unit, orb_config.rkf_reading.orbital_energy_key) == ("hartree", "energy")
+        # Changes within the context stay within the context
+        orb_config.rkf_reading.memory_map = not default_settings["memory_map"]
+        assert orb_config.image_cache is get_config().image_cache  # sections that are not overridden are the process-wide ones
+
+    assert orb_config.rkf_reading.model_dump() == default_settings
+    with pytest.raises(ValidationError):
+        with config_override(rkf_reading={"orbital_energy_unit": "kcal/mol"}):
+            pass
+
+
+def test_concurrent_analyses_with_different_units():
+    barrier = threading.Barrier(2)
+
+    def analyze(unit: str) -> list[float]:
+        with config_override(rkf_reading={"orbital_energy_unit": unit, "orbital_energy_key": "escale"}):
+            barrier.wait()  # both analyses run at the same time with different settings
+            return get_sfo_energies(create_calc_analyser(restricted_largecore_fragsym_c3v))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        hartree_energies, ev_energies = executor.map(analyze, ["hartree", "eV"])
+
+    assert ev_energies == pytest.approx([energy * HARTREE_TO_EV for energy in hartree_energies])
+
+
+def test_lazy_analyzer_uses_the_overrides_at_creation():
+    with config_override(rkf_reading={"orbital_energy_unit": "hartree", "orbital_energy_key": "escale"}):
+        hartree_energies = get_sfo_energies(create_calc_analyser(restricted_largecore_fragsym_c3v))
+        lazy_analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v, lazy=True)
+
+    # The fragments are read after the context is left, but with its settings
+    with config_override(rkf_reading={"orbital_energy_unit": "eV"}):
+        assert get_sfo_energies(lazy_analyzer) == pytest.approx(hartree_energies)
+        assert bind_config(lambda: orb_config.rkf_reading.orbital_energy_unit)() == "eV"
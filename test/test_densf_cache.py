@@ -0,0 +1,66 @@
+"""
+Testmodule that tests the cache of DensF t41 files and the reuse of cached orbitals by the DensF planner.
+"""
+
+import pathlib as pl
+import shutil
+
+import pytest
+from orb_analysis.orbital.orbital import SFO
+from orb_visualization import densf_cache as densf_cache_module
+from orb_visualization.densf_cache import DensfCache
+from orb_visualization.densf_planner import _create_densf_settings, plan_densf_jobs, run_densf_plan
+
+scan_t41_orbitals = densf_cache_module.scan_t41_orbitals
+scanned_t41_files: list[pl.Path] = []
+
+
+def counting_scan_t41_orbitals(path) -> list[tuple[str, str]]:
+    scanned_t41_files.append(pl.Path(path))
+    return scan_t41_orbitals(path)
+
+
+@pytest.fixture
+def rkf_file(tmp_path) -> pl.Path:
+    rkf_file = tmp_path / "system" / "adf.rkf"
+    rkf_file.parent.mkdir()
+    rkf_file.write_bytes(b"rkf data")
+    return rkf_file
+
+
+def test_densf_cache_key(rkf_file, tmp_path):
+    cache = DensfCache(tmp_path / "cache")
+    sfos = [SFO(index=1, irrep="A"), SFO(index=2, irrep="A")]
+    key = cache.get_key(rkf_file, _create_densf_settings("SFO", None, sfos, tmp_path / "a.t41", "coarse"))
+
+    # The output file and orbitals are not part of the key, the grid and the content of the rkf file are
+    assert cache.get_key(rkf_file, _create_densf_settings("SFO", None, sfos[:1], tmp_path / "b.t41", "coarse")) == key
+    assert cache.get_key(rkf_file, _create_densf_settings("SFO", None, sfos, tmp_path / "a.t41", "fine")) != key
+    shutil.copyfile(rkf_file, tmp_path / "copy.rkf")
+    assert cache.get_key(tmp_path / "copy.rkf", _create_densf_settings("SFO", None, sfos, tmp_path / "a.t41", "coarse")) == key
+    assert cache.get_key(tmp_path / "missing.rkf", _create_densf_settings("SFO", None, sfos, tmp_path / "a.t41", "coarse")) is None
+
+
+def test_densf_plan_reuses_cached_orbitals(stand_in_densf, rkf_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(densf_cache_module, "scan_t41_orbitals", counting_scan_t41_orbitals)
+    scanned_t41_files.clear()
+
+    cache = DensfCache(tmp_path / "cache")
+    sfos = [SFO(index=i, irrep="A") for i in range(1, 5)]
+    first_plan = plan_densf_jobs({rkf_file: sfos[:2]}, tmp_path / "t41", densf_cache=cache)
+    first_t41_file = first_plan.jobs[0].t41_file
+    run_densf_plan(first_plan, n_cores=1, plams_dir=tmp_path)
+
+    # Only the orbitals that are not in the cache are computed
+    second_plan = plan_densf_jobs({rkf_file: sfos}, tmp_path / "t41", densf_cache=cache)
+    assert [orb.index for job in second_plan.jobs for orb in job.orbitals] == [3, 4]
+    assert second_plan.cached_variables[(str(rkf_file), "SFO_A_1")].t41_file == first_t41_file
+    assert second_plan.cached_variables[(str(rkf_file), "SFO_A_1")].label == "SFO_A_A_1"
+    run_densf_plan(second_plan, n_cores=1, plams_dir=tmp_path)
+
+    # Everything is cached now, and the t41 files keep their location such that the amsview images are cached as well
+    third_plan = plan_densf_jobs({rkf_file: sfos}, tmp_path / "t41", densf_cache=cache)
+    assert len(third_plan) == 0
+    assert third_plan.cached_variables[(str(rkf_file), "SFO_A_1")].t41_file == first_t41_file
+    assert sorted({variable.t41_file for variable in third_plan.cached_variables.values()}) == sorted(cache.get_entry_dir(cache.get_key(rkf_file, first_plan.jobs[0].settings)).glob("*.t41"))
+    assert len(scanned_t41_files) == 2  # each t41 file is scanned once
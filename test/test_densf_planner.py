@@ -0,0 +1,39 @@
+"""
+Testmodule that tests the planner that groups the requested orbitals into the fewest possible DensF jobs.
+"""
+
+import pathlib as pl
+
+import pytest
+from orb_analysis.orbital.orbital import MO, SFO
+from orb_visualization.densf_planner import plan_densf_jobs, run_densf_plan
+
+
+@pytest.fixture
+def requested_orbitals(tmp_path) -> dict[pl.Path, list]:
+    rkf1, rkf2 = tmp_path / "system1" / "adf.rkf", tmp_path / "system2" / "adf.rkf"
+    sfos = [SFO(index=3, irrep="A1", spin="A"), SFO(index=4, irrep="A1", spin="A"), SFO(index=1, irrep="E1", spin="A"), SFO(index=2, irrep="E1", spin="B")]
+    mos = [MO(index=2, irrep="A1", spin="A"), MO(index=99, irrep="A1", spin="A")]
+    return {rkf1: sfos + sfos[:2] + mos, rkf2: [SFO(index=5, irrep="A", spin=None)]}
+
+
+def test_plan_densf_jobs_groups_orbitals(requested_orbitals, tmp_path):
+    plan = plan_densf_jobs(requested_orbitals, tmp_path / "t41")
+
+    assert [job.name for job in plan.jobs] == ["000_system1_SFO_A", "000_system1_SFO_B", "000_system1_SCF_A", "001_system2_SFO"]
+    assert [len(job.orbitals) for job in plan.jobs] == [3, 1, 2, 1]  # the duplicated SFOs are computed once
+
+    densf_input = plan.jobs[0].create_job().get_input()
+    assert "ORBITALS SFO" in densf_input and "A1 3, 4" in densf_input and "E1 1" in densf_input and "alpha" in densf_input
+    assert f"OUTPUTFILE {tmp_path / 't41' / '000_system1_SFO_A.t41'}" in densf_input
+    assert "alpha" not in plan.jobs[3].create_job().get_input()
+
+
+def test_run_densf_plan(stand_in_densf, requested_orbitals, tmp_path):
+    variables = run_densf_plan(plan_densf_jobs(requested_orbitals, tmp_path / "t41"), n_cores=2, plams_dir=tmp_path)
+
+    rkf1, rkf2 = (str(rkf) for rkf in requested_orbitals)
+    assert len(variables) == 6  # MO 99 is not computed
+    assert variables[(rkf1, "SFO_E1_2_B")].label == "SFO_E1_B_2"
+    assert variables[(rkf1, "SCF_A1_2_A")].t41_file == tmp_path / "t41" / "000_system1_SCF_A.t41"
+    assert variables[(rkf2, "SFO_A_5")].label == "SFO_A_A_5"
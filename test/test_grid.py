@@ -0,0 +1,67 @@
+"""
+Testmodule that tests the reading of orbitals on a grid and the chunked integrals with Gaussian orbitals, of which the integrals are known analytically.
+"""
+
+import math
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_visualization.grid import box, get_density_fraction, get_norm, get_overlap_density, get_overlap_integral, get_spatial_extent, read_cube_fields, sphere
+
+N_POINTS, SPACING = 61, 0.2  # grid from -6 to 6 bohr
+DISTANCE = 1.0  # bohr between the centres of the two orbitals
+
+
+def gaussian_orbital(coordinates: np.ndarray, center: list[float]) -> np.ndarray:
+    """Normalized orbital exp(-r²/2) of which the density has a spatial extent of sqrt(3/2)."""
+    distance_squared = np.sum((coordinates - np.array(center)) ** 2, axis=-1)
+    return np.pi ** (-3 / 4) * np.exp(-distance_squared / 2)
+
+
+@pytest.fixture
+def cube_file(tmp_path) -> pl.Path:
+    """Cube file with two orbitals: one centred at the origin and one at (1, 0, 0)."""
+    axis = -6.0 + SPACING * np.arange(N_POINTS)
+    coordinates = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1)  # the last axis runs fastest
+    values = np.stack([gaussian_orbital(coordinates, [0, 0, 0]), gaussian_orbital(coordinates, [DISTANCE, 0, 0])], axis=-1)
+
+    header = ["comment", "comment", "   -1   -6.0 -6.0 -6.0"]
+    header += [f"   {N_POINTS}   {SPACING} 0.0 0.0", f"   {N_POINTS}   0.0 {SPACING} 0.0", f"   {N_POINTS}   0.0 0.0 {SPACING}"]
+    header += ["    1    1.0    0.0 0.0 0.0", "    2    1    2"]
+    cube_file = tmp_path / "orbitals.cube"
+    with open(cube_file, "w") as file:
+        file.write("\n".join(header) + "\n")
+        np.savetxt(file, values.reshape(-1, 2), fmt="%.8e")
+    return cube_file
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 2**18])
+def test_grid_integrals(cube_file, chunk_size):
+    orbital1, orbital2 = read_cube_fields(cube_file)
+
+    assert orbital1.name == "orbitals_1" and orbital1.grid.shape == (N_POINTS, N_POINTS, N_POINTS)
+    assert get_norm(orbital1, chunk_size) == pytest.approx(1.0, abs=1e-6)
+    assert get_spatial_extent(orbital1, chunk_size) == pytest.approx(math.sqrt(3 / 2), abs=1e-4)
+    assert get_overlap_integral(orbital1, orbital2, chunk_size) == pytest.approx(math.exp(-(DISTANCE**2) / 4), abs=1e-6)
+    # By symmetry, the density of the first orbital at x < 0 and x > 0 is the same, and most of it is within 3 bohr of the centre
+    negative_x, positive_x = get_density_fraction(orbital1, box([-10, -10, -10], [-0.01, 10, 10]), chunk_size), get_density_fraction(orbital1, box([0.01, -10, -10], [10, 10, 10]), chunk_size)
+    assert negative_x == pytest.approx(positive_x) and 0.4 < negative_x < 0.5
+    assert 0.99 < get_density_fraction(orbital1, sphere([0, 0, 0], 3.0), chunk_size) < 1.0
+
+
+def test_overlap_density(cube_file, tmp_path):
+    orbital1, orbital2 = read_cube_fields(cube_file)
+    overlap_density = get_overlap_density(orbital1, orbital2, out_file=tmp_path / "overlap_density.npy", chunk_size=5000)
+
+    assert np.allclose(overlap_density.to_array(), orbital1.to_array() * orbital2.to_array())
+    assert np.load(tmp_path / "overlap_density.npy").shape == (N_POINTS**3,)
+    assert overlap_density.to_array()[30, 30, 30] == pytest.approx(gaussian_orbital(np.zeros(3), [0, 0, 0]) * gaussian_orbital(np.zeros(3), [DISTANCE, 0, 0]), rel=1e-6)
+
+
+def test_orbitals_on_different_grids(cube_file, tmp_path):
+    text = cube_file.read_text().replace("   -1   -6.0 -6.0 -6.0", "   -1   -5.0 -6.0 -6.0")
+    (tmp_path / "shifted.cube").write_text(text)
+
+    with pytest.raises(ValueError):
+        get_overlap_integral(read_cube_fields(cube_file)[0], read_cube_fields(tmp_path / "shifted.cube")[0])
@@ -0,0 +1,135 @@
+"""
+Testmodule that tests the content-addressed cache of rendered orbital images.
+"""
+
+import os
+import pathlib as pl
+
+import pytest
+from orb_analysis import config_override
+from orb_visualization.image_cache import ImageCache
+from orb_visualization.plotter import AMSViewPlotSettings, plot_orbital_with_amsview
+from orb_visualization.render_queue import RenderJob, render_orbitals
+
+# Stand-in for amsview: writes the label to the -save file and appends it to "calls.log" next to the save file
+STAND_IN_AMSVIEW = """
+import pathlib as pl
+import sys
+
+args = sys.argv[1:]
+label = args[args.index("-var") + 1]
+save_file = pl.Path(args[args.index("-save") + 1])
+save_file.write_text(label)
+with open(save_file.parent / "calls.log", "a") as log:
+    log.write(label + "\\n")
+"""
+
+plot_settings = AMSViewPlotSettings(print_command=False)
+
+
+@pytest.fixture
+def stand_in_amsview(install_stand_in) -> pl.Path:
+    return install_stand_in("amsview", STAND_IN_AMSVIEW)
+
+
+@pytest.fixture
+def input_file(tmp_path) -> pl.Path:
+    input_file = tmp_path / "result.t41"
+    input_file.write_bytes(b"volume data")
+    return input_file
+
+
+def test_image_cache_key_depends_on_input_label_and_settings(tmp_path, input_file):
+    cache = ImageCache(tmp_path / "cache")
+    key = cache.get_key("amsview", input_file, "SFO_A_1", {"zoom": 1.0})
+
+    assert key == cache.get_key("amsview", input_file, "SFO_A_1", {"zoom": 1.0})
+    assert key != cache.get_key("amsview", input_file, "SFO_A_2", {"zoom": 1.0})
+    assert key != cache.get_key("amsview", input_file, "SFO_A_1", {"zoom": 2.0})
+    assert cache.get_key("amsview", tmp_path / "missing.t41", "SFO_A_1", {"zoom": 1.0}) is None
+
+    input_file.write_bytes(b"other volume data")
+    assert key != cache.get_key("amsview", input_file, "SFO_A_1", {"zoom": 1.0})
+
+
+def test_image_cache_evicts_least_recently_used_images(tmp_path):
+    cache = ImageCache(tmp_path / "cache", max_bytes=250)
+    image = tmp_path / "image.png"
+    image.write_bytes(b"x" * 100)
+
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.store(key, image)
+        os.utime(cache._get_path(key, ".png"), ns=(i * 10**9, i * 10**9))
+        if key == "bb02":
+            assert cache.fetch("aa01", tmp_path / "fetched.png")  # "aa01" is now the most recently used image
+
+    assert cache.fetch("aa01", tmp_path / "fetched.png")
+    assert not cache.fetch("bb02", tmp_path / "fetched.png")
+    assert cache.fetch("cc03", tmp_path / "fetched.png")
+
+
+def test_image_cache_only_scans_directory_when_size_exceeds_budget(tmp_path, monkeypatch):
+    evictions = []
+    evict = ImageCache.evict
+
+    def counting_evict(cache: ImageCache) -> None:
+        evictions.append(cache)
+        evict(cache)
+
+    monkeypatch.setattr(ImageCache, "evict", counting_evict)
+    cache = ImageCache(tmp_path / "cache", max_bytes=1000)
+    image = tmp_path / "image.png"
+    image.write_bytes(b"x" * 100)
+
+    for i in range(9):
+        cache.store(f"{i:04d}", image)
+    assert len(evictions) == 1  # only to record the size of the new cache
+    assert cache._read_size() == 900
+
+    # The 11th image exceeds the budget, after which the cache is reduced to 900 bytes again
+    for i in range(9, 12):
+        cache.store(f"{i:04d}", image)
+    assert len(evictions) == 2
+    assert cache._read_size() == sum(path.stat().st_size for path in (tmp_path / "cache").glob("*/*")) == 1000
+
+
+def test_plot_orbital_with_amsview_uses_cache(stand_in_amsview, tmp_path, input_file):
+    cache = ImageCache(tmp_path / "cache")
+    out_dir = tmp_path / "images"
+    out_dir.mkdir()
+
+    plot_orbital_with_amsview(input_file, "SFO_A_1", plot_settings, save_file=out_dir / "first.png", image_cache=cache)
+    plot_orbital_with_amsview(input_file, "SFO_A_1", plot_settings, save_file=out_dir / "second.png", image_cache=cache)
+    plot_orbital_with_amsview(input_file, "SFO_A_1", AMSViewPlotSettings(print_command=False, zoom=1.0), save_file=out_dir / "third.png", image_cache=cache)
+
+    assert (out_dir / "second.png").read_text() == "SFO_A_1"
+    assert (out_dir / "calls.log").read_text().split() == ["SFO_A_1", "SFO_A_1"]  # the second image is taken from the cache
+
+
+def test_render_queue_uses_cache(stand_in_amsview, tmp_path, input_file):
+    cache = ImageCache(tmp_path / "cache")
+    out_dir = tmp_path / "images"
+    out_dir.mkdir()
+    jobs = [RenderJob(input_file, label, plot_settings, out_dir / label) for label in ["SFO_A_1", "SFO_A_2"]]
+
+    first_results = render_orbitals(jobs, image_cache=cache)
+    (out_dir / "SFO_A_1.png").unlink()
+    second_results = render_orbitals(jobs, image_cache=cache)
+
+    assert [result.attempts for result in first_results] == [1, 1]
+    assert [result.attempts for result in second_results] == [0, 0]
+    assert (out_dir / "SFO_A_1.png").read_text() == "SFO_A_1"
+    assert sorted((out_dir / "calls.log").read_text().split()) == ["SFO_A_1", "SFO_A_2"]
+
+
+def test_render_orbitals_without_cache_when_none_is_passed(stand_in_amsview, tmp_path, input_file):
+    out_dir = tmp_path / "images"
+    out_dir.mkdir()
+    jobs = [RenderJob(input_file, "SFO_A_1", plot_settings, out_dir / "SFO_A_1")]
+
+    with config_override(image_cache={"enabled": True, "directory": str(tmp_path / "default_cache")}):
+        render_orbitals(jobs)
+        render_orbitals(jobs, image_cache=None)
+
+    assert (out_dir / "calls.log").read_text().split() == ["SFO_A_1", "SFO_A_1"]  # None does not fall back to the default cache
+    assert any((tmp_path / "default_cache").glob("*/*"))
@@ -0,0 +1,54 @@
+"""
+Testmodule that tests the cropped and downsampled reading of orbital images for the composites.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis.orbital.orbital import SFO
+from orb_visualization.plotter import combine_orb_images_with_matplotlib, combine_sfo_images_with_matplotlib, load_orbital_image
+from PIL import Image
+
+
+@pytest.fixture
+def orbital_image(tmp_path) -> pl.Path:
+    """A white 400x200 image with a red rectangle (the "orbital") from x=150-250 and y=60-140."""
+    pixels = np.full((200, 400, 3), 255, dtype=np.uint8)
+    pixels[60:140, 150:250] = [255, 0, 0]
+    image_path = tmp_path / "orbital.png"
+    Image.fromarray(pixels).save(image_path)
+    return image_path
+
+
+def test_load_orbital_image_crops_while_reading(orbital_image):
+    center = load_orbital_image(orbital_image, max_size=None)
+    auto = load_orbital_image(orbital_image, crop="auto", max_size=None)
+    full = load_orbital_image(orbital_image, crop=None, max_size=None)
+
+    assert center.dtype == np.uint8
+    assert center.shape == (88, 176, 3)
+    assert auto.shape == (80, 100, 3) and (auto == [255, 0, 0]).all()
+    assert full.shape == (200, 400, 3)
+
+
+def test_load_orbital_image_downsamples(orbital_image):
+    assert load_orbital_image(orbital_image, crop=None, max_size=100).shape == (50, 100, 3)
+    assert load_orbital_image(orbital_image, crop="auto", max_size=1000).shape == (80, 100, 3)
+
+
+def test_load_orbital_image_auto_crop_uses_transparency(tmp_path):
+    pixels = np.zeros((50, 50, 4), dtype=np.uint8)
+    pixels[10:20, 5:45] = [0, 0, 255, 255]
+    Image.fromarray(pixels).save(tmp_path / "transparent.png")
+
+    assert load_orbital_image(tmp_path / "transparent.png", crop="auto").shape == (10, 40, 4)
+
+
+def test_combine_images(orbital_image, tmp_path):
+    sfos = [SFO(index=i, irrep="A", energy=-1.0 * i, occupation=2.0) for i in range(1, 6)]
+    combine_orb_images_with_matplotlib("system", sfos, [orbital_image] * len(sfos), tmp_path / "orbitals.png", crop="auto")
+    combine_sfo_images_with_matplotlib(sfos[0], orbital_image, sfos[1], orbital_image, tmp_path / "pair.png", overlap=0.1, energy_gap=1.0)
+
+    assert (tmp_path / "orbitals.png").is_file()
+    assert (tmp_path / "pair.png").is_file()
@@ -0,0 +1,48 @@
+"""
+Testmodule that tests the start-up time of the `orb_analysis` command with `python -X importtime`.
+
+The plotting (matplotlib, PIL), DataFrame (pandas, tabulate), plams and config (pydantic) dependencies, the benchmark suite and the batch analysis are imported only when they are used,
+such that the analysis of a calculation does not pay for them when the command starts.
+"""
+
+import os
+import pathlib as pl
+import subprocess
+import sys
+
+import orb_analysis
+
+# Cumulative import time of `orb_analysis.main` in microseconds. It was ~1.2 s before the plotting, DataFrame and plams imports were made lazy, ~0.35 s after,
+# and ~0.23 s since the config is loaded on first use. The budget leaves room for slower machines and can be overruled with the ORB_ANALYSIS_IMPORT_BUDGET_US environment variable.
+IMPORT_TIME_BUDGET_US = int(os.environ.get("ORB_ANALYSIS_IMPORT_BUDGET_US", 600_000))
+N_RUNS = 3  # the fastest run is compared to the budget, which filters out the noise of other processes
+
+LAZY_MODULES = ["matplotlib", "pandas", "tabulate", "scm.plams", "PIL", "pydantic", "pydantic_settings", "orb_visualization.plotter", "orb_analysis.benchmarks", "orb_analysis.analyzer.batch"]
+
+
+def get_import_times(module: str) -> dict[str, int]:
+    """Imports the module in a new interpreter and returns the cumulative import time (in microseconds) of each imported module as reported by `-X importtime`."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(pl.Path(orb_analysis.__file__).parents[1]), os.environ.get("PYTHONPATH", "")])}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, env=env, check=True)
+
+    import_times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time: [self us] | [cumulative us] | [module name indented by nesting]"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+def test_heavy_dependencies_are_not_imported_at_start_up():
+    import_times = get_import_times("orb_analysis.main")
+
+    assert "orb_analysis.main" in import_times
+    assert [module for module in import_times if any(module == lazy or module.startswith(f"{lazy}.") for lazy in LAZY_MODULES)] == []
+
+
+def test_import_time_budget():
+    import_time = min(get_import_times("orb_analysis.main")["orb_analysis.main"] for _ in range(N_RUNS))
+
+    assert import_time < IMPORT_TIME_BUDGET_US, f"Importing orb_analysis.main took {import_time / 1000:.0f} ms, the budget is {IMPORT_TIME_BUDGET_US / 1000:.0f} ms"
@@ -0,0 +1,48 @@
+"""
+Testmodule that tests the :IrrepArray: that stores the orbital properties (e.g. orbital energies) of all irreps in one buffer.
+"""
+
+import numpy as np
+import pytest
+from orb_analysis.custom_types import IrrepArray
+
+
+def test_from_labels_groups_values_by_irrep_in_order_of_appearance():
+    array = IrrepArray.from_labels([1.0, 2.0, 3.0, 4.0, 5.0], ["A1", "E1:1", "A1", "A2", "E1:1"])
+
+    assert array.irreps == ("A1", "E1:1", "A2")
+    assert list(array) == ["A1", "E1:1", "A2"]
+    assert np.array_equal(array["A1"], [1.0, 3.0])
+    assert np.array_equal(array["E1:1"], [2.0, 5.0])
+    assert np.array_equal(array.counts, [2, 2, 1])
+    assert np.array_equal(array.labels(), ["A1", "A1", "E1:1", "E1:1", "A2"])
+    assert np.shares_memory(array["A2"], array.data)
+
+
+def test_unrestricted_array_is_indexed_by_spin_and_irrep():
+    data = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    array = IrrepArray.from_labels(data, ["A1", "A2", "A1"], irreps=["A2", "A1"], spins=["A", "B"])
+
+    assert list(array) == ["A", "B"]
+    assert np.array_equal(array["B"]["A1"], [4.0, 6.0])
+    assert np.array_equal(array["A"]["A2"], [2.0])
+    assert np.array_equal(array.flat, [[2.0, 1.0, 3.0], [5.0, 4.0, 6.0]])
+    with pytest.raises(KeyError):
+        array["C"]
+
+
+
+@pytest.mark.parametrize("irreps", [["A2", "B1"], ["A1"], ["A2", "A1", "A1"]])
+def test_from_labels_rejects_irreps_that_do_not_match_the_labels(irreps):
+    with pytest.raises(ValueError):
+        IrrepArray.from_labels([1.0, 2.0, 3.0], ["A1", "A2", "A1"], irreps=irreps)
+
+
+def test_from_mapping_matches_dictionaries():
+    restricted = {"A1": np.array([1.0, 2.0]), "A2": np.array([3.0])}
+    unrestricted = {"A": restricted, "B": {"A1": np.array([4.0, 5.0]), "A2": np.array([6.0])}}
+
+    assert IrrepArray.from_mapping(restricted) == restricted
+    assert IrrepArray.from_mapping(unrestricted) == unrestricted
+    assert IrrepArray.from_mapping(unrestricted)["B"] == unrestricted["B"]
+    assert IrrepArray.from_mapping(restricted).with_data([2.0, 4.0, 6.0]) == {"A1": [2.0, 4.0], "A2": [6.0]}
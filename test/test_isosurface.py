@@ -0,0 +1,112 @@
+"""
+Testmodule that tests the headless isosurface renderer with a p-like orbital in a cube file.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis import config_override
+from orb_visualization import isosurface
+from orb_visualization.grid import read_cube_fields
+from orb_visualization.image_cache import ImageCache
+from orb_visualization.isosurface import NEGATIVE_COLOR, POSITIVE_COLOR, extract_isosurface, read_geometry, render_orbital_isosurface, render_orbitals_headless
+from orb_visualization.plotter import AMSViewPlotSettings
+from orb_visualization.render_queue import RenderJob
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+
+N_POINTS, SPACING = 41, 0.25  # grid from -5 to 5 bohr
+ISOVALUE = 0.05
+
+
+def p_orbital(coordinates: np.ndarray) -> np.ndarray:
+    """px-like orbital: positive at x > 0 and negative at x < 0."""
+    return coordinates[..., 0] * np.exp(-np.sum(coordinates**2, axis=-1) / 2)
+
+
+@pytest.fixture
+def cube_file(tmp_path) -> pl.Path:
+    axis = -5.0 + SPACING * np.arange(N_POINTS)
+    values = p_orbital(np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1))
+
+    header = ["comment", "comment", "    1   -5.0 -5.0 -5.0"]
+    header += [f"   {N_POINTS}   {SPACING} 0.0 0.0", f"   {N_POINTS}   0.0 {SPACING} 0.0", f"   {N_POINTS}   0.0 0.0 {SPACING}"]
+    header += ["    1    1.0    0.0 0.0 0.0"]
+    cube_file = tmp_path / "p_orbital.cube"
+    with open(cube_file, "w") as file:
+        file.write("\n".join(header) + "\n")
+        np.savetxt(file, values.reshape(-1, 1), fmt="%.8e")
+    return cube_file
+
+
+def test_extract_isosurface(cube_file):
+    field = read_cube_fields(cube_file)[0]
+    triangles = extract_isosurface(field.to_array(), ISOVALUE, field.grid)
+
+    assert triangles.shape[1:] == (3, 3) and len(triangles) > 1000
+    # The vertices are interpolated on the edges of the grid, so they are close to the isosurface and on the positive side of the orbital
+    assert np.allclose(p_orbital(triangles), ISOVALUE, atol=0.02)
+    assert (triangles[..., 0] > 0).all()
+
+
+def test_render_orbital_isosurface(cube_file, tmp_path):
+    plot_settings = AMSViewPlotSettings(scmgeometry="200x100", zoom=2.0, viewplane="0 0 1", transparent=False, print_command=False)
+    image = np.asarray(render_orbital_isosurface(cube_file, None, plot_settings, tmp_path / "orbital.png", image_cache=ImageCache(tmp_path / "cache")))
+
+    assert image.shape == (100, 200, 3)
+    assert (tmp_path / "orbital.png").is_file()
+
+    # Looking along z, the positive lobe is on the right and the negative lobe on the left
+    def is_shade_of(color):
+        return (np.argmax(image, axis=2) == np.argmax(color)) & (image.min(axis=2) < 200)
+
+    assert is_shade_of(POSITIVE_COLOR)[:, 100:].sum() > 100 and is_shade_of(POSITIVE_COLOR)[:, :100].sum() == 0
+    assert is_shade_of(NEGATIVE_COLOR)[:, :100].sum() > 100 and is_shade_of(NEGATIVE_COLOR)[:, 100:].sum() == 0
+
+
+def test_meshes_and_images_are_cached(cube_file, tmp_path, monkeypatch):
+    image_cache = ImageCache(tmp_path / "cache")
+    plot_settings = AMSViewPlotSettings(scmgeometry="100x100", print_command=False)
+    render_orbital_isosurface(cube_file, None, plot_settings, tmp_path / "first.png", image_cache=image_cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the isosurface should be taken from the cache")
+
+    monkeypatch.setattr(isosurface, "extract_isosurface", fail)
+    cached_image = render_orbital_isosurface(cube_file, None, plot_settings, tmp_path / "same_image.png", image_cache=image_cache)
+    render_orbital_isosurface(cube_file, None, AMSViewPlotSettings(scmgeometry="100x100", viewplane="1 0 0", print_command=False), tmp_path / "same_mesh.png", image_cache=image_cache)
+
+    assert (tmp_path / "same_image.png").read_bytes() == (tmp_path / "first.png").read_bytes()
+    assert (tmp_path / "same_mesh.png").is_file()
+    assert cached_image.size == (100, 100) and getattr(cached_image, "fp", None) is None  # the cached image is loaded and its file is closed
+
+
+@config_override(image_cache={"enabled": False})
+def test_save_file_gets_png_suffix_without_cache(cube_file, tmp_path):
+    plot_settings = AMSViewPlotSettings(scmgeometry="100x100", print_command=False)
+    jobs = [RenderJob(cube_file, None, plot_settings, tmp_path / "orbital")]
+
+    assert render_orbitals_headless(jobs, max_workers=1) == [tmp_path / "orbital.png"]
+    assert (tmp_path / "orbital.png").is_file()
+
+
+def test_coarse_preview_and_parallel_rendering(cube_file, tmp_path):
+    settings = AMSViewPlotSettings(scmgeometry="100x100", print_command=False)
+    preview = AMSViewPlotSettings(scmgeometry="100x100", grid="Coarse", print_command=False)
+    jobs = [RenderJob(cube_file, None, settings, tmp_path / "full.png"), RenderJob(cube_file, None, preview, tmp_path / "preview.png")]
+
+    assert render_orbitals_headless(jobs, max_workers=2, image_cache=ImageCache(tmp_path / "cache")) == [tmp_path / "full.png", tmp_path / "preview.png"]
+    full, coarse = (isosurface.get_isosurfaces(cube_file, None, ISOVALUE, decimation)[0] for decimation in [1, 2])
+    assert len(coarse) < len(full) / 2
+
+
+def test_read_geometry():
+    symbols, coordinates = read_geometry(restricted_largecore_fragsym_c3v)
+
+    assert symbols == ["As", "H", "H", "H", "Ga", "Cl", "Cl", "Cl"]
+    assert coordinates.shape == (8, 3)
+    assert read_geometry(restricted_largecore_fragsym_c3v.with_suffix(".missing")) == ([], pytest.approx(np.empty((0, 3))))
@@ -0,0 +1,57 @@
+"""
+Testmodule that tests the lazy mode of `create_calc_analyser` in which the complex, fragments and spins are only read on first access.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.complex.complex import Complex
+from orb_analysis.custom_types import LazySpinArray
+from orb_analysis.fragment.fragment import Fragment
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+restricted_largecore_nofragsym_nosym = fixtures_dir / "restricted_largecore_nofragsym_nosym_full.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+
+@pytest.mark.parametrize("rkf_path", [restricted_largecore_fragsym_c3v, restricted_largecore_nofragsym_nosym])
+def test_lazy_analyzer_matches_eager_analyzer(rkf_path):
+    eager_analyzer = create_calc_analyser(rkf_path)
+    lazy_analyzer = create_calc_analyser(rkf_path, lazy=True)
+
+    assert lazy_analyzer(orb_range=(5, 5)) == eager_analyzer(orb_range=(5, 5))
+
+
+def test_lazy_analyzer_does_not_read_the_complex_for_sfos():
+    analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v, lazy=True)
+    assert not any(isinstance(fragment, Fragment) for fragment in analyzer._fragments)
+
+    analyzer.get_sfo_orbitals((3, 3), (3, 3))
+
+    assert all(isinstance(fragment, Fragment) for fragment in analyzer._fragments)
+    assert not isinstance(analyzer._complex, Complex)
+
+
+def test_lazy_spin_array_loads_each_spin_once():
+    n_calls = {"A": 0, "B": 0}
+
+    def loader(spin):
+        n_calls[spin] += 1
+        return {"A1": np.array([1.0, 2.0]), "A2": np.array([3.0])}
+
+    array = LazySpinArray({"A": lambda: loader("A"), "B": lambda: loader("B")})
+    array["B"]["A1"]
+    array["B"]["A2"]
+
+    assert list(array) == ["A", "B"]
+    assert array.loaded_spins == ["B"]
+    assert n_calls == {"A": 0, "B": 1}
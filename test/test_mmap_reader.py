@@ -0,0 +1,81 @@
+"""
+Testmodule that tests the :MemoryMappedKFFile: against the plams :KFFile: for the sections that are used by the package.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile, open_kf_file
+from scm.plams import KFFile
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+restricted_largecore_nofragsym_nosym = fixtures_dir / "restricted_largecore_nofragsym_nosym_full.adf.rkf"
+
+HOT_VARIABLES = [
+    ("General", "nspin"),
+    ("Symmetry", "grouplabel"),
+    ("Symmetry", "symlab"),
+    ("Symmetry", "ncbs"),
+    ("SFOs", "number"),
+    ("SFOs", "fragment"),
+    ("SFOs", "subspecies"),
+    ("SFOs", "isfo"),
+    ("SFOs", "escale"),
+    ("SFOs", "occupation"),
+    ("SFO popul", "sfo_grosspop"),
+]
+
+
+@pytest.mark.parametrize("rkf_path", [restricted_largecore_fragsym_c3v, restricted_largecore_nofragsym_nosym])
+def test_mmap_reader_matches_kffile(rkf_path):
+    kf_file = KFFile(str(rkf_path))
+    mmap_file = MemoryMappedKFFile(rkf_path)
+    irreps = kf_file.read("Symmetry", "symlab").split()  # type: ignore
+    irrep_variables = [(irrep, variable) for irrep in irreps for variable in ["escale_A", "eps_A", "froc_A", "nmo_A", "S-CoreSFO"]]
+
+    assert mmap_file.sections() == kf_file.sections()
+    for section, variable in HOT_VARIABLES + irrep_variables:
+        expected = kf_file.read(section, variable)
+        if isinstance(expected, list):
+            assert np.array_equal(mmap_file.read(section, variable), np.array(expected))
+        else:
+            assert mmap_file.read(section, variable) == expected
+
+
+def test_mmap_reader_returns_views_for_single_block_variables():
+    mmap_file = MemoryMappedKFFile(restricted_largecore_fragsym_c3v)
+    escale = mmap_file.read("SFOs", "escale")
+
+    assert isinstance(escale, np.ndarray)
+    assert not escale.flags.owndata
+    assert not escale.flags.writeable
+
+
+def test_mmap_reader_contains_does_not_require_reading():
+    mmap_file = MemoryMappedKFFile(restricted_largecore_fragsym_c3v)
+
+    assert ("SFOs", "escale") in mmap_file
+    assert ("SFOs", "escale_B") not in mmap_file
+    assert "SFO popul" in mmap_file
+
+
+def test_open_kf_file_falls_back_to_kffile(tmp_path):
+    not_a_kf_file = tmp_path / "adf.rkf"
+    not_a_kf_file.write_bytes(b"this is not a KF file" * 10)
+
+    assert isinstance(open_kf_file(restricted_largecore_fragsym_c3v), MemoryMappedKFFile)
+    assert isinstance(open_kf_file(restricted_largecore_fragsym_c3v, memory_map=False), KFFile)
+    assert isinstance(open_kf_file(not_a_kf_file), KFFile)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 500, 4096, 10**6])
+def test_mmap_reader_iter_chunks(chunk_size):
+    mmap_file = MemoryMappedKFFile(restricted_largecore_fragsym_c3v)
+    chunks = list(mmap_file.iter_chunks("Fragments", "Pmat_SumFrag", chunk_size))  # a variable that spans multiple data blocks
+
+    assert all(chunk.size == chunk_size for chunk in chunks[:-1])
+    assert np.array_equal(np.concatenate(chunks), mmap_file.read("Fragments", "Pmat_SumFrag"))
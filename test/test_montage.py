@@ -0,0 +1,51 @@
+"""
+Testmodule that tests the NumPy montage compositor for large sets of orbital images.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis.orbital.orbital import SFO
+from orb_visualization.montage import create_orbital_montage
+from PIL import Image
+
+
+@pytest.fixture
+def orbital_image(tmp_path) -> pl.Path:
+    """A transparent 200x200 image with a red square (the "orbital") in the centre."""
+    pixels = np.zeros((200, 200, 4), dtype=np.uint8)
+    pixels[80:120, 80:120] = [255, 0, 0, 255]
+    image_path = tmp_path / "orbital.png"
+    Image.fromarray(pixels).save(image_path)
+    return image_path
+
+
+def test_orbital_montage_layout(orbital_image, tmp_path):
+    sfos = [SFO(index=i, irrep="A", energy=-1.0 * i, occupation=2.0) for i in range(1, 6)]
+    pages = create_orbital_montage("system", sfos, [orbital_image] * 5, tmp_path / "montage", tile_size=100, crop="auto", font_size=10)
+
+    assert pages == [tmp_path / "montage.png"]
+    montage = np.asarray(Image.open(pages[0]))
+    header_height, cell_height = 2 * 12, (3 * 12 + 6) + 100
+
+    assert montage.shape == (header_height + 2 * cell_height, 4 * 100, 3)
+    # The fifth orbital is in the first column of the second row, the last three cells of that row are empty
+    second_row_images = montage[header_height + cell_height + 42 :, :]
+    assert (second_row_images[:, :100] == [255, 0, 0]).all(axis=2).any()
+    assert (second_row_images[:, 100:] == 255).all()
+    # The labels are rasterized above the images
+    assert (montage[header_height : header_height + 42, :100] != 255).any()
+
+
+def test_orbital_montage_pagination(orbital_image, tmp_path):
+    sfos = [SFO(index=i, irrep="A", energy=-1.0 * i, occupation=2.0) for i in range(1, 11)]
+    pages = create_orbital_montage("system", sfos, [orbital_image] * 10, tmp_path / "montage.png", tile_size=50, max_orbitals_per_page=8)
+
+    assert pages == [tmp_path / "montage_page1.png", tmp_path / "montage_page2.png"]
+    assert [Image.open(page).size[1] for page in pages] == [2 * 25 + 2 * (3 * 25 + 12 + 50), 2 * 25 + 1 * (3 * 25 + 12 + 50)]
+
+
+def test_orbital_montage_requires_an_image_per_orbital(orbital_image, tmp_path):
+    with pytest.raises(ValueError):
+        create_orbital_montage("system", [SFO(index=1, irrep="A")], [orbital_image] * 2, tmp_path / "montage.png")
@@ -0,0 +1,50 @@
+"""
+Testmodule that tests the :OverlapTriangleCache: that is owned by the CalcAnalyzer and stores the decoded overlap matrices per irrep and spin.
+"""
+
+import pathlib as pl
+
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+
+def test_repeated_overlap_queries_hit_the_cache():
+    analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v)
+    first_overlap = analyzer.get_sfo_overlap("2_A1", "4_A1")
+    second_overlap = analyzer.get_sfo_overlap("2_A1", "3_A1")
+
+    assert first_overlap == pytest.approx(-0.4093, abs=1e-3)
+    assert second_overlap == analyzer.get_sfo_overlap("2_A1", "3_A1")
+    assert analyzer.overlap_cache.misses == 1
+    assert analyzer.overlap_cache.hits == 2
+    assert analyzer.overlap_cache.nbytes > 0
+
+
+def test_overlap_cache_respects_memory_budget():
+    analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v)
+    triangle_a1 = analyzer.overlap_cache.get("A1")
+    analyzer.overlap_cache.max_bytes = triangle_a1.nbytes
+    analyzer.overlap_cache.get("A2")
+
+    assert analyzer.overlap_cache.evictions == 1
+    assert analyzer.overlap_cache.nbytes <= analyzer.overlap_cache.max_bytes
+    assert analyzer.overlap_cache.stats["n_triangles"] == 1
+
+
+def test_overlap_cache_does_not_store_triangles_over_budget():
+    analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v, overlap_cache_max_bytes=0)
+    analyzer.get_sfo_overlap("2_A1", "4_A1")
+    analyzer.get_sfo_overlap("2_A1", "4_A1")
+
+    assert analyzer.overlap_cache.misses == 2
+    assert analyzer.overlap_cache.nbytes == 0
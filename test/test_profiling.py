@@ -0,0 +1,70 @@
+"""
+Testmodule that tests the profiling of the stages of the analysis, the `--profile` option of the `orb_analysis` command and the deduplicated logger.
+"""
+
+import json
+import logging
+import pathlib as pl
+import sys
+
+from orb_analysis import config_override, profiling
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.log_messages import duplicate_message_filter, logger
+from orb_analysis.main import main
+from orb_analysis.profiling import profile, profiled, span
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+
+
+def test_spans_are_disabled_by_default():
+    @profiled("double")
+    def double(value: int) -> int:
+        return 2 * value
+
+    assert profiling._profiler is None
+    assert span("stage") is span("other stage")  # one shared object that does nothing
+    assert double(2) == 4
+
+
+def test_profile_analysis():
+    with config_override(rkf_reading={"memory_map": True}):
+        with profile() as profiler:
+            analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v)
+            str(analyzer.get_sfo_orbitals((3, 3), (3, 3)))
+            with span("stage"), span("nested stage"):
+                pass
+
+    stages = profiler.to_dict()["stages"]
+    assert stages["create_calc_analyser"]["calls"] == 1
+    assert stages["create_calc_analyser/fragment"]["calls"] == 2
+    assert stages["create_calc_analyser/fragment/gross populations"]["bytes_read"] > 0
+    assert stages["create_calc_analyser"]["bytes_read"] >= stages["create_calc_analyser/calc info"]["bytes_read"] > 0
+    assert stages["get_sfo_orbitals/overlap matrix"]["bytes_read"] > 0
+    assert stages["sfo report/interaction matrix table"]["calls"] == 3
+    assert "stage/nested stage" in stages
+    assert profiler.total_time >= stages["create_calc_analyser"]["wall_time"] > 0
+    assert "  gross populations" in profiler.format_table()
+    assert profiling._profiler is None
+
+
+def test_cli_profile(tmp_path, monkeypatch):
+    profile_file, output_file = tmp_path / "profile.json", tmp_path / "analysis.txt"
+    monkeypatch.setattr(sys, "argv", ["orb_analysis", "--file", str(restricted_largecore_fragsym_c3v), "--output_file", str(output_file), "--profile", str(profile_file)])
+    main()
+
+    breakdown = json.loads(profile_file.read_text())
+    assert output_file.is_file()
+    assert {"create_calc_analyser", "get_sfo_orbitals", "get_mo_orbitals", "sfo report", "mo report", "write report"} <= set(breakdown["stages"])
+
+
+def test_logger_deduplicates_messages(caplog):
+    duplicate_message_filter.reset()
+    with caplog.at_level(logging.WARNING, logger="orb_analysis"):
+        for _ in range(3):
+            logger.warning("Could not find the key site-energies")
+        logger.warning("Could not find the key escale")
+
+    assert [record.getMessage() for record in caplog.records] == ["Could not find the key site-energies", "Could not find the key escale"]
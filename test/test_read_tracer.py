@@ -0,0 +1,77 @@
+"""
+Testmodule that tests the KF read tracer and the read budgets of building an analyzer and computing the overlap matrix.
+"""
+
+import pathlib as pl
+import pickle
+
+import pytest
+from orb_analysis import config_override
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.profiling import profile
+from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile, open_kf_file
+from orb_analysis.rkf_reading.read_tracer import ReadBudgetExceeded, TracedKFFile, trace_kf_reads
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+restricted_largecore_nofragsym_nosym = fixtures_dir / "restricted_largecore_nofragsym_nosym_full.adf.rkf"
+
+
+@pytest.fixture(autouse=True)
+def memory_mapped_reading():
+    with config_override(rkf_reading={"memory_map": True}):
+        yield
+
+
+@pytest.mark.parametrize("rkf_file", [restricted_largecore_fragsym_c3v, restricted_largecore_nofragsym_nosym])
+def test_read_budget_of_restricted_analyzer(rkf_file):
+    with trace_kf_reads() as trace:
+        analyzer = create_calc_analyser(rkf_file)
+        trace.assert_budget({"SFOs/subspecies": 1, "*": 1})
+
+        # A 10x10 overlap window (and single overlaps afterwards) decodes the overlap triangle of each irrep once
+        sfo_manager = analyzer.get_sfo_orbitals((5, 5), (5, 5))
+        analyzer.get_sfo_overlap(sfo_manager.frag1_sfos[0], sfo_manager.frag2_sfos[-1])
+
+    assert sfo_manager.overlap_matrix.size >= 81
+    trace.assert_budget({"*/S-CoreSFO": 1, "*": 1})
+    assert trace.count(sfo_manager.frag1_sfos[0].irrep if analyzer.calc_info.symmetry else "A", "S-CoreSFO") == 1
+
+
+def test_budget_violations_and_summary():
+    with trace_kf_reads() as trace, profile():
+        kf_file = open_kf_file(restricted_largecore_fragsym_c3v)
+        for _ in range(3):
+            kf_file.read("SFOs", "subspecies")
+        kf_file.read("General", "nspin")
+
+    assert isinstance(kf_file, TracedKFFile) and trace.duplicates() == {"SFOs/subspecies": 3}
+    assert trace.reads[0].caller == f"{__name__}.test_budget_violations_and_summary" and trace.reads[0].n_bytes > 0
+    assert trace.check_budget({"General/*": 1}) == []
+    with pytest.raises(ReadBudgetExceeded, match="SFOs/subspecies is read 3 times"):
+        trace.assert_budget({"SFOs/*": 2})
+    assert "SFOs/subspecies" in trace.format_summary(only_duplicates=True) and "General/nspin" not in trace.format_summary(only_duplicates=True)
+
+
+def test_reads_are_traced_only_within_the_context():
+    with trace_kf_reads() as trace:
+        pass
+    kf_file = open_kf_file(restricted_largecore_fragsym_c3v)
+
+    assert isinstance(kf_file, MemoryMappedKFFile) and trace.reads == []
+    traced_file = trace.wrap(kf_file)
+    assert traced_file.sections() == kf_file.sections() and ("SFOs", "subspecies") in traced_file
+    assert trace.reads == []
+
+
+def test_traced_file_can_be_iterated_and_pickled():
+    with trace_kf_reads() as trace:
+        traced_file = open_kf_file(restricted_largecore_fragsym_c3v)
+        assert list(traced_file) == list(MemoryMappedKFFile(restricted_largecore_fragsym_c3v))
+        assert isinstance(pickle.loads(pickle.dumps(traced_file)), TracedKFFile)
+
+    unpickled_file = pickle.loads(pickle.dumps(traced_file))
+    assert isinstance(unpickled_file, MemoryMappedKFFile) and unpickled_file.sections() == traced_file.sections()
+    assert trace.reads == []
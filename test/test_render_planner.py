@@ -0,0 +1,70 @@
+"""
+Testmodule that tests the render planner that renders each orbital image once for many orbital pairs.
+"""
+
+import pathlib as pl
+
+import matplotlib.image as mpimg
+import numpy as np
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_visualization.image_cache import ImageCache
+from orb_visualization.plotter import AMSViewPlotSettings
+from orb_visualization.render_planner import _get_system_name, execute_render_plan, plan_pair_renders
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+# Stand-in for amsview: copies the image in $STAND_IN_IMAGE to the -save file and appends the label to $STAND_IN_LOG
+STAND_IN_AMSVIEW = """
+import os
+import shutil
+import sys
+
+args = sys.argv[1:]
+shutil.copyfile(os.environ["STAND_IN_IMAGE"], args[args.index("-save") + 1])
+with open(os.environ["STAND_IN_LOG"], "a") as log:
+    log.write(args[args.index("-var") + 1] + "\\n")
+"""
+
+
+@pytest.fixture
+def amsview_log(install_stand_in, tmp_path, monkeypatch) -> pl.Path:
+    install_stand_in("amsview", STAND_IN_AMSVIEW)
+
+    image = tmp_path / "image.png"
+    mpimg.imsave(image, np.random.default_rng(0).random((20, 20, 3)))
+    monkeypatch.setenv("STAND_IN_IMAGE", str(image))
+    monkeypatch.setenv("STAND_IN_LOG", str(tmp_path / "calls.log"))
+    return tmp_path / "calls.log"
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_render_plan_renders_each_orbital_once(amsview_log, tmp_path, max_workers):
+    sfo_manager = create_calc_analyser(restricted_largecore_fragsym_c3v).get_sfo_orbitals((3, 3), (3, 3))
+    pairs = sfo_manager.get_most_destabilizing_pauli_pairs(4) + sfo_manager.get_most_stabilizing_oi_pairs(4)
+    unique_sfos = {sfo.plot_label for pair in pairs for sfo in [pair.sfo1, pair.sfo2]}
+
+    # The second system is the same file with the SFOManager instead of the pairs, so its images and composites are shared with the first system
+    plan = plan_pair_renders([(restricted_largecore_fragsym_c3v, pairs), (restricted_largecore_fragsym_c3v, sfo_manager)], tmp_path / "output", AMSViewPlotSettings(print_command=False))
+    composites = execute_render_plan(plan, max_workers=max_workers, image_cache=ImageCache(tmp_path / "cache"))
+
+    assert len(plan.images) == len(unique_sfos)
+    assert len(composites) == len(pairs)
+    assert sorted(amsview_log.read_text().split()) == sorted(unique_sfos)
+    assert all(composite.is_file() for composite in composites)
+
+
+def test_system_names_of_runs_with_the_same_directory_name_differ(tmp_path):
+    first, second = tmp_path / "run1" / "NH3-BH3" / "adf.rkf", tmp_path / "run2" / "NH3-BH3" / "adf.rkf"
+
+    assert _get_system_name(first) != _get_system_name(second)
+    assert _get_system_name(first) == _get_system_name(tmp_path / "run1" / "NH3-BH3" / ".." / "NH3-BH3" / "adf.rkf")
+    assert _get_system_name(first).startswith("NH3-BH3_adf_")
@@ -0,0 +1,98 @@
+"""
+Testmodule that tests the :RenderQueue: against a stand-in amsview executable on the PATH.
+"""
+
+import pathlib as pl
+import time
+from types import SimpleNamespace
+
+import pytest
+from orb_analysis import config_override
+from orb_analysis.orbital.orbital_pair import OrbitalPair
+from orb_visualization import plotter
+from orb_visualization.plotter import AMSViewPlotSettings
+from orb_visualization.render_queue import RenderError, RenderJob, RenderQueue, render_orbitals
+
+# Stand-in for amsview: writes the -save file after sleeping for the number of seconds in "[label].sleep" (if present)
+# and fails while "[label].failures" contains a positive number, which is decreased on every failed attempt
+STAND_IN_AMSVIEW = """
+import pathlib as pl
+import sys
+import time
+
+args = sys.argv[1:]
+label = args[args.index("-var") + 1]
+save_file = pl.Path(args[args.index("-save") + 1])
+sleep_file = save_file.parent / f"{label}.sleep"
+failures_file = save_file.parent / f"{label}.failures"
+
+if sleep_file.exists():
+    time.sleep(float(sleep_file.read_text()))
+if failures_file.exists() and int(failures_file.read_text()) > 0:
+    failures_file.write_text(str(int(failures_file.read_text()) - 1))
+    sys.stderr.write(f"cannot render {label}")
+    sys.exit(3)
+save_file.write_text(label)
+"""
+
+plot_settings = AMSViewPlotSettings(print_command=False)
+
+
+@pytest.fixture
+def stand_in_amsview(install_stand_in) -> pl.Path:
+    return install_stand_in("amsview", STAND_IN_AMSVIEW)
+
+
+def test_render_queue_runs_jobs_concurrently(stand_in_amsview, tmp_path):
+    labels = [f"SFO_A_{i}" for i in range(1, 5)]
+    for label in labels:
+        (tmp_path / f"{label}.sleep").write_text("0.5")
+
+    start = time.perf_counter()
+    results = render_orbitals([RenderJob("result.t41", label, plot_settings, tmp_path / label) for label in labels], max_concurrency=4)
+
+    assert time.perf_counter() - start < 1.5
+    assert all(result.ok and result.attempts == 1 for result in results)
+    assert [(tmp_path / f"{label}.png").read_text() for label in labels] == labels
+
+
+def test_render_queue_retries_and_captures_stderr(stand_in_amsview, tmp_path):
+    (tmp_path / "SFO_A_1.failures").write_text("1")
+    (tmp_path / "SFO_A_2.failures").write_text("5")
+
+    with RenderQueue(max_concurrency=2, retries=1) as queue:
+        futures = queue.submit_many(RenderJob("result.t41", label, plot_settings, tmp_path / label) for label in ["SFO_A_1", "SFO_A_2"])
+
+    assert futures[0].result().attempts == 2
+    with pytest.raises(RenderError) as error:
+        futures[1].result()
+    assert error.value.result.returncode == 3
+    assert error.value.result.stderr == "cannot render SFO_A_2"
+
+
+def test_render_queue_times_out(stand_in_amsview, tmp_path):
+    (tmp_path / "SFO_A_1.sleep").write_text("10")
+
+    with RenderQueue(timeout=0.5, retries=0) as queue:
+        future = queue.submit(RenderJob("result.t41", "SFO_A_1", plot_settings, tmp_path / "SFO_A_1"))
+
+    with pytest.raises(RenderError) as error:
+        future.result()
+    assert error.value.result.timed_out
+
+
+@config_override(image_cache={"enabled": False})
+def test_orbital_pair_plot_skips_existing_images(stand_in_amsview, tmp_path, monkeypatch):
+    monkeypatch.setattr(plotter, "combine_sfo_images_with_matplotlib", lambda **kwargs: None)
+    sfo1, sfo2 = (SimpleNamespace(irrep="A", index=index, plot_label=f"SFO_A_{index}", amsview_label=f"A_{index}", energy=-1.0, is_fully_occupied=True) for index in [1, 2])
+    (tmp_path / "A_1.png").write_text("existing image")
+
+    OrbitalPair(sfo1, sfo2, 0.1).plot("result.t41", tmp_path, plot_settings)  # type: ignore # stand-ins for the SFOs
+
+    assert (tmp_path / "A_1.png").read_text() == "existing image"
+    assert (tmp_path / "A_2.png").read_text() == "SFO_A_2"
+
+    (tmp_path / "A_2.png").unlink()
+    (tmp_path / "SFO_A_2.failures").write_text("5")
+    with pytest.raises(RenderError):
+        OrbitalPair(sfo1, sfo2, 0.1).plot("result.t41", tmp_path, plot_settings)  # type: ignore # stand-ins for the SFOs
@@ -300,6 +300,16 @@ def test_get_sfo_overlap_restricted_largecore_nosym(calc_analyzer_restricted_lar
     assert homo_homo_overlap == pytest.approx(0.2469, abs=1e-3)
 
 
+
+@pytest.mark.parametrize("analyzer_fixture", ["calc_analyzer_restricted_largecore_fragsym_c3v", "calc_analyzer_restricted_largecore_nosym"])
+def test_get_sfo_orbitals_overlap_matrix_matches_point_overlaps(analyzer_fixture, request):
+    """Tests that the overlap matrix built by `get_sfo_orbitals` is identical to calling `get_sfo_overlap` for every SFO pair."""
+    analyzer: CalcAnalyzer = request.getfixturevalue(analyzer_fixture)
+    sfo_manager = analyzer.get_sfo_orbitals((10, 10), (10, 10))
+    for i, frag1_sfo in enumerate(sfo_manager.frag1_sfos):
+        for j, frag2_sfo in enumerate(sfo_manager.frag2_sfos):
+            assert sfo_manager.overlap_matrix[i, j] == analyzer.get_sfo_overlap(frag1_sfo, frag2_sfo)
+
 # NOT WORKING YET
 # def test_get_sfo_overlap_restricted_largecore_differentfragsym_c4v(calc_analyzer_restricted_largecore_differentfragsym_c4v):
 #     """ Tests the `get_sfo_overlap` method for a restricted, no frozen core, fragment symmetry, c3v complex symmetry calculation."""
@@ -2,7 +2,9 @@
 Testmodule that tests low level the sfo orbital functions.
 """
 
+import gc
 import pathlib as pl
+import weakref
 
 from orb_analysis import orb_config
 from orb_analysis.orb_functions.sfo_functions import (
@@ -11,6 +13,8 @@ from orb_analysis.orb_functions.sfo_functions import (
     get_number_sfos_per_irrep_per_frag,
     get_ordered_irreps_of_one_frag,
     get_sfo_indices_of_one_frag,
+    get_sfo_section_index,
+    get_symmetry_index,
     uses_symmetry,
 )
 from scm.plams import KFFile
@@ -258,4 +262,46 @@ def test_get_number_sfos_per_irrep_per_frag():
     assert len(n_sfos_per_irrep_nosym.keys()) == 1
 
 
+def test_sfo_section_index_is_created_once_per_kf_file():
+    kf_file = KFFile(restricted_largecore_fragsym_c3v)
+    sfo_index = get_sfo_section_index(kf_file)
+
+    assert get_sfo_section_index(kf_file) is sfo_index
+    assert sfo_index.n_sfos == len(sfo_index.fragment) == len(sfo_index.irreps) == len(sfo_index.isfo)
+    assert sfo_index.energy_variables == {"A": "escale", "B": "escale"}
+    assert sfo_index.occupation_variables == {"A": "occupation", "B": "occupation"}
+    assert sfo_index.read(kf_file, "SFOs", "occupation") is sfo_index.read(kf_file, "SFOs", "occupation")
+
+
+def test_symmetry_index_is_shared_by_sfo_section_index():
+    kf_file = KFFile(restricted_largecore_fragsym_c3v)
+    symmetry_index = get_symmetry_index(kf_file)
+
+    assert get_symmetry_index(kf_file) is symmetry_index
+    assert symmetry_index.symmetry and "A1" in symmetry_index.symlab and len(symmetry_index.symlab) == len(symmetry_index.ncbs)
+    assert get_sfo_section_index(kf_file).ncbs is symmetry_index.ncbs
+
+
+def test_sfo_section_index_is_released_with_kf_file():
+    kf_file = KFFile(restricted_largecore_fragsym_c3v)
+    get_sfo_section_index(kf_file)
+    kf_file_ref = weakref.ref(kf_file)
+
+    del kf_file
+    gc.collect()
+    assert kf_file_ref() is None
+
+
+def test_sfo_section_index_frozen_core_shifts():
+    kf_file_c3v = KFFile(restricted_largecore_fragsym_c3v)
+    kf_file_nosym = KFFile(restricted_largecore_nofragsym_nosym)
+    sfo_index_c3v = get_sfo_section_index(kf_file_c3v)
+    sfo_index_nosym = get_sfo_section_index(kf_file_nosym)
+
+    shifts_c3v = sfo_index_c3v.frozen_core_shifts({"A1": 30, "A2": 5})
+    assert set(shifts_c3v[sfo_index_c3v.irreps == "A1"]) == {30}
+    assert set(shifts_c3v[sfo_index_c3v.irreps == "E1:1"]) == {0}
+    assert set(sfo_index_nosym.frozen_core_shifts({"A": 12})) == {12}
+
+
 # ------------------------------------------------------------
@@ -0,0 +1,64 @@
+"""
+Testmodule that tests the sidecar file (adf.rkf.orbcache.npz) that stores the data of the analyzer next to the rkf file.
+"""
+
+import os
+import pathlib as pl
+import shutil
+
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.analyzer.sidecar import get_sidecar_path, load_analysis_sidecar
+from orb_analysis.rkf_reading.mmap_reader import open_kf_file
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+restricted_largecore_nofragsym_nosym = fixtures_dir / "restricted_largecore_nofragsym_nosym_full.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+
+@pytest.fixture
+def copied_rkf_file(tmp_path, request) -> pl.Path:
+    rkf_path = tmp_path / "calc" / "adf.rkf"
+    rkf_path.parent.mkdir()
+    shutil.copyfile(request.param, rkf_path)
+    return rkf_path
+
+
+@pytest.mark.parametrize("copied_rkf_file", [restricted_largecore_fragsym_c3v, restricted_largecore_nofragsym_nosym], indirect=True)
+def test_sidecar_analyzer_matches_rkf_analyzer(copied_rkf_file):
+    rkf_analyzer = create_calc_analyser(copied_rkf_file, use_sidecar=True)
+    assert get_sidecar_path(copied_rkf_file).is_file()
+
+    sidecar_analyzer = create_calc_analyser(copied_rkf_file, use_sidecar=True)
+    for attribute in ["restricted", "relativistic", "symmetry"]:
+        assert getattr(sidecar_analyzer.calc_info, attribute) == getattr(rkf_analyzer.calc_info, attribute)
+    assert [fragment.sfo_index_mapping for fragment in sidecar_analyzer.fragments] == [fragment.sfo_index_mapping for fragment in rkf_analyzer.fragments]
+    for orb_range in [(3, 3), (20, 20)]:
+        assert sidecar_analyzer(orb_range=orb_range) == rkf_analyzer(orb_range=orb_range)
+
+
+@pytest.mark.parametrize("copied_rkf_file", [restricted_largecore_fragsym_c3v], indirect=True)
+def test_sidecar_is_invalidated_when_rkf_file_changes(copied_rkf_file):
+    create_calc_analyser(copied_rkf_file, use_sidecar=True)
+    stat = copied_rkf_file.stat()
+    os.utime(copied_rkf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_analysis_sidecar(copied_rkf_file, open_kf_file(copied_rkf_file), "calc/adf", n_fragments=2) is None
+    assert not get_sidecar_path(copied_rkf_file).exists()
+
+
+@pytest.mark.parametrize("copied_rkf_file", [restricted_largecore_fragsym_c3v], indirect=True)
+def test_sidecar_is_invalidated_when_settings_change(copied_rkf_file):
+    create_calc_analyser(copied_rkf_file, use_sidecar=True)
+    orb_config.rkf_reading.orbital_energy_unit = "eV"
+    try:
+        assert load_analysis_sidecar(copied_rkf_file, open_kf_file(copied_rkf_file), "calc/adf", n_fragments=2) is None
+    finally:
+        orb_config.rkf_reading.orbital_energy_unit = "hartree"
@@ -0,0 +1,68 @@
+"""
+Testmodule that tests the pure-Python KF writer (`orb_analysis.rkf_reading.kf_writer`) and the synthetic fragment analysis rkf files (`orb_analysis.rkf_reading.synthetic_rkf`).
+"""
+
+import numpy as np
+import pytest
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.rkf_reading.kf_writer import KFWriteError, write_kf_file
+from orb_analysis.rkf_reading.mmap_reader import MemoryMappedKFFile
+from orb_analysis.rkf_reading.synthetic_rkf import SyntheticCalcSpec, create_synthetic_sections, write_synthetic_rkf
+from scm.plams import KFFile
+
+
+def test_written_kf_file_is_readable_by_both_readers(tmp_path):
+    # Enough sections for two superindex blocks and enough variables for two index blocks, with variables that span multiple data blocks
+    sections = {f"Section {i}": {"integer": i, "real": i / 2} for i in range(60)}
+    sections["Large"] = {"reals": np.linspace(0.0, 1.0, 5000), "integers": np.arange(3000), "labels": "A1".ljust(160) * 40, "flags": [True, False, True], **{f"n{i}": i for i in range(80)}}
+    kf_path = write_kf_file(tmp_path / "test.kf", sections)
+
+    for kf_file in [MemoryMappedKFFile(kf_path), KFFile(str(kf_path))]:
+        assert len(kf_file.sections()) == 61
+        assert np.allclose(kf_file.read("Large", "reals"), np.linspace(0.0, 1.0, 5000))
+        assert list(kf_file.read("Large", "integers")) == list(range(3000))
+        assert kf_file.read("Large", "labels").split() == ["A1"] * 40
+        assert list(kf_file.read("Large", "flags")) == [True, False, True]
+        assert kf_file.read("Large", "n79") == 79
+        assert kf_file.read("Section 59", "real") == 29.5
+
+    with pytest.raises(KFWriteError):
+        write_kf_file(tmp_path / "empty.kf", {"Section": {"empty": np.array([])}})
+
+
+def test_synthetic_restricted_sym_analysis(tmp_path):
+    spec = SyntheticCalcSpec(n_sfos_per_fragment=41, point_group="C(3V)", n_frozen_cores=(3, 1, 2, 2), seed=1)
+    sections = create_synthetic_sections(spec)
+    analyzer = create_calc_analyser(write_synthetic_rkf(tmp_path / "adf.rkf", spec))
+
+    assert analyzer.calc_info.restricted and analyzer.calc_info.symmetry and analyzer.calc_info.relativistic
+    assert sections["SFOs"]["number"] == 82 and len(sections["SFO popul"]["sfo_grosspop"]) == 82 + 8
+
+    # "1_A1" of fragment 1 is the fourth orbital of the A1 overlap triangle (after three frozen cores), and "1_A1" of fragment 2 comes after the 11 A1 SFOs of fragment 1
+    index1, index2 = 3 + 1, 3 + 11 + 1
+    assert analyzer.get_sfo_overlap("1_A1", "1_A1") == pytest.approx(sections["A1"]["S-CoreSFO"][index2 * (index2 - 1) // 2 + index1 - 1])
+    assert analyzer.get_sfo_gross_population(2, "1_A1") == pytest.approx(sections["SFO popul"]["sfo_grosspop"][3 + 11])
+
+    sfo_manager = analyzer.get_sfo_orbitals((5, 5), (5, 5))
+    assert sfo_manager.overlap_matrix.shape == (10, 10) and np.abs(sfo_manager.overlap_matrix).max() > 0
+    assert "HOMO" in str(sfo_manager) and "HOMO" in str(analyzer.get_mo_orbitals((5, 5)))
+
+
+def test_synthetic_unrestricted_nosym_analysis(tmp_path):
+    spec = SyntheticCalcSpec(n_sfos_per_fragment=30, n_frozen_cores=5, unrestricted=True, spin_polarization=1, relativistic=False)
+    analyzer = create_calc_analyser(write_synthetic_rkf(tmp_path / "adf.rkf", spec))
+
+    assert not analyzer.calc_info.restricted and not analyzer.calc_info.symmetry and not analyzer.calc_info.relativistic
+    sfos = {spin: analyzer.get_sfo_orbitals((30, 30), (30, 30), spin=spin) for spin in ["A", "B"]}
+    # The unpaired electron of each fragment is a spin A electron
+    assert sum(sfo.occupation for sfo in sfos["A"].frag1_sfos) == sum(sfo.occupation for sfo in sfos["B"].frag1_sfos) + 1
+    assert analyzer.get_sfo_overlap("1_A_A", "1_A_B") == 0.0
+
+
+def test_synthetic_files_are_reproducible(tmp_path):
+    paths = [write_synthetic_rkf(tmp_path / f"{name}.rkf", n_sfos_per_fragment=20, point_group="C(2V)", seed=seed) for name, seed in [("a", 3), ("b", 3), ("c", 4)]]
+    contents = [path.read_bytes() for path in paths]
+
+    assert contents[0] == contents[1] != contents[2]
+    with pytest.raises(ValueError):
+        SyntheticCalcSpec(n_sfos_per_fragment=3, point_group="C(2V)")
@@ -0,0 +1,58 @@
+"""
+Testmodule that tests the :Trajectory: that stacks the SFO data of a series of fragment analysis calculations.
+"""
+
+import pathlib as pl
+
+import numpy as np
+import pytest
+from orb_analysis import orb_config
+from orb_analysis.analyzer.calc_analyzer import create_calc_analyser
+from orb_analysis.analyzer.trajectory import Trajectory, create_trajectory
+
+current_dir = pl.Path(__file__).parent
+fixtures_dir = current_dir / "fixtures" / "rkfs"
+
+restricted_largecore_fragsym_c3v = fixtures_dir / "restricted_largecore_fragsym_c3v_full.adf.rkf"
+missing_rkf_file = fixtures_dir / "does_not_exist.adf.rkf"
+
+# The orbital energy key and unit need to be fixed because the tests have been written for the conditions below
+orb_config.rkf_reading.orbital_energy_key = "escale"
+orb_config.rkf_reading.orbital_energy_unit = "hartree"
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_trajectory_matches_sfo_manager(max_workers):
+    paths = [restricted_largecore_fragsym_c3v, missing_rkf_file, restricted_largecore_fragsym_c3v]
+    trajectory = create_trajectory(paths, orb_range=(3, 3), max_workers=max_workers)
+    sfo_manager = create_calc_analyser(restricted_largecore_fragsym_c3v).get_sfo_orbitals((3, 3), (3, 3))
+
+    assert len(trajectory) == 3
+    assert trajectory.overlaps.shape == (3, len(sfo_manager.frag1_sfos), len(sfo_manager.frag2_sfos))
+    assert list(trajectory.errors) == [1]
+    assert np.isnan(trajectory.overlaps[1]).all()
+
+    for point in [0, 2]:
+        assert np.allclose(trajectory.overlaps[point], sfo_manager.overlap_matrix)
+        assert np.allclose(trajectory.frag1_orb_energies[point], [sfo.energy for sfo in sfo_manager.frag1_sfos])
+        assert np.allclose(trajectory.frag2_gross_populations[point], [sfo.gross_pop for sfo in sfo_manager.frag2_sfos])
+        assert np.allclose(trajectory.frag2_occupations[point], [sfo.occupation for sfo in sfo_manager.frag2_sfos])
+
+    sfo1, sfo2 = sfo_manager.frag1_sfos[0], sfo_manager.frag2_sfos[0]
+    assert np.allclose(trajectory.get_sfo_overlap(sfo1, sfo2)[[0, 2]], sfo_manager.overlap_matrix[0, 0])
+
+
+def test_trajectory_with_selected_sfos_and_storage(tmp_path):
+    frag1_sfos, frag2_sfos = ["1_A1", "1000_A1"], ["2_A1"]
+    trajectory = create_trajectory([restricted_largecore_fragsym_c3v] * 2, frag1_sfos=frag1_sfos, frag2_sfos=frag2_sfos, max_workers=1, storage_dir=tmp_path)
+    analyzer = create_calc_analyser(restricted_largecore_fragsym_c3v)
+
+    assert trajectory.frag1_labels == frag1_sfos
+    assert np.allclose(trajectory.get_sfo_orbital_energy(1, "1_A1"), analyzer.get_sfo_orbital_energy(1, "1_A1"))
+    assert np.allclose(trajectory.get_sfo_overlap("1_A1", "2_A1"), analyzer.get_sfo_overlap("1_A1", "2_A1"))
+    assert np.isnan(trajectory.get_sfo_overlap("1000_A1", "2_A1")).all()
+
+    loaded_trajectory = Trajectory.load(tmp_path)
+    assert isinstance(loaded_trajectory.overlaps, np.memmap)
+    assert np.array_equal(loaded_trajectory.overlaps, trajectory.overlaps, equal_nan=True)
+    assert loaded_trajectory.frag2_labels == frag2_sfos